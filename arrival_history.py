@@ -0,0 +1,292 @@
+"""Opt-in store of every scheduled vs estimated time seen in a schedule.
+
+Observations are appended column by column to raw binary files (stdlib
+array, so recording needs nothing beyond the standard library). The active
+segment is sealed once it reaches segment_rows, and compact() merges sealed
+segments into one. Queries load the columns with numpy and aggregate them
+vectorized, so delay by route / stop / hour of day over millions of rows
+stays well under a second.
+
+Times are stored as "naive local" epoch seconds: the API's local wall-clock
+time read as if it were UTC, which makes hour of day a plain modulo.
+"""
+import calendar
+import json
+import os
+import shutil
+import threading
+from array import array
+from datetime import datetime
+
+from transit_model import NA
+
+HISTORY_PATH = "txt/history"
+
+# column name -> array typecode
+COLUMNS = (
+    ("stop", "I"),
+    ("route", "I"),
+    ("trip", "q"),
+    ("kind", "B"),
+    ("scheduled", "q"),
+    ("estimated", "q"),
+    ("fetched", "q"),
+)
+
+ARRIVAL = 0
+DEPARTURE = 1
+
+
+def local_seconds(text):
+    """Naive-local epoch seconds for an API timestamp, or None."""
+    if not text or text == NA:
+        return None
+    try:
+        return calendar.timegm(datetime.fromisoformat(text).timetuple())
+    except ValueError:
+        return None
+
+
+def _as_seconds(value):
+    # Filters accept API-style timestamps or naive-local epoch seconds
+    return local_seconds(value) if isinstance(value, str) else value
+
+
+def _read_column(directory, name, typecode):
+    values = array(typecode)
+    path = os.path.join(directory, f"{name}.bin")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            values.frombytes(f.read())
+    return values
+
+
+class ArrivalHistory:
+    def __init__(self, path=HISTORY_PATH, segment_rows=1_000_000):
+        self.path = path
+        self.segment_rows = segment_rows
+        self._lock = threading.Lock()
+        self._active = os.path.join(path, "active")
+        os.makedirs(self._active, exist_ok=True)
+        self._keys_path = os.path.join(path, "keys.json")
+        if os.path.exists(self._keys_path):
+            with open(self._keys_path, "r") as f:
+                keys = json.load(f)
+        else:
+            keys = {"stops": [], "routes": []}
+        self._stops = keys["stops"]
+        self._routes = keys["routes"]
+        self._stop_codes = {key: code for code, key in enumerate(self._stops)}
+        self._route_codes = {key: code for code, key in enumerate(self._routes)}
+        self._keys_dirty = False
+        self._active_rows = self._repair_active()
+
+    def _repair_active(self):
+        # A crash between column appends leaves ragged files; cut them back to the shortest
+        lengths = []
+        for name, typecode in COLUMNS:
+            path = os.path.join(self._active, f"{name}.bin")
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            lengths.append(size // array(typecode).itemsize)
+        rows = min(lengths)
+        if rows != max(lengths):
+            for name, typecode in COLUMNS:
+                with open(os.path.join(self._active, f"{name}.bin"), "ab") as f:
+                    f.truncate(rows * array(typecode).itemsize)
+        return rows
+
+    def _code(self, codes, keys, key):
+        code = codes.get(key)
+        if code is None:
+            code = codes[key] = len(keys)
+            keys.append(key)
+            self._keys_dirty = True
+        return code
+
+    def _save_keys(self):
+        tmp = self._keys_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"stops": self._stops, "routes": self._routes}, f)
+        os.replace(tmp, self._keys_path)
+        self._keys_dirty = False
+
+    def record(self, stop_key, scheduled, fetched=None):
+        """Append the arrival and departure observations of ScheduledStop records; returns rows written."""
+        if fetched is None:
+            fetched = calendar.timegm(datetime.now().timetuple())
+        with self._lock:
+            stop_code = self._code(self._stop_codes, self._stops, str(stop_key))
+            columns = {name: array(typecode) for name, typecode in COLUMNS}
+            for record in scheduled:
+                try:
+                    trip = int(record.trip_key)
+                except ValueError:
+                    continue
+                route_code = self._code(self._route_codes, self._routes, record.route_key)
+                for kind, planned, estimate in (
+                    (ARRIVAL, record.arrival_scheduled, record.arrival_estimated),
+                    (DEPARTURE, record.departure_scheduled, record.departure_estimated),
+                ):
+                    planned = local_seconds(planned)
+                    estimate = local_seconds(estimate)
+                    if planned is None or estimate is None:
+                        continue
+                    columns["stop"].append(stop_code)
+                    columns["route"].append(route_code)
+                    columns["trip"].append(trip)
+                    columns["kind"].append(kind)
+                    columns["scheduled"].append(planned)
+                    columns["estimated"].append(estimate)
+                    columns["fetched"].append(fetched)
+
+            # Codes handed out by a call that wrote nothing still have to survive a restart
+            if self._keys_dirty:
+                self._save_keys()
+            rows = len(columns["stop"])
+            if not rows:
+                return 0
+            for name, values in columns.items():
+                with open(os.path.join(self._active, f"{name}.bin"), "ab") as f:
+                    values.tofile(f)
+            self._active_rows += rows
+            if self._active_rows >= self.segment_rows:
+                self._seal()
+            return rows
+
+    def _segments(self):
+        return sorted(name for name in os.listdir(self.path) if name.startswith("seg-"))
+
+    def _seal(self):
+        segments = self._segments()
+        number = int(segments[-1][4:]) + 1 if segments else 0
+        os.replace(self._active, os.path.join(self.path, f"seg-{number:06d}"))
+        os.makedirs(self._active)
+        self._active_rows = 0
+
+    def compact(self):
+        """Merge every sealed segment into one, so queries open fewer files."""
+        with self._lock:
+            segments = self._segments()
+            if len(segments) < 2:
+                return
+            merged = os.path.join(self.path, "merging")
+            os.makedirs(merged, exist_ok=True)
+            for name, typecode in COLUMNS:
+                with open(os.path.join(merged, f"{name}.bin"), "wb") as out:
+                    for segment in segments:
+                        _read_column(os.path.join(self.path, segment), name, typecode).tofile(out)
+            for segment in segments:
+                shutil.rmtree(os.path.join(self.path, segment))
+            os.replace(merged, os.path.join(self.path, segments[-1]))
+
+    def __len__(self):
+        total = self._active_rows
+        for segment in self._segments():
+            total += os.path.getsize(os.path.join(self.path, segment, "stop.bin")) // array("I").itemsize
+        return total
+
+    def load(self):
+        """Every column as a numpy array, sealed segments first."""
+        import numpy as np
+
+        with self._lock:
+            directories = [os.path.join(self.path, segment) for segment in self._segments()]
+            directories.append(self._active)
+            rows = self._active_rows
+            parts = {name: [] for name, _ in COLUMNS}
+            for directory in directories:
+                for name, typecode in COLUMNS:
+                    path = os.path.join(directory, f"{name}.bin")
+                    if not os.path.exists(path):
+                        continue
+                    count = rows if directory == self._active else -1
+                    parts[name].append(np.fromfile(path, dtype=np.dtype(typecode), count=count))
+        return {
+            name: np.concatenate(parts[name]) if parts[name] else np.empty(0, dtype=np.dtype(typecode))
+            for name, typecode in COLUMNS
+        }
+
+    def delays(self, route=None, stop=None, kind=DEPARTURE, since=None, until=None, latest_only=True):
+        """(columns, delay_seconds) for the matching observations.
+
+        latest_only keeps just the last observation of each stop/trip/time, so
+        trips polled many times don't outweigh those seen once.
+        """
+        import numpy as np
+
+        columns = self.load()
+        mask = columns["kind"] == kind
+        for codes, key, column in ((self._route_codes, route, "route"), (self._stop_codes, stop, "stop")):
+            if key is None:
+                continue
+            code = codes.get(str(key))
+            if code is None:
+                mask[:] = False
+            else:
+                mask &= columns[column] == code
+        if since is not None:
+            mask &= columns["scheduled"] >= _as_seconds(since)
+        if until is not None:
+            mask &= columns["scheduled"] < _as_seconds(until)
+        columns = {name: values[mask] for name, values in columns.items()}
+
+        if latest_only and len(columns["trip"]):
+            order = np.lexsort((columns["fetched"], columns["scheduled"], columns["trip"], columns["stop"]))
+            columns = {name: values[order] for name, values in columns.items()}
+            last = np.ones(len(order), dtype=bool)
+            last[:-1] = (
+                (columns["stop"][1:] != columns["stop"][:-1])
+                | (columns["trip"][1:] != columns["trip"][:-1])
+                | (columns["scheduled"][1:] != columns["scheduled"][:-1])
+            )
+            columns = {name: values[last] for name, values in columns.items()}
+        return columns, columns["estimated"] - columns["scheduled"]
+
+    def delay_by(self, by="route", percentiles=(50, 90), **filters):
+        """Delay stats grouped by "route", "stop" or "hour".
+
+        Returns [(group, count, mean_seconds, {percentile: seconds})], filters as for delays().
+        """
+        import numpy as np
+
+        columns, delay = self.delays(**filters)
+        if by == "hour":
+            groups = (columns["scheduled"] // 3600) % 24
+            names = list(range(24))
+        elif by == "route":
+            groups = columns["route"]
+            names = self._routes
+        elif by == "stop":
+            groups = columns["stop"]
+            names = self._stops
+        else:
+            raise ValueError(f"can't group delays by {by!r}")
+        if not len(delay):
+            return []
+
+        groups = groups.astype(np.int64)
+        counts = np.bincount(groups, minlength=len(names))
+        sums = np.bincount(groups, weights=delay, minlength=len(names))
+        # Sort by (group, delay) once; each group's percentiles are then plain index lookups
+        order = np.lexsort((delay, groups))
+        sorted_delay = delay[order]
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        present = np.nonzero(counts)[0]
+        picks = {
+            p: sorted_delay[starts[present] + ((counts[present] - 1) * p // 100)]
+            for p in percentiles
+        }
+        return [
+            (names[group], int(counts[group]), float(sums[group] / counts[group]),
+             {p: int(picks[p][i]) for p in percentiles})
+            for i, group in enumerate(present)
+        ]
+
+
+def enable(session=None, path=HISTORY_PATH):
+    """Start recording every schedule fetched through session (default: the shared one)."""
+    if session is None:
+        from transit_http import shared_session
+        session = shared_session()
+    session.recorder = ArrivalHistory(path)
+    return session.recorder
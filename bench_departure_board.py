@@ -0,0 +1,85 @@
+"""Multi-stop departure board against the stub API.
+
+Usage: python bench_departure_board.py [stops] [latency_seconds] [quota_per_minute]
+
+The stub serves every stop a 100-trip schedule whose estimates move once a
+second. Reported: the first refresh of the whole board (concurrent fetches
+plus building the per-stop lists), a later refresh that applies only the
+trips whose estimates moved, and the cost of the board itself: the top N
+by heap merge and from the cached top, against re-sorting every trip on
+the board (times parsed, as a rebuild would).
+
+The stub has no quota, so those refreshes run unthrottled and measure the
+board, not the API's limit. Against the real API every uncached refresh is
+also held to the quota, 100 requests a minute after a burst of 10 by
+default: 150 stops take at least 84 s whatever the concurrency. That bound
+is printed for the default quota, and with quota_per_minute one more
+refresh runs under that quota (as $TRANSITTRACKER_QUOTA would set it) to
+show it.
+"""
+import sys
+import time
+
+from departure_board import DepartureBoard, departure_time
+from stub_server import start_stub_server
+from transit_http import create_session
+from transit_ratelimit import DEFAULT_BURST, DEFAULT_RATE, QUOTAS, configure_quotas
+
+
+def main(stop_count=150, latency=0.05, size=20, quota=None):
+    # The stub has no quota to protect
+    QUOTAS["stub"] = 1000
+    server, base_url = start_stub_server(latency=latency, churn=1)
+    stop_ids = [str(10000 + n) for n in range(stop_count)]
+    print(f"{stop_count} stops, {latency * 1000:.0f} ms upstream latency, top {size}")
+    for concurrency in (4, 16, 32):
+        # Uncached, so every refresh is a real round trip
+        session = create_session(pool_maxsize=concurrency)
+        board = DepartureBoard(stop_ids, size, concurrency, api_key="stub", session=session, base_url=base_url)
+        start = time.perf_counter()
+        changed, failed = board.refresh()
+        print(f"  first refresh x{concurrency:<3} {time.perf_counter() - start:6.2f} s  "
+              f"{len(board)} trips, {len(failed)} failed")
+
+    time.sleep(1)
+    moved = board.moved
+    start = time.perf_counter()
+    changed, failed = board.refresh()
+    print(f"  next refresh x{concurrency:<3}  {time.perf_counter() - start:6.2f} s  "
+          f"{changed} changes, {board.moved - moved} trips re-slotted")
+    print(f"  at the default quota of {DEFAULT_RATE * 60:.0f}/min a refresh takes at least "
+          f"{max(0, stop_count - DEFAULT_BURST) / DEFAULT_RATE:.0f} s")
+    if quota is not None:
+        # A key of its own, so its limiter is created at this quota
+        configure_quotas(f"stub-quota={quota}")
+        quoted = DepartureBoard(stop_ids, size, 16, api_key="stub-quota",
+                                session=create_session(pool_maxsize=16), base_url=base_url)
+        start = time.perf_counter()
+        quoted.refresh()
+        print(f"  refresh at {quota:.0f}/min     {time.perf_counter() - start:6.2f} s  "
+              f"(bound {quoted.refresh_bound():.2f} s)")
+    server.shutdown()
+
+    rounds = 200
+    records = [(stop_id, record) for stop_id in stop_ids for record in board._snapshots[stop_id].values()]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        sorted((departure_time(record), stop_id, record.trip_key) for stop_id, record in records)[:size]
+    rebuild = (time.perf_counter() - start) / rounds
+    start = time.perf_counter()
+    for _ in range(rounds):
+        board._merge(size)
+    merge = (time.perf_counter() - start) / rounds
+    start = time.perf_counter()
+    for _ in range(rounds):
+        board.top()
+    cached = (time.perf_counter() - start) / rounds
+    print(f"  re-sort all     {rebuild * 1e3:8.3f} ms")
+    print(f"  heap merge      {merge * 1e3:8.3f} ms")
+    print(f"  cached top      {cached * 1e3:8.3f} ms")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if len(args) > 0 else 150, float(args[1]) if len(args) > 1 else 0.05,
+         quota=float(args[2]) if len(args) > 2 else None)
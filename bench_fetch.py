@@ -0,0 +1,46 @@
+"""Serial busTimer-style loop vs fetch_schedules against the local stub API.
+
+Usage: python bench_fetch.py [stops] [latency_seconds] [max_concurrency]
+"""
+import sys
+import time
+
+from stub_server import start_stub_server
+from transit_http import create_session, fetch_schedule, fetch_schedules
+from transit_ratelimit import QUOTAS
+
+
+def main(stops=100, latency=0.05, max_concurrency=16):
+    # The stub has no quota to protect
+    QUOTAS["stub"] = 1000
+    server, base_url = start_stub_server(latency=latency, fail_stops={"10003"})
+    stop_ids = [str(10000 + n) for n in range(stops)]
+    try:
+        session = create_session()
+        start = time.perf_counter()
+        for stop_id in stop_ids:
+            try:
+                fetch_schedule(stop_id, api_key="stub", session=session, base_url=base_url)
+            except Exception:
+                pass
+        serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = list(fetch_schedules(stop_ids, max_concurrency, api_key="stub", base_url=base_url))
+        concurrent = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    failed = sum(1 for result in results if result.error is not None)
+    print(f"{stops} stops, {latency * 1000:.0f} ms upstream latency")
+    print(f"  serial      {serial:6.2f} s  {stops / serial:7.1f} stops/s")
+    print(f"  pool x{max_concurrency:<4} {concurrent:6.2f} s  {stops / concurrent:7.1f} stops/s  ({failed} failed)")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(
+        int(args[0]) if len(args) > 0 else 100,
+        float(args[1]) if len(args) > 1 else 0.05,
+        int(args[2]) if len(args) > 2 else 16,
+    )
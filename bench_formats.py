@@ -0,0 +1,65 @@
+"""Bytes on the wire and decode time per schedule, XML vs JSON.
+
+Usage: python bench_formats.py [captured.xml captured.json]
+
+Wire size is shown raw and gzipped (what requests negotiates by default).
+JSON is decoded with every decoder that is installed.
+"""
+import gzip
+import io
+import json
+import sys
+import time
+
+import transit_model
+from stub_server import make_schedule, make_schedule_json
+from transit_parser import parse_schedule
+
+
+def best_of(func, body, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(body)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def json_decoders():
+    decoders = [("json", json.loads)]
+    if transit_model.orjson is not None:
+        decoders.append(("orjson", transit_model.orjson.loads))
+    if transit_model.msgspec is not None:
+        decoders.append(("msgspec", transit_model.msgspec.json.decode))
+    return decoders
+
+
+def report(label, xml_body, json_body):
+    print(label)
+    for name, body in (("xml", xml_body), ("json", json_body)):
+        print(f"  {name:<5} {len(body) / 1024:8.1f} KiB raw  {len(gzip.compress(body)) / 1024:7.1f} KiB gzip")
+    print(f"  decode xml (iterparse)   {best_of(lambda b: parse_schedule(io.BytesIO(b)), xml_body):8.2f} ms")
+    original = transit_model.loads
+    try:
+        for name, loads in json_decoders():
+            transit_model.loads = loads
+            print(f"  decode json ({name:<8})  {best_of(transit_model.decode_schedule, json_body):8.2f} ms")
+    finally:
+        transit_model.loads = original
+
+
+def main(paths):
+    if len(paths) == 2:
+        with open(paths[0], "rb") as f, open(paths[1], "rb") as g:
+            report(f"{paths[0]} / {paths[1]}", f.read(), g.read())
+        return
+    for routes, stops_per_route in ((5, 20), (20, 100), (40, 500)):
+        report(
+            f"{routes} routes x {stops_per_route} stops",
+            make_schedule(routes, stops_per_route),
+            make_schedule_json(routes, stops_per_route),
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,130 @@
+"""Import and query timings for the GTFS departure index.
+
+Usage: python bench_gtfs.py [google_transit.zip]
+
+Without an argument a synthetic feed about Winnipeg's size is generated
+(5,200 stops, 90 straight-line routes across the city, ~2.8 million stop
+times); pass the published GTFS zip to run against the full real feed. Import memory is how far the
+import pushed the process's max RSS.
+"""
+import csv
+import io
+import math
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+
+from gtfs_index import GtfsIndex, import_feed
+from stop_index import CITY_BOUNDS, METRES_PER_DEGREE
+
+
+def synthetic_feed(path, stops=5200, routes=90, trips_per_route=800, stops_per_trip=40, seed=1):
+    rng = random.Random(seed)
+    south, west, north, east = CITY_BOUNDS
+    points = [(rng.uniform(south, north), rng.uniform(west, east)) for _ in range(stops)]
+    cos_lat = math.cos(math.radians((south + north) / 2))
+    metres = [(lon * METRES_PER_DEGREE * cos_lat, lat * METRES_PER_DEGREE) for lat, lon in points]
+
+    def route_pattern():
+        # Stops within 300 m of a random line through the city, in order along it
+        x0, y0 = rng.choice(metres)
+        angle = rng.uniform(0, math.pi)
+        dx, dy = math.cos(angle), math.sin(angle)
+        band = sorted(
+            ((x - x0) * dx + (y - y0) * dy, n) for n, (x, y) in enumerate(metres)
+            if abs((x - x0) * dy - (y - y0) * dx) < 300
+        )
+        step = max(1, len(band) // stops_per_trip)
+        return [n for _, n in band[::step][:stops_per_trip]]
+
+    def write(archive, name, header, rows):
+        text = io.StringIO()
+        writer = csv.writer(text)
+        writer.writerow(header)
+        writer.writerows(rows)
+        archive.writestr(name, text.getvalue())
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        write(archive, "stops.txt", ["stop_id", "stop_code", "stop_name", "stop_lat", "stop_lon"],
+              ([str(n), str(10000 + n), f"Stop {n}", f"{lat:.6f}", f"{lon:.6f}"]
+               for n, (lat, lon) in enumerate(points)))
+        write(archive, "routes.txt", ["route_id", "route_short_name", "route_long_name", "route_type"],
+              ([f"R{r}", str(r), f"Route {r}", "3"] for r in range(routes)))
+        write(archive, "calendar.txt",
+              ["service_id", "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+               "start_date", "end_date"],
+              [["weekday", 1, 1, 1, 1, 1, 0, 0, 20260101, 20271231],
+               ["saturday", 0, 0, 0, 0, 0, 1, 0, 20260101, 20271231],
+               ["sunday", 0, 0, 0, 0, 0, 0, 1, 20260101, 20271231]])
+        write(archive, "calendar_dates.txt", ["service_id", "date", "exception_type"],
+              [["weekday", 20261012, 2], ["sunday", 20261012, 1]])
+        services = ["weekday"] * 6 + ["saturday", "sunday"]
+        write(archive, "trips.txt", ["route_id", "service_id", "trip_id", "trip_headsign"],
+              ([f"R{r}", services[t % len(services)], str(1_000_000 + r * trips_per_route + t), f"Route {r}"]
+               for r in range(routes) for t in range(trips_per_route)))
+
+        # stop_times is streamed into the archive rather than built in memory
+        with archive.open("stop_times.txt", "w") as raw, io.TextIOWrapper(raw, newline="") as text:
+            writer = csv.writer(text)
+            writer.writerow(["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"])
+            written = 0
+            for r in range(routes):
+                pattern = route_pattern()
+                # ~25 km/h between stops plus a 20 s dwell, the same for every trip of the route
+                hops = [20 + int(math.dist(metres[a], metres[b]) / 7) for a, b in zip(pattern, pattern[1:])] + [0]
+                for t in range(trips_per_route):
+                    departs = 5 * 3600 + (t * 20 * 3600) // trips_per_route
+                    for sequence, (stop, hop) in enumerate(zip(pattern, hops)):
+                        clock = f"{departs // 3600:02d}:{departs // 60 % 60:02d}:{departs % 60:02d}"
+                        writer.writerow([1_000_000 + r * trips_per_route + t, clock, clock, stop, sequence])
+                        departs += hop
+                written += trips_per_route * len(pattern)
+    return written
+
+
+def main(feed=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        if feed is None:
+            feed = os.path.join(tmp, "feed.zip")
+            start = time.perf_counter()
+            rows = synthetic_feed(feed)
+            print(f"synthetic feed: {rows:,} stop times, {os.path.getsize(feed) / 1e6:.1f} MB zipped, "
+                  f"written in {time.perf_counter() - start:.1f} s")
+
+        path = os.path.join(tmp, "gtfs")
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        counts = import_feed(feed, path)
+        elapsed = time.perf_counter() - start
+        rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+        index_bytes = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+        print(f"import: {counts['stop_times']:,} stop times ({counts['indexed']:,} indexed) in {elapsed:.1f} s, "
+              f"{counts['stop_times'] / elapsed / 1e6:.2f} M rows/s")
+        print(f"  max RSS grew {rss_growth / 1024:.0f} MB, index on disk {index_bytes / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        index = GtfsIndex(path)
+        print(f"load (mmap + tables): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        rng = random.Random(2)
+        stop_keys = [key for key in index.stop_keys if index.departures(key, limit=1)]
+        queries = [
+            (rng.choice(stop_keys), datetime(2026, 10, rng.randint(12, 18), rng.randint(0, 23), rng.randint(0, 59)))
+            for _ in range(2000)
+        ]
+        for limit in (1, 10, 50):
+            start = time.perf_counter()
+            for stop_key, when in queries:
+                index.departures(stop_key, when, limit)
+            per_query = (time.perf_counter() - start) / len(queries)
+            print(f"  next {limit:<3} departures  {per_query * 1e6:8.1f} us/query")
+        index.close()
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,70 @@
+"""Query timings for the arrival history store (needs numpy).
+
+Usage: python bench_history.py [rows]
+
+Writes a synthetic month of observations straight into a sealed segment,
+then times the grouped delay queries over it.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from arrival_history import COLUMNS, ArrivalHistory, local_seconds
+
+
+def write_segment(path, rows, routes=90, stops=5200, seed=1):
+    rng = np.random.default_rng(seed)
+    month = local_seconds("2026-10-01T00:00:00")
+    scheduled = month + rng.integers(0, 31 * 24 * 3600, rows)
+    hour = (scheduled // 3600) % 24
+    rush = ((hour >= 7) & (hour < 9)) | ((hour >= 16) & (hour < 18))
+    delay = rng.gamma(2.0, 40.0, rows).astype(np.int64) + rush * rng.integers(0, 240, rows)
+    columns = {
+        "stop": rng.integers(0, stops, rows),
+        "route": rng.integers(0, routes, rows),
+        "trip": rng.integers(1_000_000, 9_000_000, rows),
+        "kind": rng.integers(0, 2, rows),
+        "scheduled": scheduled,
+        "estimated": scheduled + delay,
+        "fetched": scheduled - rng.integers(0, 1800, rows),
+    }
+    segment = os.path.join(path, "seg-000000")
+    os.makedirs(segment)
+    for name, typecode in COLUMNS:
+        columns[name].astype(np.dtype(typecode)).tofile(os.path.join(segment, f"{name}.bin"))
+    with open(os.path.join(path, "keys.json"), "w") as f:
+        json.dump({"stops": [str(10000 + n) for n in range(stops)], "routes": [str(n) for n in range(routes)]}, f)
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"  {label:<44} {(time.perf_counter() - start) * 1000:8.1f} ms")
+    return result
+
+
+def main(rows=5_000_000):
+    with tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        write_segment(path, rows)
+        print(f"{rows:,} observations written in {time.perf_counter() - start:.1f} s")
+        history = ArrivalHistory(path)
+        timed("load columns", history.load)
+        timed("delay by route", lambda: history.delay_by("route"))
+        timed("delay by stop", lambda: history.delay_by("stop"))
+        timed("delay by hour", lambda: history.delay_by("hour"))
+        by_hour = timed(
+            "route 11 by hour, October",
+            lambda: history.delay_by("hour", route=11, since="2026-10-01T00:00:00", until="2026-11-01T00:00:00"),
+        )
+        for hour, count, mean, picks in by_hour:
+            if 7 <= hour < 9 or 16 <= hour < 18:
+                print(f"    {hour:02d}:00  n={count:<6} mean {mean:6.1f} s  p50 {picks[50]} s  p90 {picks[90]} s")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,138 @@
+"""Load test for the live feed: thousands of SSE subscribers on one process.
+
+Usage: python bench_live_feed.py [subscribers] [stops] [seconds]
+
+The feed, its StopWatcher and a churning stub upstream run in this process;
+subscribers are asyncio clients spread over a few worker processes so they
+do not compete with the server for its loop. Reported: how many clients
+stayed connected, events and bytes delivered, fan-out latency from the
+server noticing a change to a client reading it, upstream polls per stop
+(independent of subscriber count) and the server process's CPU and memory,
+which include the stub's share.
+"""
+import asyncio
+import json
+import multiprocessing
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+
+from live_feed import LiveFeed
+from stop_watcher import StopWatcher
+from stub_server import start_stub_server
+from transit_http import create_session
+from transit_ratelimit import QUOTAS
+
+CLIENT_PROCESSES = 4
+STOPS_PER_CLIENT = 3
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+async def subscriber(port, stops, seconds, latencies, counts):
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET /feed?stops={','.join(stops)} HTTP/1.1\r\nHost: bench\r\n\r\n".encode("ascii"))
+        await reader.readuntil(b"\r\n\r\n")
+    except (OSError, asyncio.IncompleteReadError):
+        counts["failed"] += 1
+        return
+    counts["connected"] += 1
+    deadline = time.monotonic() + seconds
+    try:
+        while True:
+            event = await asyncio.wait_for(reader.readuntil(b"\n\n"), max(0.01, deadline - time.monotonic()))
+            received = time.time()
+            counts["bytes"] += len(event)
+            for line in event.split(b"\n"):
+                if line.startswith(b"data: "):
+                    counts["events"] += 1
+                    latencies.append(received - json.loads(line[6:])["at"])
+    except asyncio.TimeoutError:
+        counts["stayed"] += 1
+    except (OSError, asyncio.IncompleteReadError):
+        counts["dropped"] += 1
+    finally:
+        writer.close()
+
+
+def client_process(port, subscriptions, seconds, results):
+    raise_fd_limit()
+    latencies = []
+    counts = dict.fromkeys(("connected", "failed", "stayed", "dropped", "events", "bytes"), 0)
+
+    async def main():
+        await asyncio.gather(*(subscriber(port, stops, seconds, latencies, counts) for stops in subscriptions))
+
+    asyncio.run(main())
+    results.put((counts, latencies))
+
+
+def main(subscribers=2000, stop_count=50, seconds=20):
+    raise_fd_limit()
+    # The stub has no quota to protect
+    QUOTAS["stub"] = 1000
+    stub, base_url = start_stub_server(latency=0.02, churn=2)
+    watcher = StopWatcher(api_key="stub", session=create_session(pool_maxsize=8), base_url=base_url,
+                          min_interval=1, max_interval=1, max_concurrency=8)
+    feed = LiveFeed(watcher)
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(feed.start(port=0))
+    port = server.sockets[0].getsockname()[1]
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    watcher.start()
+
+    rng = random.Random(1)
+    stop_ids = [str(10000 + n) for n in range(stop_count)]
+    subscriptions = [rng.sample(stop_ids, min(STOPS_PER_CLIENT, stop_count)) for _ in range(subscribers)]
+    # spawn, not fork: this process already runs the stub, watcher and feed threads
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workers = [
+        context.Process(target=client_process, args=(port, subscriptions[i::CLIENT_PROCESSES], seconds, results))
+        for i in range(CLIENT_PROCESSES)
+    ]
+    cpu_before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds / 2)
+    peak = feed.stats()
+    gathered = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    cpu_after = resource.getrusage(resource.RUSAGE_SELF)
+    watcher.stop()
+
+    totals = {key: sum(counts[key] for counts, _ in gathered) for key in gathered[0][0]}
+    latencies = sorted(latency for _, sample in gathered for latency in sample)
+    cpu = (cpu_after.ru_utime - cpu_before.ru_utime) + (cpu_after.ru_stime - cpu_before.ru_stime)
+
+    print(f"{subscribers} subscribers over {stop_count} stops for {seconds} s ({CLIENT_PROCESSES} client processes)")
+    print(f"  connected {totals['connected']}, failed {totals['failed']}, "
+          f"stayed to the end {totals['stayed']}, dropped {totals['dropped']}")
+    print(f"  subscribers at midpoint {peak['subscribers']} on {peak['stops']} watched stops")
+    print(f"  events received {totals['events']} ({totals['bytes'] / 1e6:.1f} MB), "
+          f"server sent {feed.events}")
+    if latencies:
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+        print(f"  fan-out latency p50 {p50:.1f} ms, p99 {p99:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+    print(f"  upstream requests {stub.requests} ({stub.requests / stop_count / elapsed:.2f}/stop/s, "
+          f"{watcher.unchanged} bodies unchanged)")
+    print(f"  server process CPU {cpu:.1f} s ({cpu / elapsed:.0%} of one core), "
+          f"max RSS {cpu_after.ru_maxrss / 1024:.0f} MB")
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:4]])
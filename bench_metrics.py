@@ -0,0 +1,88 @@
+"""Cost of the transit_metrics hooks, off and on.
+
+Usage: python bench_metrics.py [requests] [latency_seconds]
+
+A whole-request A/B cannot resolve a sub-1% difference: the stub shares
+this process and run-to-run noise is several percent either way. So the
+hooks are timed directly instead, min-of-N with timeit: a timed() block, a
+count() and the REGISTRY check the session makes, off and on. A request
+runs at most one of each per stage (send, cache lookup, parse, render),
+so the per-request overhead is bounded by those costs added up, and
+reported against the cost of an uncached fetch_schedule from the local stub
+with metrics off, the cheapest request there is.
+"""
+import sys
+import time
+import timeit
+
+import transit_metrics
+from stub_server import start_stub_server
+from transit_http import create_session, fetch_schedule
+from transit_ratelimit import QUOTAS
+
+# The hooks one schedule request can run: send (REGISTRY check, or count on error/throttle),
+# cache lookup (count), parse (timed) and render (timed)
+HOOKS = {
+    "timed() block": ("with timed('transit_parse_seconds', 'schedule.' + fmt): pass", 2),
+    "count()": ("count('transit_cache_lookups_total', 1, 'miss')", 2),
+    "REGISTRY check": ("transit_metrics.REGISTRY is not None", 1),
+}
+
+
+def hook_costs(number=200_000, repeat=7):
+    """{hook: (seconds off, seconds on)} per call, min of repeat runs."""
+    namespace = {"timed": transit_metrics.timed, "count": transit_metrics.count,
+                 "transit_metrics": transit_metrics, "fmt": "json"}
+    costs = {}
+    for name, (statement, _) in HOOKS.items():
+        baseline = min(timeit.repeat("pass", number=number, repeat=repeat))
+        timings = []
+        for enable in (transit_metrics.disable, transit_metrics.enable):
+            enable()
+            runs = timeit.repeat(statement, number=number, repeat=repeat, globals=namespace)
+            timings.append(max(0.0, min(runs) - baseline) / number)
+        transit_metrics.disable()
+        costs[name] = tuple(timings)
+    return costs
+
+
+def request_cost(count, latency, repeat=7):
+    """Seconds per uncached fetch_schedule from the stub with metrics off, best of repeat runs."""
+    # The stub has no quota to protect
+    QUOTAS["stub"] = 1000
+    server, base_url = start_stub_server(latency=latency)
+    session = create_session()
+    transit_metrics.disable()
+    try:
+        def run():
+            for n in range(count):
+                fetch_schedule(str(10000 + n), api_key="stub", session=session, base_url=base_url)
+
+        run()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+    finally:
+        server.shutdown()
+    return min(timings) / count
+
+
+def main(count=200, latency=0.0):
+    costs = hook_costs()
+    print("hook cost per call (min of 7 x 200,000, loop overhead removed)")
+    for name, (off, on) in costs.items():
+        print(f"  {name:<15} off {off * 1e9:6.1f} ns   on {on * 1e9:7.1f} ns")
+
+    per_request = request_cost(count, latency)
+    off = sum(costs[name][0] * calls for name, (_, calls) in HOOKS.items())
+    on = sum(costs[name][1] * calls for name, (_, calls) in HOOKS.items())
+    print(f"uncached schedule request from the stub, {latency * 1000:.0f} ms latency: {per_request * 1e6:.0f} us")
+    print(f"  hooks per request, off   {off * 1e6:6.3f} us  ({off / per_request:.4%})")
+    print(f"  hooks per request, on    {on * 1e6:6.3f} us  ({on / per_request:.4%})")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if len(args) > 0 else 200, float(args[1]) if len(args) > 1 else 0.0)
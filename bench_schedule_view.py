@@ -0,0 +1,90 @@
+"""Render timings for the schedule view on large schedules.
+
+Usage: python bench_schedule_view.py [rows ...]   (needs a display, e.g. xvfb-run)
+
+Compares the old per-row StringVar updates, inserting every row into a
+plain Treeview, and ScheduleView's first render and partial refresh.
+"""
+import sys
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from schedule_view import COLUMNS, ScheduleView, row_values
+from transit_model import ScheduledStop
+
+
+def make_rows(count, shift=0):
+    rows = []
+    for n in range(count):
+        minute = (n + (shift if n % 20 == 0 else 0)) % 60
+        rows.append(ScheduledStop(
+            str(n % 40), f"Route {n % 40}", f"{n}-1", str(1000000 + n),
+            f"2026-10-18T08:{n % 60:02d}:00", f"2026-10-18T08:{minute:02d}:40",
+            f"2026-10-18T08:{n % 60:02d}:00", f"2026-10-18T08:{minute:02d}:40",
+        ))
+    return rows
+
+
+def timed(root, func):
+    start = time.perf_counter()
+    func()
+    root.update_idletasks()
+    return (time.perf_counter() - start) * 1000
+
+
+def stringvars(root, rows):
+    variables = [tk.StringVar(root) for _ in range(6)]
+    label = tk.Label(root, textvariable=variables[0])
+    label.pack()
+
+    def render():
+        for record in rows:
+            values = (record.route_name, record.key, record.arrival_scheduled, record.arrival_estimated,
+                      record.departure_scheduled, record.departure_estimated)
+            for variable, value in zip(variables, values):
+                variable.set(value)
+            root.update_idletasks()
+
+    elapsed = timed(root, render)
+    label.destroy()
+    return elapsed
+
+
+def full_treeview(root, rows):
+    tree = ttk.Treeview(root, columns=COLUMNS, show="headings")
+    tree.pack()
+    elapsed = timed(root, lambda: [tree.insert("", "end", values=row_values(record)) for record in rows])
+    tree.destroy()
+    return elapsed
+
+
+def main(sizes):
+    try:
+        root = tk.Tk()
+    except tk.TclError as exc:
+        print(f"No display available ({exc}); run under xvfb-run")
+        return
+    for count in sizes:
+        rows = make_rows(count)
+        changed = make_rows(count, shift=1)
+        view = ScheduleView(root)
+        view.pack()
+        first = timed(root, lambda: view.set_schedule(rows))
+        before = view.cell_updates
+        refresh = timed(root, lambda: view.set_schedule(changed))
+        refresh_cells = view.cell_updates - before
+        scroll = timed(root, lambda: view.scroll_to(count // 2))
+        view.destroy()
+
+        print(f"{count} rows")
+        print(f"  StringVar per row     {stringvars(root, rows):8.1f} ms")
+        print(f"  Treeview, all rows    {full_treeview(root, rows):8.1f} ms")
+        print(f"  ScheduleView first    {first:8.1f} ms")
+        print(f"  ScheduleView refresh  {refresh:8.1f} ms  ({refresh_cells} cells updated)")
+        print(f"  ScheduleView scroll   {scroll:8.1f} ms")
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [500, 2000, 10000])
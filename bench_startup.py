@@ -0,0 +1,98 @@
+"""Cold-start timings for the entry points, from python -X importtime.
+
+Usage: python bench_startup.py [--baseline REV] [--repeat N] [--top N]
+
+Each case runs in a fresh interpreter with -X importtime; the table shows
+total import time and wall-clock time to reach the point where the
+entry point would first talk to the user (median of --repeat runs).
+--baseline exports an older revision of the tree with git archive and
+times its eager "import transit_http" for comparison.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+CASES = [
+    ("interpreter only", "pass"),
+    ("main.py menu", "import main"),
+    ("transittracker --help", "import transittracker, argparse"),
+    ("schedule, up to request", "import transittracker, transit_http; transit_http.shared_session()"),
+    ("GUI module (no window)", "import runpy; runpy.run_path('main-with-gui.py', run_name='bench')"),
+    ("eager imports (as before)",
+     "import transit_http, transit_parser, transit_session, asyncio, sqlite3, concurrent.futures, "
+     "stop_index, stop_watcher, arrival_history, tkinter; transit_http.shared_session()"),
+]
+
+
+def importtime(code, cwd):
+    """(total import us, wall seconds, [(us, module)]) for one fresh interpreter, or an error string."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd, capture_output=True, text=True, stdin=subprocess.DEVNULL,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        return proc.stderr.strip().splitlines()[-1]
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not name.startswith("  ") and cumulative.strip().isdigit():
+            # Top-level imports only; nested ones are already in their parent's total
+            modules.append((int(cumulative), name.strip()))
+    return sum(us for us, _ in modules), wall, modules
+
+
+def run(label, code, cwd, repeat, top):
+    runs = [importtime(code, cwd) for _ in range(repeat)]
+    failed = [r for r in runs if isinstance(r, str)]
+    if failed:
+        print(f"  {label:28} failed: {failed[0]}")
+        return
+    imports = statistics.median(r[0] for r in runs) / 1000
+    wall = statistics.median(r[1] for r in runs) * 1000
+    print(f"  {label:28} {imports:8.1f} ms imports {wall:8.1f} ms wall")
+    for us, name in sorted(runs[-1][2], reverse=True)[:top]:
+        print(f"      {us / 1000:7.1f} ms  {name}")
+
+
+def export_revision(rev, directory):
+    archive = subprocess.run(["git", "archive", rev], cwd=HERE, capture_output=True, check=True).stdout
+    path = os.path.join(directory, "tree.tar")
+    with open(path, "wb") as f:
+        f.write(archive)
+    with tarfile.open(path) as tar:
+        # The "data" filter only exists on newer Pythons
+        tar.extractall(directory, **({"filter": "data"} if hasattr(tarfile, "data_filter") else {}))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", help="git revision to compare against, e.g. the commit before lazy imports")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="also list the N slowest top-level imports")
+    args = parser.parse_args(argv)
+
+    print(f"{sys.executable} ({sys.version.split()[0]})")
+    print("this tree")
+    for label, code in CASES:
+        run(label, code, HERE, args.repeat, args.top)
+
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as directory:
+            export_revision(args.baseline, directory)
+            print(f"baseline {args.baseline}")
+            run("import transit_http", "import transit_http", directory, args.repeat, args.top)
+
+
+if __name__ == "__main__":
+    main()
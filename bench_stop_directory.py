@@ -0,0 +1,66 @@
+"""Bulk stop prefetch, snapshot load and in-memory lookups against the stub API.
+
+Usage: python bench_stop_directory.py [latency_seconds] [stops]
+
+The stub serves a grid of stops (5,000 by default, about Winnipeg's count)
+to location queries. Reported: a full prefetch of every tile at a few
+concurrency levels, one background refresh step, loading the saved
+snapshot instead, and a stop search answered from memory next to the same
+search as an API round trip.
+"""
+import os
+import sys
+import tempfile
+import time
+
+from stop_index import StopDirectory
+from stub_server import start_stub_server
+from transit_http import create_session, fetch_stop_search, stop_search_url
+from transit_ratelimit import QUOTAS
+
+
+def main(latency=0.05, stop_count=5000):
+    # The stub has no quota to protect
+    QUOTAS["stub"] = 1000
+    server, base_url = start_stub_server(latency=latency, stop_count=stop_count)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stops.json")
+        print(f"{stop_count} stub stops, {latency * 1000:.0f} ms upstream latency")
+        for concurrency in (1, 4, 8):
+            directory = StopDirectory(path, api_key="stub", max_concurrency=concurrency, base_url=base_url)
+            start = time.perf_counter()
+            index = directory.prefetch()
+            elapsed = time.perf_counter() - start
+            print(f"  prefetch x{concurrency:<2}    {elapsed:6.2f} s  {len(directory._tiles)} tiles, {len(index)} stops")
+
+        start = time.perf_counter()
+        changed = directory.refresh_step()
+        print(f"  refresh step    {(time.perf_counter() - start) * 1000:6.0f} ms  "
+              f"{directory.tiles_per_step} tiles, {changed} changed")
+
+        start = time.perf_counter()
+        index = StopDirectory(path).load()
+        print(f"  snapshot load   {(time.perf_counter() - start) * 1000:6.1f} ms  "
+              f"{os.path.getsize(path) / 1024:.0f} KiB on disk")
+
+    query = "portage at street 42"
+    rounds = 50
+    start = time.perf_counter()
+    for _ in range(rounds):
+        index.search(query)
+    memory = (time.perf_counter() - start) / rounds
+    # Uncached, as a lookup that misses the ResponseCache
+    session = create_session()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fetch_stop_search(query, api_key="stub", session=session, base_url=base_url)
+    api = (time.perf_counter() - start) / rounds
+    size = len(session.get(stop_search_url(query, "stub", base_url)).content)
+    print(f"  search memory   {memory * 1e6:8.1f} us, 0 bytes")
+    print(f"  search API      {api * 1e6:8.1f} us, {size} bytes")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(float(args[0]) if len(args) > 0 else 0.05, int(args[1]) if len(args) > 1 else 5000)
@@ -0,0 +1,77 @@
+"""Build/query timings for the offline stop index.
+
+Usage: python bench_stop_index.py [stops.json]
+
+Without an argument a synthetic city of ~5,200 stops (about Winnipeg's
+count) is generated; pass a saved index to run against the real stop set.
+"""
+import random
+import sys
+import time
+
+from stop_index import CITY_BOUNDS, StopIndex
+from transit_model import Stop
+
+STREETS = [
+    "Portage", "Main", "Pembina", "Corydon", "Osborne", "Henderson", "McPhillips",
+    "Notre Dame", "Ellice", "Sargent", "St. Mary's", "St. Anne's", "Regent", "Nairn",
+    "Kenaston", "Grant", "Academy", "Wellington", "Logan", "Selkirk", "Salter",
+    "Inkster", "Jefferson", "Leila", "Keewatin", "Arlington", "Sherbrook", "Maryland",
+    "Marion", "Dakota", "Bishop Grandin", "Waverley", "Taylor", "Fermor", "Lagimodiere",
+    "Gateway", "Panet", "Archibald", "Provencher", "Tache", "Donald", "Smith", "Fort",
+    "Garry", "Graham", "St. James", "Ness", "Moray", "Roblin", "Assiniboine",
+]
+SUFFIXES = ["Avenue", "Street", "Road", "Boulevard", "Drive"]
+DIRECTIONS = ["Northbound", "Southbound", "Eastbound", "Westbound"]
+
+
+def synthetic_stops(count=5200, seed=1):
+    rng = random.Random(seed)
+    south, west, north, east = CITY_BOUNDS
+    stops = []
+    for n in range(count):
+        street = f"{rng.choice(STREETS)} {rng.choice(SUFFIXES)}"
+        cross = f"{rng.choice(STREETS)} {rng.choice(SUFFIXES)}"
+        direction = rng.choice(DIRECTIONS)
+        stops.append(Stop(
+            str(10000 + n),
+            f"{direction} {street.split()[0]} at {cross.split()[0]}",
+            direction,
+            street,
+            cross,
+            rng.uniform(south, north),
+            rng.uniform(west, east),
+        ))
+    return stops
+
+
+def per_call(func, args_list, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for args in args_list:
+            func(*args)
+    return (time.perf_counter() - start) / (repeat * len(args_list))
+
+
+def main(path=None):
+    stops = StopIndex.load(path).stops if path else synthetic_stops()
+    start = time.perf_counter()
+    index = StopIndex(stops)
+    print(f"{len(index)} stops, index built in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    rng = random.Random(2)
+    names = [rng.choice(stops).name for _ in range(200)]
+    typed = [(name.split()[1][:n],) for name in names for n in (1, 3, 5)]
+    full = [(name,) for name in names]
+    typos = [(name.split()[1][:-1] + "x " + name.split()[-1],) for name in names]
+    points = [(stop.latitude, stop.longitude) for stop in rng.sample(stops, 200)]
+
+    print(f"  prefix search      {per_call(index.search, typed) * 1e6:8.1f} us/query")
+    print(f"  full name search   {per_call(index.search, full) * 1e6:8.1f} us/query")
+    print(f"  fuzzy (typo)       {per_call(index.search, typos) * 1e6:8.1f} us/query")
+    print(f"  nearest k=5        {per_call(index.nearest, points) * 1e6:8.1f} us/query")
+    print(f"  within 500 m       {per_call(index.within, [p + (500,) for p in points]) * 1e6:8.1f} us/query")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
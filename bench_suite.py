@@ -0,0 +1,152 @@
+"""Offline benchmark suite over a fixture corpus, for catching regressions.
+
+Usage: python bench_suite.py [--fixtures DIR] [--save FILE] [--compare FILE] [--tolerance 0.25]
+
+Runs without an API key or network: requests are answered by
+transit_replay from the corpus in --fixtures (record one with
+`python -m transittracker --record fixtures schedule 10758`), or from a
+synthetic corpus of small to very large stops when none is given.
+
+    parse     decode time and peak memory per schedule body, JSON and XML
+    e2e       fetch + parse + render per stop through TransitSession, uncached
+    profile   fetch_schedules over every stop under the lan, slow, flaky and
+              storm network profiles: wall time, failures, throttling
+
+--save writes the timings as JSON; --compare reports every timing more than
+--tolerance slower than a saved run and exits 1 if there is one. The parse
+and e2e cases also run under pytest-benchmark in tests/test_benchmarks.py,
+next to the functional tests in tests/.
+"""
+import argparse
+import contextlib
+import io
+import json
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import transit_http
+from transit_http import create_session, decode_schedule_body, fetch_schedule, fetch_schedules
+from transit_ratelimit import QUOTAS, get_limiter
+from transit_replay import FixtureStore, ReplayAdapter, synthetic_corpus
+from transittracker import print_schedule
+
+SCHEDULE_URL = re.compile(r"/stops/([^/?.]+)/schedule(\.json)?")
+
+
+def best(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def schedules(store):
+    """(stop_id, fmt, body) for every schedule in the corpus, smallest first."""
+    found = []
+    for url in store.urls():
+        match = SCHEDULE_URL.search(url)
+        if match:
+            status, _, body = store.get(url)
+            if status == 200:
+                found.append((match.group(1), "json" if match.group(2) else "xml", body))
+    return sorted(found, key=lambda item: len(item[2]))
+
+
+def parse_cases(store, results):
+    print("parse")
+    for stop_id, fmt, body in schedules(store):
+        seconds = best(lambda: decode_schedule_body(body, fmt))
+        tracemalloc.start()
+        decode_schedule_body(body, fmt)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rows = len(decode_schedule_body(body, fmt)[2])
+        results[f"parse.{stop_id}.{fmt}"] = seconds
+        print(f"  {stop_id} {fmt:<4} {len(body) / 1024:7.1f} KiB {rows:5} rows  "
+              f"{seconds * 1000:8.3f} ms  peak {peak / 1024:8.1f} KiB")
+
+
+def e2e_cases(store, results, rounds=20):
+    print("e2e (fetch + parse + render, uncached)")
+    session = create_session()
+    for stop_id, fmt, body in schedules(store):
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(rounds):
+                    print_schedule(*fetch_schedule(stop_id, session=session, fmt=fmt))
+
+        seconds = best(run, 3) / rounds
+        results[f"e2e.{stop_id}.{fmt}"] = seconds
+        print(f"  {stop_id} {fmt:<4} {seconds * 1000:8.3f} ms/stop  {1 / seconds:8.0f} stops/s")
+    session.close()
+
+
+def profile_cases(store, results, rounds=10, max_concurrency=8):
+    print(f"profile (fetch_schedules, {max_concurrency} at a time)")
+    stop_ids = sorted({stop_id for stop_id, fmt, _ in schedules(store) if fmt == "json"})
+    for name in ("lan", "slow", "flaky", "storm"):
+        adapter = transit_http.TRANSPORT = ReplayAdapter(store, name, seed=1)
+        # A key per profile, so one profile's throttling does not slow the next
+        api_key = f"fixtures-{name}"
+        QUOTAS[api_key] = 50
+        session = create_session(pool_maxsize=max_concurrency)
+        start = time.perf_counter()
+        failed = 0
+        for _ in range(rounds):
+            for result in fetch_schedules(stop_ids, max_concurrency, api_key=api_key, session=session, fmt="json"):
+                failed += result.error is not None
+        elapsed = time.perf_counter() - start
+        session.close()
+        results[f"profile.{name}"] = elapsed
+        limiter = get_limiter(api_key).stats()
+        print(f"  {name:<6} {elapsed:6.2f} s  {len(stop_ids) * rounds} fetches, {failed} failed, "
+              f"{adapter.counts['throttled']} answered 429, {adapter.counts['errors']} answered 500, "
+              f"{adapter.counts['timeouts']} timed out, limiter mean wait {limiter['mean_wait'] * 1000:.0f} ms")
+
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = [
+        (case, baseline[case], seconds) for case, seconds in results.items()
+        if case in baseline and seconds > baseline[case] * (1 + tolerance)
+    ]
+    for case, before, after in regressions:
+        print(f"[WARN] {case} regressed: {before * 1000:.3f} ms -> {after * 1000:.3f} ms ({after / before - 1:+.0%})")
+    if not regressions:
+        print(f"No regressions beyond {tolerance:.0%} against {baseline_path}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", help="fixture corpus directory (default: a synthetic corpus)")
+    parser.add_argument("--save", help="write timings to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier --save to check against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (default: 0.25)")
+    parser.add_argument("--skip-profiles", action="store_true", help="leave out the slower network profiles")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = FixtureStore(args.fixtures) if args.fixtures else synthetic_corpus(tmp)
+        print(f"corpus: {len(store)} responses from {args.fixtures or 'synthetic stub data'}")
+        transit_http.use_fixtures(store.path)
+        results = {}
+        parse_cases(store, results)
+        e2e_cases(store, results)
+        if not args.skip_profiles:
+            profile_cases(store, results)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    return compare(results, args.compare, args.tolerance) if args.compare else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
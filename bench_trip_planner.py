@@ -0,0 +1,74 @@
+"""Query timings for the RAPTOR trip planner over a city-scale network.
+
+Usage: python bench_trip_planner.py [google_transit.zip]
+
+Without an argument bench_gtfs's synthetic feed is generated (5,200 stops,
+90 routes, 72,000 trips); pass the published GTFS zip to plan over the real
+network. Origins and destinations are random stops that some route serves,
+at random times over a week of service; pairs the network cannot connect
+within the round limit are counted but still timed, since proving that
+costs a query too.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from bench_gtfs import synthetic_feed
+from gtfs_index import import_feed
+from trip_planner import TripPlanner, import_network
+
+QUERIES = 1000
+
+
+def main(feed=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        if feed is None:
+            feed = os.path.join(tmp, "feed.zip")
+            rows = synthetic_feed(feed)
+            print(f"synthetic feed: {rows:,} stop times")
+
+        path = os.path.join(tmp, "gtfs")
+        start = time.perf_counter()
+        import_feed(feed, path)
+        counts = import_network(feed, path)
+        print(f"import: {counts['patterns']:,} route patterns, {counts['trips']:,} trips, "
+              f"{counts['walks']:,} walking transfers in {time.perf_counter() - start:.1f} s")
+
+        start = time.perf_counter()
+        planner = TripPlanner(path)
+        print(f"load: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        offsets = planner._stop_pattern_offsets
+        served = [key for i, key in enumerate(planner.timetable.stop_keys) if offsets[i + 1] > offsets[i]]
+        rng = random.Random(3)
+        queries = [
+            (*rng.sample(served, 2), datetime(2026, 10, rng.randint(12, 18), rng.randint(5, 21), rng.randint(0, 59)))
+            for _ in range(QUERIES)
+        ]
+        # Warm the per-day active trip masks so they are not billed to the first query of each day
+        for day in range(12, 19):
+            planner.timetable.active_trips(datetime(2026, 10, day).date())
+
+        timings, legs = [], []
+        for origin, destination, when in queries:
+            start = time.perf_counter()
+            journey = planner.plan(origin, destination, when)
+            timings.append(time.perf_counter() - start)
+            if journey:
+                legs.append(sum(leg.mode == "ride" for leg in journey))
+        timings.sort()
+        print(f"{len(queries)} queries over {len(served):,} served stops, {len(legs)} connected")
+        p95 = timings[int(len(timings) * 0.95)]
+        print(f"  p50 {statistics.median(timings) * 1000:.2f} ms, p95 {p95 * 1000:.2f} ms, "
+              f"max {timings[-1] * 1000:.2f} ms")
+        if legs:
+            print(f"  rides per journey: mean {statistics.mean(legs):.1f}, max {max(legs)}")
+        planner.close()
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,194 @@
+"""Departure board: the next departures across many stops, merged by time.
+
+    python -m transittracker board 10758 10759 10760 -n 15
+    python -m transittracker board --near 49.8954,-97.1385 --radius 400 --watch
+
+Each stop keeps its scheduled stops in a list sorted by (departure, stop,
+trip), using the estimated departure when there is one and the scheduled
+one otherwise. The board is a heapq.merge over those lists, so the top N
+costs O(N log k) for k stops whatever their total size. Updates arrive as
+StopWatcher changes (or are diffed from a fresh fetch) and only re-slot the
+trips that changed, bisecting them out of and into their stop's list; the
+cached top N is kept unless a change lands at or above its last entry.
+"""
+import heapq
+import threading
+from bisect import bisect_left, insort
+from collections import namedtuple
+from datetime import datetime
+from itertools import islice
+
+from stop_watcher import REMOVED, diff_schedules
+from transit_model import NA
+
+DEFAULT_SIZE = 20
+DEFAULT_RADIUS = 400
+
+# when is a datetime; stop is the StopInfo of stop_id
+Departure = namedtuple("Departure", "when stop_id stop record")
+
+
+def departure_time(record):
+    """Estimated departure of a ScheduledStop, else scheduled, as a datetime; None if it has neither."""
+    text = record.departure_estimated if record.departure_estimated != NA else record.departure_scheduled
+    if text == NA:
+        return None
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return None
+
+
+def stops_near(latitude, longitude, radius=DEFAULT_RADIUS, api_key=None, session=None, base_url=None):
+    """Keys of the stops within radius metres, nearest first; from the stop index when one is built."""
+    import stop_index
+
+    index = stop_index.load_default()
+    if index is not None:
+        return [stop.key for _, stop in index.within(latitude, longitude, radius)]
+    from transit_http import fetch_stops_near
+
+    return [stop.key for stop in fetch_stops_near(latitude, longitude, radius, api_key, session, base_url)]
+
+
+class DepartureBoard:
+    def __init__(self, stop_ids=(), size=DEFAULT_SIZE, max_concurrency=16, api_key=None, session=None,
+                 base_url=None, fmt=None):
+        self.stop_ids = [str(stop_id) for stop_id in stop_ids]
+        self.size = size
+        self.max_concurrency = max_concurrency
+        self.api_key = api_key
+        self.session = session
+        self.base_url = base_url
+        self.fmt = fmt
+        self._lock = threading.Lock()
+        # stop_id -> sorted [(when, stop_id, trip_key)]
+        self._lists = {}
+        # stop_id -> {trip_key: ScheduledStop}
+        self._snapshots = {}
+        self._stops = {}
+        # The merged top self.size, or None once a change has touched it
+        self._top = None
+        self.moved = 0
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._lists.values())
+
+    def _remove(self, entries, entry):
+        i = bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+
+    def _touches_top(self, entry):
+        top = self._top
+        if top is None or len(top) < self.size:
+            return True
+        last = top[-1]
+        return entry <= (last.when, last.stop_id, last.record.trip_key)
+
+    def apply(self, stop_id, stop, changes):
+        """Re-slot the trips in changes; a StopWatcher subscriber, so safe to call from its thread."""
+        stop_id = str(stop_id)
+        with self._lock:
+            entries = self._lists.setdefault(stop_id, [])
+            snapshot = self._snapshots.setdefault(stop_id, {})
+            if stop is not None:
+                self._stops[stop_id] = stop
+            for change in changes:
+                record = change.record
+                # Look the old record up rather than trusting change.previous, so replays are harmless
+                old = snapshot.pop(record.trip_key, None)
+                old_when = departure_time(old) if old is not None else None
+                new_when = departure_time(record) if change.kind != REMOVED else None
+                if change.kind != REMOVED:
+                    snapshot[record.trip_key] = record
+                if old_when == new_when and old_when is not None:
+                    # Same slot, new record (e.g. an arrival estimate moved)
+                    if self._touches_top((new_when, stop_id, record.trip_key)):
+                        self._top = None
+                    continue
+                if old_when is not None:
+                    entry = (old_when, stop_id, record.trip_key)
+                    self._remove(entries, entry)
+                    if self._touches_top(entry):
+                        self._top = None
+                if new_when is not None:
+                    entry = (new_when, stop_id, record.trip_key)
+                    insort(entries, entry)
+                    if self._touches_top(entry):
+                        self._top = None
+                self.moved += 1
+
+    def update(self, stop_id, stop, scheduled):
+        """Bring stop_id to a freshly fetched schedule; returns the ScheduleChanges applied."""
+        stop_id = str(stop_id)
+        with self._lock:
+            previous = dict(self._snapshots.get(stop_id, {}))
+        changes = diff_schedules(previous, {record.trip_key: record for record in scheduled})
+        if changes or stop_id not in self._lists:
+            self.apply(stop_id, stop, changes)
+        return changes
+
+    def remove(self, stop_id):
+        stop_id = str(stop_id)
+        with self._lock:
+            self._lists.pop(stop_id, None)
+            self._snapshots.pop(stop_id, None)
+            self._stops.pop(stop_id, None)
+            self._top = None
+        if stop_id in self.stop_ids:
+            self.stop_ids.remove(stop_id)
+
+    def _merge(self, n, after=None):
+        lists = self._lists.values()
+        if after is not None:
+            lists = [entries[bisect_left(entries, (after,)):] for entries in lists]
+        return [
+            Departure(when, stop_id, self._stops.get(stop_id), self._snapshots[stop_id][trip_key])
+            for when, stop_id, trip_key in islice(heapq.merge(*lists), n)
+        ]
+
+    def top(self, n=None, after=None):
+        """The next n Departures across every stop, soonest first, leaving out any before after."""
+        n = self.size if n is None else n
+        with self._lock:
+            if self._top is None:
+                self._top = self._merge(self.size)
+            board = self._top
+            if after is not None:
+                board = board[bisect_left([departure.when for departure in board], after):]
+            # The cache holds everything there is, or enough of it
+            if len(board) >= n or len(self._top) < self.size:
+                return board[:n]
+            return self._merge(n, after)
+
+    def refresh_bound(self):
+        """Least seconds an uncached refresh() takes under the API quota: the limiter's burst, then its rate."""
+        from transit_http import resolve_api_key
+        from transit_ratelimit import get_limiter
+
+        limiter = get_limiter(resolve_api_key(self.api_key))
+        return max(0, len(self.stop_ids) - limiter.burst) / limiter.rate
+
+    def refresh(self):
+        """Fetch every stop concurrently and apply what changed; returns (changes, [failed ScheduleResult])."""
+        from transit_http import fetch_schedules
+
+        changed, failed = 0, []
+        for result in fetch_schedules(self.stop_ids, self.max_concurrency, self.api_key, self.session,
+                                      self.base_url, fmt=self.fmt):
+            if result.error is not None:
+                failed.append(result)
+                continue
+            changed += len(self.update(result.stop_id, result.stop, result.scheduled))
+        return changed, failed
+
+    def follow(self, watcher):
+        """Keep the board current from a StopWatcher, which then polls every stop on the board."""
+        watcher.subscribe(self._on_changes)
+        for stop_id in self.stop_ids:
+            watcher.watch(stop_id)
+
+    def _on_changes(self, stop_id, stop, changes):
+        if stop_id in self.stop_ids:
+            self.apply(stop_id, stop, changes)
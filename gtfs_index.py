@@ -0,0 +1,290 @@
+"""Offline departure index built from the GTFS static feed.
+
+    python gtfs_index.py google_transit.zip        # writes txt/gtfs/
+    GtfsIndex().departures("10758", limit=10)
+
+stop_times.txt (millions of rows) is streamed in chunks and folded into
+one sorted run of departures per stop, written as flat uint32 arrays that
+are memory-mapped on load. "Next N departures at stop X" is then a bisect
+into that stop's run and a short walk skipping trips whose service is not
+running that day; nothing is parsed at startup. Routes, trips and service
+calendars go in a small JSON side file.
+
+Departures come back as ScheduledStop records carrying scheduled times
+only; overlay_realtime() fills in estimates from an API schedule for the
+trips it knows about, so the API is only needed for the real-time part.
+"""
+import bisect
+import csv
+import io
+import itertools
+import json
+import mmap
+import os
+import struct
+import sys
+import zipfile
+from array import array
+from datetime import datetime, time, timedelta
+
+from transit_model import NA, ScheduledStop
+
+GTFS_INDEX_PATH = "txt/gtfs"
+DEPARTURES_FILE = "departures.bin"
+TABLES_FILE = "tables.json"
+
+# magic, stop count, departure count; then uint32 offsets[stops + 1],
+# times[departures] (seconds after service-day midnight), trips[departures]
+MAGIC = b"TTGTFS1\0"
+HEADER = struct.Struct("<8sII")
+
+CHUNK_ROWS = 10_000
+DAY = 24 * 60 * 60
+
+
+def _open_table(feed, name):
+    """A text stream over one file of a GTFS zip or directory, or None if the feed lacks it."""
+    if isinstance(feed, zipfile.ZipFile):
+        try:
+            raw = feed.open(name)
+        except KeyError:
+            return None
+        return io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+    path = os.path.join(feed, name)
+    if not os.path.exists(path):
+        return None
+    return open(path, encoding="utf-8-sig", newline="")
+
+
+def _table(feed, name):
+    stream = _open_table(feed, name)
+    if stream is None:
+        return []
+    with stream:
+        return list(csv.DictReader(stream))
+
+
+class _Seconds(dict):
+    """"HH:MM:SS" -> seconds, parsed once per distinct time; a feed has far fewer times than rows."""
+
+    def __missing__(self, text):
+        # GTFS times run past 24:00:00 for trips that finish after midnight
+        hours, minutes, seconds = text.strip().split(":")
+        value = self[text] = int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+        return value
+
+
+def _read_services(feed):
+    """{service_id: [start, end, weekday mask, added dates, removed dates]}, dates as yyyymmdd ints."""
+    services = {}
+    for row in _table(feed, "calendar.txt"):
+        days = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+        mask = sum(1 << i for i, day in enumerate(days) if row[day].strip() == "1")
+        services[row["service_id"]] = [int(row["start_date"]), int(row["end_date"]), mask, [], []]
+    for row in _table(feed, "calendar_dates.txt"):
+        # Services defined only by calendar_dates run on exactly their added dates
+        service = services.setdefault(row["service_id"], [0, 0, 0, [], []])
+        service[3 if row["exception_type"].strip() == "1" else 4].append(int(row["date"]))
+    return services
+
+
+def import_feed(source, path=GTFS_INDEX_PATH, chunk_rows=CHUNK_ROWS):
+    """Build the index under path from a GTFS zip or directory; returns import counts."""
+    feed = zipfile.ZipFile(source) if zipfile.is_zipfile(source) else source
+    try:
+        stops = _table(feed, "stops.txt")
+        stop_ids = {row["stop_id"]: i for i, row in enumerate(stops)}
+        # Riders know stops by stop_code where the feed has one
+        stop_keys = [row.get("stop_code") or row["stop_id"] for row in stops]
+
+        routes = _table(feed, "routes.txt")
+        route_ids = {row["route_id"]: i for i, row in enumerate(routes)}
+        route_table = [
+            [row.get("route_short_name") or row["route_id"],
+             row.get("route_long_name") or row.get("route_short_name") or NA]
+            for row in routes
+        ]
+
+        services = _read_services(feed)
+        service_ids = {service_id: i for i, service_id in enumerate(services)}
+        trips = _table(feed, "trips.txt")
+        trip_ids = {row["trip_id"]: i for i, row in enumerate(trips)}
+        trip_table = [
+            [row["trip_id"], route_ids.get(row["route_id"], 0),
+             service_ids.setdefault(row["service_id"], len(service_ids)), row.get("trip_headsign") or NA]
+            for row in trips
+        ]
+        for service_id in service_ids:
+            services.setdefault(service_id, [0, 0, 0, [], []])
+
+        # Each stop's departures packed as time << 32 | trip, so sorting orders by time
+        per_stop = [array("Q") for _ in stops]
+        seconds = _Seconds()
+        rows = skipped = 0
+        stream = _open_table(feed, "stop_times.txt")
+        with stream:
+            reader = csv.reader(stream)
+            header = next(reader)
+            trip_col, time_col, stop_col = (header.index(name) for name in ("trip_id", "departure_time", "stop_id"))
+            # Hot loop over millions of rows: bound methods held in locals
+            stop_of, trip_of = stop_ids.get, trip_ids.get
+            for chunk in iter(lambda: list(itertools.islice(reader, chunk_rows)), []):
+                for row in chunk:
+                    stop = stop_of(row[stop_col])
+                    trip = trip_of(row[trip_col])
+                    departs = row[time_col]
+                    # Untimed (interpolated) stops and dangling ids have no departure to index
+                    if stop is None or trip is None or not departs:
+                        skipped += 1
+                        continue
+                    per_stop[stop].append(seconds[departs] << 32 | trip)
+                rows += len(chunk)
+    finally:
+        if isinstance(feed, zipfile.ZipFile):
+            feed.close()
+
+    os.makedirs(path, exist_ok=True)
+    offsets = array("I", [0])
+    for i, departures in enumerate(per_stop):
+        per_stop[i] = array("Q", sorted(departures))
+        offsets.append(offsets[-1] + len(departures))
+    departures_path = os.path.join(path, DEPARTURES_FILE)
+    with open(departures_path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(stops), offsets[-1]))
+        offsets.tofile(f)
+        for departures in per_stop:
+            array("I", [packed >> 32 for packed in departures]).tofile(f)
+        for departures in per_stop:
+            array("I", [packed & 0xFFFFFFFF for packed in departures]).tofile(f)
+    os.replace(departures_path + ".tmp", departures_path)
+
+    tables = {
+        "stops": stop_keys,
+        "stop_ids": [row["stop_id"] for row in stops],
+        "routes": route_table,
+        "trips": trip_table,
+        "services": list(services.values()),
+    }
+    with open(os.path.join(path, TABLES_FILE), "w") as f:
+        json.dump(tables, f, separators=(",", ":"))
+    return {"stop_times": rows, "indexed": offsets[-1], "skipped": skipped, "stops": len(stops), "trips": len(trips)}
+
+
+class GtfsIndex:
+    def __init__(self, path=GTFS_INDEX_PATH):
+        with open(os.path.join(path, TABLES_FILE)) as f:
+            tables = json.load(f)
+        self.stop_keys = tables["stops"]
+        self._stop_index = {key: i for i, key in enumerate(tables["stop_ids"])}
+        self._stop_index.update((key, i) for i, key in enumerate(self.stop_keys))
+        self.routes = tables["routes"]
+        self.trips = tables["trips"]
+        self.services = [(start, end, mask, set(added), set(removed))
+                         for start, end, mask, added, removed in tables["services"]]
+        self._active_by_day = {}
+
+        self._file = open(os.path.join(path, DEPARTURES_FILE), "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, stop_count, count = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a departure index")
+        view = memoryview(self._map)
+        start = HEADER.size
+        self._offsets = view[start:start + 4 * (stop_count + 1)].cast("I")
+        start += 4 * (stop_count + 1)
+        self._times = view[start:start + 4 * count].cast("I")
+        self._trips = view[start + 4 * count:start + 8 * count].cast("I")
+
+    def __len__(self):
+        return len(self._times)
+
+    def close(self):
+        # The views must go before the map they point into
+        for view in (self._offsets, self._times, self._trips):
+            view.release()
+        self._map.close()
+        self._file.close()
+
+    def stop_position(self, stop_id):
+        """Row of stop_id (stop code or GTFS stop_id) in the index, or None."""
+        return self._stop_index.get(str(stop_id))
+
+    def active_trips(self, day):
+        """bytearray with 1 for each trip whose service runs on day."""
+        active = self._active_by_day.get(day)
+        if active is None:
+            ymd = day.year * 10000 + day.month * 100 + day.day
+            weekday = day.weekday()
+            running = bytearray(len(self.services))
+            for i, (start, end, mask, added, removed) in enumerate(self.services):
+                in_calendar = start <= ymd <= end and mask >> weekday & 1
+                running[i] = ymd in added or (in_calendar and ymd not in removed)
+            active = self._active_by_day[day] = bytearray(running[trip[2]] for trip in self.trips)
+        return active
+
+    def _walk(self, day, shift, start, stop):
+        # (seconds after the query day's midnight, trip) for trips running on day
+        active = self.active_trips(day)
+        times = self._times
+        trips = self._trips
+        for j in range(start, stop):
+            trip = trips[j]
+            if active[trip]:
+                yield times[j] + shift, trip
+
+    def departures(self, stop_id, when=None, limit=10):
+        """The next limit scheduled departures at stop_id from when (default now), as ScheduledStops."""
+        i = self.stop_position(stop_id)
+        if i is None:
+            return []
+        when = when or datetime.now()
+        midnight = datetime.combine(when.date(), time())
+        now = int((when - midnight).total_seconds())
+        lo, hi = self._offsets[i], self._offsets[i + 1]
+        candidates = []
+        # Yesterday's service still running past midnight (25:10:00), then today's,
+        # then tomorrow's only if today runs out
+        for day in (-1, 0, 1):
+            if day == 1 and len(candidates) >= limit:
+                break
+            start = bisect.bisect_left(self._times, now - day * DAY, lo, hi)
+            walk = self._walk(when.date() + timedelta(days=day), day * DAY, start, hi)
+            candidates.extend(itertools.islice(walk, limit))
+            candidates.sort()
+        found = []
+        for departs, trip in candidates[:limit]:
+            trip_id, route, _, _ = self.trips[trip]
+            route_key, route_name = self.routes[route]
+            scheduled = (midnight + timedelta(seconds=departs)).isoformat(timespec="seconds")
+            found.append(ScheduledStop(route_key, route_name, NA, trip_id, NA, NA, scheduled, NA))
+        return found
+
+
+def overlay_realtime(departures, scheduled):
+    """departures with the API's estimates filled in wherever scheduled has the same trip key."""
+    live = {record.trip_key: record for record in scheduled}
+    merged = []
+    for departure in departures:
+        record = live.get(departure.trip_key)
+        if record is not None:
+            departure = departure._replace(
+                key=record.key,
+                arrival_scheduled=record.arrival_scheduled,
+                arrival_estimated=record.arrival_estimated,
+                departure_estimated=record.departure_estimated,
+            )
+        merged.append(departure)
+    return merged
+
+
+def load_default():
+    """The imported index, or None if no feed has been imported yet."""
+    if not os.path.exists(os.path.join(GTFS_INDEX_PATH, DEPARTURES_FILE)):
+        return None
+    return GtfsIndex(GTFS_INDEX_PATH)
+
+
+if __name__ == "__main__":
+    counts = import_feed(sys.argv[1])
+    print(f"Indexed {counts['indexed']} of {counts['stop_times']} stop times "
+          f"at {counts['stops']} stops into {GTFS_INDEX_PATH}")
@@ -0,0 +1,233 @@
+"""Push feed of departure changes for wall displays, over server-sent events.
+
+    python -m transittracker feed --port 8643
+    curl -N 'http://127.0.0.1:8643/feed?stops=10758,10759&routes=11,16'
+
+Each watched stop is polled by one StopWatcher however many clients
+subscribe to it, and the first subscriber to a stop starts its polling,
+the last to leave stops it. A client first gets a "snapshot" event per stop
+it has state for, then "update" events only when trips appear, disappear
+or their estimated times move:
+
+    event: update
+    data: {"stop":"10758","at":1792483200.1,"added":[ROW...],"changed":[ROW...],"removed":[[route,trip]...]}
+
+where ROW is [route_key, trip_key, arrival_scheduled, arrival_estimated,
+departure_scheduled, departure_estimated] and "at" is when the server saw
+the change. Updates are keyed by trip, so applying one twice is harmless.
+Every payload is encoded once per distinct route filter and written to all
+matching clients; clients that stop reading are dropped rather than
+buffered for. GET /stats reports subscribers and traffic, GET /metrics the
+transit_metrics registry (the watcher's fetches) in Prometheus text.
+
+Connections are coroutines on a single asyncio loop, so one process holds
+thousands of subscribers; the watcher's thread hands changes to the loop.
+"""
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import transit_metrics
+from stop_watcher import ADDED, CHANGED, REMOVED
+
+FEED_PORT = 8643
+# Comment line sent to idle clients so proxies keep the stream open
+HEARTBEAT = 15
+# A client this far behind on reading is disconnected
+MAX_BUFFER = 256 * 1024
+
+SSE_HEADERS = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: text/event-stream\r\n"
+    b"Cache-Control: no-cache\r\n"
+    b"Access-Control-Allow-Origin: *\r\n"
+    b"\r\n"
+)
+
+
+def _row(record):
+    return [record.route_key, record.trip_key, record.arrival_scheduled, record.arrival_estimated,
+            record.departure_scheduled, record.departure_estimated]
+
+
+def _estimates_moved(change):
+    return (change.record.arrival_estimated != change.previous.arrival_estimated
+            or change.record.departure_estimated != change.previous.departure_estimated)
+
+
+def _event(name, payload):
+    return f"event: {name}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n".encode("utf-8")
+
+
+class _Subscriber:
+    __slots__ = ("writer", "stops", "routes", "closed")
+
+    def __init__(self, writer, stops, routes):
+        self.writer = writer
+        self.stops = stops
+        self.routes = routes
+        self.closed = False
+
+    def send(self, data):
+        if self.closed:
+            return
+        self.writer.write(data)
+        if self.writer.transport.get_write_buffer_size() > MAX_BUFFER:
+            self.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.writer.close()
+
+
+class LiveFeed:
+    def __init__(self, watcher):
+        self.watcher = watcher
+        self.watcher.subscribe(self._on_changes)
+        self._by_stop = {}
+        self._loop = None
+        self.subscribers = 0
+        self.events = 0
+        self.bytes_sent = 0
+
+    def stats(self):
+        return {
+            "subscribers": self.subscribers,
+            "stops": len(self._by_stop),
+            "events": self.events,
+            "bytes_sent": self.bytes_sent,
+            "upstream_fetches": self.watcher.fetches,
+            "upstream_unchanged": self.watcher.unchanged,
+        }
+
+    async def start(self, host="127.0.0.1", port=FEED_PORT):
+        """Start listening on the running loop; returns the asyncio server."""
+        self._loop = asyncio.get_running_loop()
+        return await asyncio.start_server(self._handle, host, port, backlog=1024)
+
+    def _on_changes(self, stop_id, stop, changes):
+        # Watcher thread: hand over to the loop, which owns all subscriber state
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._publish, stop_id, changes, time.time())
+
+    def _publish(self, stop_id, changes, at):
+        subscribers = self._by_stop.get(stop_id)
+        if not subscribers:
+            return
+        changes = [c for c in changes if c.kind != CHANGED or _estimates_moved(c)]
+        if not changes:
+            return
+        encoded = {}
+        for subscriber in list(subscribers):
+            data = encoded.get(subscriber.routes)
+            if data is None:
+                data = encoded[subscriber.routes] = self._update(stop_id, changes, subscriber.routes, at)
+            if data:
+                subscriber.send(data)
+                self.events += 1
+                self.bytes_sent += len(data)
+
+    def _update(self, stop_id, changes, routes, at):
+        payload = {"stop": stop_id, "at": round(at, 3)}
+        for change in changes:
+            if routes is not None and change.record.route_key not in routes:
+                continue
+            if change.kind == REMOVED:
+                payload.setdefault("removed", []).append([change.record.route_key, change.record.trip_key])
+            else:
+                payload.setdefault("added" if change.kind == ADDED else "changed", []).append(_row(change.record))
+        return _event("update", payload) if len(payload) > 2 else b""
+
+    def _snapshot(self, stop_id, routes):
+        rows = [_row(record) for record in self.watcher.snapshot(stop_id).values()
+                if routes is None or record.route_key in routes]
+        return _event("snapshot", {"stop": stop_id, "at": round(time.time(), 3), "departures": rows})
+
+    def _add(self, subscriber):
+        self.subscribers += 1
+        for stop_id in subscriber.stops:
+            subscribers = self._by_stop.setdefault(stop_id, set())
+            if not subscribers:
+                self.watcher.watch(stop_id)
+            elif self.watcher.snapshot(stop_id):
+                subscriber.send(self._snapshot(stop_id, subscriber.routes))
+            subscribers.add(subscriber)
+
+    def _remove(self, subscriber):
+        self.subscribers -= 1
+        for stop_id in subscriber.stops:
+            subscribers = self._by_stop.get(stop_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._by_stop[stop_id]
+                self.watcher.unwatch(stop_id)
+
+    async def _handle(self, reader, writer):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+            writer.close()
+            return
+        method, _, rest = head.decode("latin-1").partition(" ")
+        parts = urlsplit(rest.partition(" ")[0])
+        query = parse_qs(parts.query)
+        stops = tuple(dict.fromkeys(s for s in ",".join(query.get("stops", [])).split(",") if s))
+
+        if method != "GET":
+            self._reply(writer, 405, b"method not allowed")
+        elif parts.path == "/stats":
+            self._reply(writer, 200, json.dumps(self.stats()).encode("utf-8"), "application/json")
+        elif parts.path == "/metrics":
+            self._reply(writer, 200, transit_metrics.prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+        elif parts.path != "/feed" or not stops:
+            self._reply(writer, 404, b"use /feed?stops=10758,10759[&routes=11,16]")
+        else:
+            routes = frozenset(r for r in ",".join(query.get("routes", [])).split(",") if r) or None
+            await self._stream(reader, writer, _Subscriber(writer, stops, routes))
+            return
+        writer.close()
+
+    def _reply(self, writer, status, body, content_type="text/plain"):
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+            .encode("latin-1") + body
+        )
+
+    async def _stream(self, reader, writer, subscriber):
+        writer.write(SSE_HEADERS)
+        self._add(subscriber)
+        try:
+            while not subscriber.closed:
+                # Nothing is expected from the client; EOF means it went away
+                try:
+                    if not await asyncio.wait_for(reader.read(1024), HEARTBEAT):
+                        break
+                except asyncio.TimeoutError:
+                    subscriber.send(b": ping\n\n")
+        except ConnectionError:
+            pass
+        finally:
+            self._remove(subscriber)
+            subscriber.close()
+
+    def run(self, host="127.0.0.1", port=FEED_PORT):
+        """Poll and serve in the foreground until interrupted."""
+        async def main():
+            server = await self.start(host, port)
+            print(f"Live feed on http://{host}:{port}/feed?stops=... (Ctrl+C to stop)")
+            async with server:
+                await server.serve_forever()
+
+        transit_metrics.enable()
+        self.watcher.start()
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.watcher.stop()
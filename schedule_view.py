@@ -0,0 +1,113 @@
+"""Virtualized Treeview table for stop schedules.
+
+The view owns a fixed pool of Treeview rows, one per visible line, and maps
+them onto a window of the full row list as the user scrolls. A schedule is
+handed over in one batch with set_schedule; only pooled cells whose text
+actually changed are pushed to Tk, so refreshing a 500-row schedule where a
+handful of estimates moved costs a handful of cell updates.
+"""
+from tkinter import ttk
+
+import transit_metrics
+
+COLUMNS = ("route", "stop", "trip", "arrival", "arrival_est", "departure", "departure_est")
+HEADINGS = ("Route", "Stop", "Trip", "Arrival", "Est.", "Departure", "Est.")
+WIDTHS = (110, 90, 80, 80, 80, 80, 80)
+
+
+def _clock(text):
+    # "2026-10-18T08:15:40" -> "08:15:40"; anything else is shown as-is
+    return text.rpartition("T")[2]
+
+
+def row_values(record):
+    return (
+        f"{record.route_key} {record.route_name}",
+        record.key,
+        record.trip_key,
+        _clock(record.arrival_scheduled),
+        _clock(record.arrival_estimated),
+        _clock(record.departure_scheduled),
+        _clock(record.departure_estimated),
+    )
+
+
+class ScheduleView(ttk.Frame):
+    def __init__(self, master, visible_rows=20):
+        super().__init__(master)
+        self.tree = ttk.Treeview(self, columns=COLUMNS, show="headings", height=visible_rows, selectmode="none")
+        for column, heading, width in zip(COLUMNS, HEADINGS, WIDTHS):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width, stretch=column == "route")
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scroll)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+
+        self._items = [self.tree.insert("", "end") for _ in range(visible_rows)]
+        for item in self._items:
+            self.tree.detach(item)
+        # What each pooled item currently shows, so unchanged cells are skipped
+        self._shown = [None] * visible_rows
+        self._attached = 0
+        self._rows = []
+        self._top = 0
+        self.cell_updates = 0
+
+        for widget in (self.tree, self.scrollbar):
+            widget.bind("<MouseWheel>", self._on_wheel)
+            widget.bind("<Button-4>", lambda event: self.scroll_to(self._top - 3))
+            widget.bind("<Button-5>", lambda event: self.scroll_to(self._top + 3))
+
+    def set_schedule(self, scheduled):
+        """Show ScheduledStop records; keeps the scroll position where possible."""
+        with transit_metrics.timed("transit_render_seconds", "gui"):
+            self._rows = [row_values(record) for record in scheduled]
+            self.scroll_to(self._top)
+
+    def scroll_to(self, top):
+        self._top = max(0, min(top, len(self._rows) - len(self._items)))
+        self._render()
+
+    def _render(self):
+        visible = min(len(self._items), len(self._rows) - self._top)
+        # Attach or detach pooled items only when the row count changes
+        while self._attached < visible:
+            self.tree.reattach(self._items[self._attached], "", self._attached)
+            self._attached += 1
+        while self._attached > visible:
+            self._attached -= 1
+            self.tree.detach(self._items[self._attached])
+            self._shown[self._attached] = None
+
+        for slot in range(visible):
+            values = self._rows[self._top + slot]
+            shown = self._shown[slot]
+            if values == shown:
+                continue
+            item = self._items[slot]
+            if shown is None:
+                self.tree.item(item, values=values)
+                self.cell_updates += len(values)
+            else:
+                for column, value, old in zip(COLUMNS, values, shown):
+                    if value != old:
+                        self.tree.set(item, column, value)
+                        self.cell_updates += 1
+            self._shown[slot] = values
+
+        if self._rows:
+            self.scrollbar.set(self._top / len(self._rows), (self._top + visible) / len(self._rows))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self._rows)))
+        elif action == "scroll":
+            step = len(self._items) if unit == "pages" else 1
+            self.scroll_to(self._top + int(amount) * step)
+
+    def _on_wheel(self, event):
+        self.scroll_to(self._top - (3 if event.delta > 0 else -3))
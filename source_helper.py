@@ -1,8 +1,21 @@
-api_key_file = "txt/api.txt"
-try:
-    with open(api_key_file, "r") as f:
-        api_key = f.read()
-except FileNotFoundError:
-    print(f"[WARN] {api_key_file} not found!")
-    print(f"You need a file called {api_key_file} with an API key in it")
-    input("Press Enter to continue...")
\ No newline at end of file
+api_key_file = "txt/api.txt"
+_api_key = None
+
+def get_api_key():
+    # Read on first use, not at import, so starting up never touches the disk
+    global _api_key
+    if _api_key is None:
+        try:
+            with open(api_key_file, "r") as f:
+                _api_key = f.read()
+        except FileNotFoundError:
+            print(f"[WARN] {api_key_file} not found!")
+            print(f"You need a file called {api_key_file} with an API key in it")
+            raise
+    return _api_key
+
+def __getattr__(name):
+    # source_helper.api_key still works, it just reads the file lazily
+    if name == "api_key":
+        return get_api_key()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
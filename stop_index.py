@@ -0,0 +1,429 @@
+"""Offline index of every stop for search-as-you-type and nearest-stop lookups.
+
+Build it once from the API (python stop_index.py) and it is saved to
+txt/stops.json; after that name/street search and spatial queries are
+answered locally without touching the network.
+
+StopDirectory keeps one index in memory for a long-running process: it
+comes up from the snapshot (or a parallel bulk fetch when there is none)
+and then re-queries a few location tiles at a time in the background, so
+every tile is revisited once per sweep. New and changed stops are merged
+as they are seen, stops missing for a whole sweep are dropped (unless some
+tile has not answered since), and the snapshot is rewritten whenever
+something changed. A failed tile costs only its own stops and is asked
+again on every step until it answers. Lookups always see a complete index;
+a refresh swaps in a new one.
+"""
+import bisect
+import heapq
+import json
+import math
+import os
+import re
+import sys
+import threading
+from collections import Counter, defaultdict
+
+from transit_model import Stop
+
+STOP_INDEX_PATH = "txt/stops.json"
+
+# Winnipeg (south, west, north, east), tiled with location queries to build the index
+CITY_BOUNDS = (49.75, -97.35, 50.00, -96.95)
+
+CELL_METRES = 250
+EARTH_RADIUS = 6371000
+METRES_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+
+# A full background sweep of every tile takes this long
+SWEEP_SECONDS = 6 * 60 * 60
+# Tiles fetched together on each refresh step
+TILES_PER_STEP = 8
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _normalize(text):
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StopIndex:
+    def __init__(self, stops):
+        self.stops = list(stops)
+        self._by_key = {stop.key: i for i, stop in enumerate(self.stops)}
+        # Shorter names first when several stops match equally well
+        self._rank = [(len(stop.name), stop.name) for stop in self.stops]
+        self._build_text_index()
+        self._build_grid()
+
+    def __len__(self):
+        return len(self.stops)
+
+    def _build_text_index(self):
+        pairs = []
+        self._trigram_postings = defaultdict(list)
+        for i, stop in enumerate(self.stops):
+            text = _normalize(f"{stop.name} {stop.street} {stop.cross_street}")
+            pairs.extend((word, i) for word in set(text.split()))
+            for gram in _trigrams(text):
+                self._trigram_postings[gram].append(i)
+        pairs.sort()
+        self._words = [word for word, _ in pairs]
+        self._word_ids = [i for _, i in pairs]
+
+    def _build_grid(self):
+        located = [stop.latitude for stop in self.stops if stop.latitude is not None]
+        # Cells are square in metres at the city's mean latitude
+        self._cos_lat = math.cos(math.radians(sum(located) / len(located))) if located else 1.0
+        self._grid = defaultdict(list)
+        for i, stop in enumerate(self.stops):
+            if stop.latitude is not None and stop.longitude is not None:
+                self._grid[self._cell(stop.latitude, stop.longitude)].append(i)
+        if self._grid:
+            rows = [cell[0] for cell in self._grid]
+            cols = [cell[1] for cell in self._grid]
+            # (first row, first col, last row, last col) of the occupied cells
+            self._extent = (min(rows), min(cols), max(rows), max(cols))
+        else:
+            self._extent = None
+
+    def _cell(self, latitude, longitude):
+        return (
+            int(latitude * METRES_PER_DEGREE // CELL_METRES),
+            int(longitude * METRES_PER_DEGREE * self._cos_lat // CELL_METRES),
+        )
+
+    def _distance(self, latitude, longitude, stop):
+        # Equirectangular approximation; well under 0.1% error at city scale
+        dy = (stop.latitude - latitude) * METRES_PER_DEGREE
+        dx = (stop.longitude - longitude) * METRES_PER_DEGREE * self._cos_lat
+        return math.hypot(dx, dy)
+
+    def get(self, key):
+        i = self._by_key.get(str(key))
+        return None if i is None else self.stops[i]
+
+    def search(self, query, limit=10):
+        """Stops matching query by stop number, word prefixes, or failing that trigram similarity."""
+        text = _normalize(query)
+        if not text:
+            return []
+        if text in self._by_key:
+            return [self.stops[self._by_key[text]]]
+
+        candidates = None
+        for word in text.split():
+            lo = bisect.bisect_left(self._words, word)
+            hi = bisect.bisect_left(self._words, word + "\x7f")
+            ids = set(self._word_ids[lo:hi])
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                break
+        if candidates:
+            best = heapq.nsmallest(limit, candidates, key=self._rank.__getitem__)
+            return [self.stops[i] for i in best]
+
+        grams = _trigrams(text)
+        counts = Counter()
+        for gram in grams:
+            counts.update(self._trigram_postings.get(gram, ()))
+        threshold = max(2, len(grams) // 3)
+        best = heapq.nlargest(limit, (i for i, n in counts.items() if n >= threshold), key=counts.__getitem__)
+        return [self.stops[i] for i in best]
+
+    def nearest(self, latitude, longitude, k=5):
+        """The k closest stops as (distance_m, Stop), nearest first."""
+        if self._extent is None:
+            return []
+        row, col = self._cell(latitude, longitude)
+        first_row, first_col, last_row, last_col = self._extent
+        # Rings are counted from the query cell, which may lie well outside the indexed area:
+        # start at the first ring that reaches it and stop once one has covered all of it
+        nearest_ring = max(0, first_row - row, row - last_row, first_col - col, col - last_col)
+        farthest_ring = max(row - first_row, last_row - row, col - first_col, last_col - col)
+        found = []
+        for ring in range(nearest_ring, farthest_ring + 1):
+            for r, c in self._ring_cells(row, col, ring):
+                for i in self._grid.get((r, c), ()):
+                    found.append((self._distance(latitude, longitude, self.stops[i]), i))
+            # Every stop not yet seen is at least ring cells away
+            if len(found) >= k and heapq.nsmallest(k, found)[-1][0] <= ring * CELL_METRES:
+                break
+        return [(distance, self.stops[i]) for distance, i in heapq.nsmallest(k, found)]
+
+    def _ring_cells(self, row, col, ring):
+        """Cells exactly ring cells from (row, col), clipped to the occupied extent."""
+        first_row, first_col, last_row, last_col = self._extent
+        cols = range(max(col - ring, first_col), min(col + ring, last_col) + 1)
+        for r in {row - ring, row + ring}:
+            if first_row <= r <= last_row:
+                for c in cols:
+                    yield r, c
+        rows = range(max(row - ring + 1, first_row), min(row + ring - 1, last_row) + 1)
+        for c in {col - ring, col + ring} if ring else ():
+            if first_col <= c <= last_col:
+                for r in rows:
+                    yield r, c
+
+    def within(self, latitude, longitude, radius):
+        """Stops within radius metres as (distance_m, Stop), nearest first."""
+        row, col = self._cell(latitude, longitude)
+        span = int(radius // CELL_METRES) + 1
+        found = []
+        for r in range(row - span, row + span + 1):
+            for c in range(col - span, col + span + 1):
+                for i in self._grid.get((r, c), ()):
+                    distance = self._distance(latitude, longitude, self.stops[i])
+                    if distance <= radius:
+                        found.append((distance, i))
+        found.sort()
+        return [(distance, self.stops[i]) for distance, i in found]
+
+    def save(self, path=STOP_INDEX_PATH):
+        with open(path, "w") as f:
+            json.dump([list(stop) for stop in self.stops], f)
+
+    @classmethod
+    def load(cls, path=STOP_INDEX_PATH):
+        with open(path, "r") as f:
+            return cls(_compact(Stop(*row)) for row in json.load(f))
+
+
+def _intern(text):
+    return sys.intern(text) if isinstance(text, str) else text
+
+
+def _compact(stop):
+    # Directions and street names repeat across thousands of stops; share one copy of each
+    return stop._replace(
+        direction=_intern(stop.direction),
+        street=_intern(stop.street),
+        cross_street=_intern(stop.cross_street),
+    )
+
+
+_DEFAULT = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def load_default():
+    """The saved index, or None if it has not been built yet.
+
+    Loaded once per process; a running StopDirectory keeps it current.
+    """
+    global _DEFAULT
+    if _DEFAULT is None:
+        with _DEFAULT_LOCK:
+            if _DEFAULT is None and os.path.exists(STOP_INDEX_PATH):
+                _DEFAULT = StopIndex.load(STOP_INDEX_PATH)
+    return _DEFAULT
+
+
+def tile_centres(bounds=CITY_BOUNDS, spacing=2000):
+    south, west, north, east = bounds
+    lat_step = spacing / METRES_PER_DEGREE
+    lon_step = spacing / (METRES_PER_DEGREE * math.cos(math.radians((south + north) / 2)))
+    latitude = south
+    while latitude <= north + lat_step / 2:
+        longitude = west
+        while longitude <= east + lon_step / 2:
+            yield round(latitude, 5), round(longitude, 5)
+            longitude += lon_step
+        latitude += lat_step
+
+
+def fetch_tiles(tiles, spacing=2000, api_key=None, max_concurrency=4, base_url=None, session=None, retries=2):
+    """Every stop found by location queries around the tile centres, as ({key: Stop}, {tile: error}).
+
+    A failing tile does not cost the others: it is fetched again, up to
+    retries more times, and the tiles that never answered are returned with
+    their last error next to whatever the rest found.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    import requests
+
+    from transit_http import PARSE_ERRORS, fetch_stops_near
+    from transit_ratelimit import BACKGROUND
+
+    # A circle of this radius covers its whole spacing x spacing tile
+    distance = int(spacing * 0.75)
+    stops = {}
+    failed = {}
+    pending = list(tiles)
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        for _ in range(retries + 1):
+            found = {
+                tile: pool.submit(fetch_stops_near, tile[0], tile[1], distance, api_key, session, base_url,
+                                  priority=BACKGROUND)
+                for tile in pending
+            }
+            failed = {}
+            for tile, future in found.items():
+                try:
+                    tile_stops = future.result()
+                except (requests.RequestException,) + PARSE_ERRORS as exc:
+                    failed[tile] = exc
+                    continue
+                for stop in tile_stops:
+                    stops[stop.key] = _compact(stop)
+            pending = list(failed)
+            if not pending:
+                break
+    return stops, failed
+
+
+def build_from_api(api_key=None, bounds=CITY_BOUNDS, spacing=2000, max_concurrency=4, base_url=None):
+    """Collect every stop in bounds with overlapping location queries."""
+    stops, failed = fetch_tiles(tile_centres(bounds, spacing), spacing, api_key, max_concurrency, base_url)
+    if failed:
+        if not stops:
+            raise next(iter(failed.values()))
+        print(f"[WARN] {len(failed)} tiles failed, their stops are missing: {next(iter(failed.values()))}",
+              file=sys.stderr)
+    return StopIndex(sorted(stops.values(), key=lambda stop: stop.key))
+
+
+class StopDirectory:
+    def __init__(self, path=STOP_INDEX_PATH, api_key=None, bounds=CITY_BOUNDS, spacing=2000,
+                 sweep_seconds=SWEEP_SECONDS, tiles_per_step=TILES_PER_STEP, max_concurrency=4, base_url=None):
+        self.path = path
+        self.api_key = api_key
+        self.spacing = spacing
+        self.sweep_seconds = sweep_seconds
+        self.tiles_per_step = tiles_per_step
+        self.max_concurrency = max_concurrency
+        self.base_url = base_url
+        self.index = None
+        self._session = None
+        self._tiles = list(tile_centres(bounds, spacing))
+        self._next_tile = 0
+        self._sweep = 0
+        # Sweep in which each stop was last returned by some tile
+        self._seen = {}
+        # Tiles whose last query failed, with its error; each refresh step asks them again
+        self.failed = {}
+        self._stopped = threading.Event()
+        self._thread = None
+        self.sweeps = 0
+        self.changes = 0
+
+    def load(self):
+        """The snapshot if there is one, otherwise prefetch()."""
+        if not os.path.exists(self.path):
+            return self.prefetch()
+        self._publish(StopIndex.load(self.path), save=False)
+        return self.index
+
+    def _fetch(self, tiles):
+        if self._session is None:
+            from transit_http import create_session
+            # Uncached: the shared cache keeps location answers for a day, longer than a sweep
+            self._session = create_session(pool_maxsize=self.max_concurrency)
+        return fetch_tiles(tiles, self.spacing, self.api_key, self.max_concurrency, self.base_url, self._session)
+
+    def prefetch(self):
+        """Fetch every tile in parallel and save the result as the snapshot.
+
+        Tiles that still fail after fetch_tiles' retries are left in failed for
+        the refresh steps to fill in; only when no tile answers does it raise.
+        """
+        stops, self.failed = self._fetch(self._tiles)
+        if self.failed and not stops:
+            raise next(iter(self.failed.values()))
+        self._seen = dict.fromkeys(stops, self._sweep)
+        self._publish(StopIndex(sorted(stops.values(), key=lambda stop: stop.key)))
+        return self.index
+
+    def _publish(self, index, save=True):
+        global _DEFAULT
+        self.index = index
+        if self.path == STOP_INDEX_PATH:
+            _DEFAULT = index
+        if save:
+            index.save(self.path)
+
+    def refresh_step(self):
+        """Re-query the next few tiles and merge what they return; returns the number of changed stops."""
+        if self.index is None:
+            self.load()
+            return len(self.index)
+        batch = self._tiles[self._next_tile:self._next_tile + self.tiles_per_step]
+        found, self.failed = self._fetch(batch + [tile for tile in self.failed if tile not in batch])
+        stops = {stop.key: stop for stop in self.index.stops}
+        changed = 0
+        for key, stop in found.items():
+            self._seen[key] = self._sweep
+            if stops.get(key) != stop:
+                stops[key] = stop
+                changed += 1
+
+        self._next_tile += len(batch)
+        if self._next_tile >= len(self._tiles):
+            # A full sweep: whatever no tile returned has been removed upstream, unless a tile that
+            # may still hold it has not answered
+            if not self.failed:
+                gone = [key for key in stops if self._seen.get(key, -1) < self._sweep]
+                for key in gone:
+                    del stops[key]
+                changed += len(gone)
+            self._next_tile = 0
+            self._sweep += 1
+            self.sweeps += 1
+        if changed:
+            self.changes += changed
+            self._publish(StopIndex(sorted(stops.values(), key=lambda stop: stop.key)))
+        return changed
+
+    def _run(self):
+        from transit_http import PARSE_ERRORS
+
+        steps = max(1, -(-len(self._tiles) // self.tiles_per_step))
+        delay = self.sweep_seconds / steps
+        # The first step loads (or fetches) the index straight away
+        wait = 0
+        while not self._stopped.wait(wait):
+            try:
+                self.refresh_step()
+            # requests' errors are OSErrors too
+            except (OSError,) + PARSE_ERRORS as exc:
+                print(f"[WARN] refreshing stops failed: {exc}")
+            else:
+                if self.failed:
+                    print(f"[WARN] {len(self.failed)} stop tiles failed, retrying next step: "
+                          f"{next(iter(self.failed.values()))}")
+            wait = delay
+
+    def start(self):
+        """Load and keep refreshing on a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stop-directory", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._session is not None:
+            self._session.close()
+
+    def get(self, key):
+        index = self.index
+        return index.get(key) if index is not None else None
+
+    def search(self, query, limit=10):
+        index = self.index
+        return index.search(query, limit) if index is not None else None
+
+
+if __name__ == "__main__":
+    index = build_from_api()
+    index.save()
+    print(f"Saved {len(index)} stops to {STOP_INDEX_PATH}")
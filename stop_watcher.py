@@ -0,0 +1,203 @@
+"""Long-running watcher that keeps a set of stop schedules fresh.
+
+Each watched stop is refreshed on its own clock: every quarter of the time
+until its next departure, clamped between min_interval and max_interval, so
+a stop with a bus two minutes out is polled often and a quiet stop at 2 am
+is barely polled at all. A refresh whose body is byte-for-byte unchanged is
+not re-parsed. Otherwise the scheduled stops are diffed by trip key against
+the previous snapshot, and subscribers only hear about trips that appeared,
+disappeared or changed estimates.
+"""
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from transit_http import PARSE_ERRORS, decode_schedule_body, resolve_api_key, schedule_url, shared_session
+from transit_model import NA
+from transit_ratelimit import BACKGROUND
+
+ADDED = "added"
+CHANGED = "changed"
+REMOVED = "removed"
+
+# previous is the old record for CHANGED and REMOVED, None for ADDED
+ScheduleChange = namedtuple("ScheduleChange", "kind record previous")
+
+
+class _Watched:
+    __slots__ = ("digest", "snapshot", "next_due", "stop")
+
+    def __init__(self):
+        self.digest = None
+        self.snapshot = {}
+        self.next_due = 0.0
+        self.stop = None
+
+
+def diff_schedules(previous, current):
+    """ScheduleChanges turning previous into current; both map trip key -> ScheduledStop."""
+    changes = []
+    for trip_key, record in current.items():
+        old = previous.get(trip_key)
+        if old is None:
+            changes.append(ScheduleChange(ADDED, record, None))
+        elif old != record:
+            changes.append(ScheduleChange(CHANGED, record, old))
+    for trip_key, old in previous.items():
+        if trip_key not in current:
+            changes.append(ScheduleChange(REMOVED, old, old))
+    return changes
+
+
+def seconds_until_next_departure(scheduled, now=None):
+    now = now or datetime.now()
+    best = None
+    for record in scheduled:
+        text = record.departure_estimated if record.departure_estimated != NA else record.departure_scheduled
+        if text == NA:
+            continue
+        try:
+            seconds = (datetime.fromisoformat(text) - now).total_seconds()
+        except ValueError:
+            continue
+        if seconds >= 0 and (best is None or seconds < best):
+            best = seconds
+    return best
+
+
+class StopWatcher:
+    def __init__(self, api_key=None, session=None, base_url=None,
+                 min_interval=15, max_interval=600, max_concurrency=4):
+        self.api_key = api_key
+        self.session = session or shared_session()
+        self.base_url = base_url
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_concurrency = max_concurrency
+        self._watched = {}
+        self._subscribers = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self.fetches = 0
+        self.unchanged = 0
+
+    def subscribe(self, callback):
+        """callback(stop_id, stop_info, changes) is called from the watcher thread."""
+        self._subscribers.append(callback)
+
+    def watch(self, stop_id):
+        with self._cond:
+            self._watched.setdefault(str(stop_id), _Watched())
+            self._cond.notify()
+
+    def unwatch(self, stop_id):
+        with self._cond:
+            self._watched.pop(str(stop_id), None)
+
+    def snapshot(self, stop_id):
+        """Latest ScheduledStops for stop_id, keyed by trip key."""
+        with self._cond:
+            watched = self._watched.get(str(stop_id))
+            return dict(watched.snapshot) if watched else {}
+
+    def interval_for(self, scheduled):
+        seconds = seconds_until_next_departure(scheduled)
+        if seconds is None:
+            return self.max_interval
+        return min(self.max_interval, max(self.min_interval, seconds / 4))
+
+    def refresh(self, stop_id):
+        """Fetch stop_id now, notify subscribers of any changes and return them."""
+        stop_id = str(stop_id)
+        url = schedule_url(stop_id, self.api_key, self.base_url)
+        with self.session.get(url, timeout=10, priority=BACKGROUND) as response:
+            response.raise_for_status()
+            body = response.content
+        self.fetches += 1
+
+        with self._cond:
+            watched = self._watched.get(stop_id)
+        if watched is None:
+            return []
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        if digest == watched.digest:
+            self.unchanged += 1
+            watched.next_due = time.monotonic() + self.interval_for(watched.snapshot.values())
+            return []
+
+        stop, _, scheduled = decode_schedule_body(body)
+        if self.session.recorder is not None:
+            self.session.recorder.record(stop_id, scheduled)
+        current = {record.trip_key: record for record in scheduled}
+        changes = diff_schedules(watched.snapshot, current)
+        watched.digest = digest
+        watched.snapshot = current
+        watched.stop = stop
+        watched.next_due = time.monotonic() + self.interval_for(scheduled)
+        if changes:
+            for callback in self._subscribers:
+                # One broken subscriber must not starve the others or kill the watcher thread
+                try:
+                    callback(stop_id, stop, changes)
+                except Exception as exc:
+                    print(f"[WARN] subscriber {getattr(callback, '__qualname__', callback)} failed "
+                          f"for stop {stop_id}: {type(exc).__name__}: {exc}")
+        return changes
+
+    def start(self):
+        self.api_key = resolve_api_key(self.api_key)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="stop-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _due(self):
+        now = time.monotonic()
+        due = [stop_id for stop_id, watched in self._watched.items() if watched.next_due <= now]
+        if due or not self._watched:
+            return due, None
+        return due, min(watched.next_due for watched in self._watched.values()) - now
+
+    def _retry_later(self, stop_id):
+        with self._cond:
+            watched = self._watched.get(stop_id)
+            if watched is not None:
+                watched.next_due = time.monotonic() + self.min_interval
+
+    def _refresh_safely(self, stop_id):
+        try:
+            self.refresh(stop_id)
+        except (requests.RequestException,) + PARSE_ERRORS as exc:
+            print(f"[WARN] refreshing stop {stop_id} failed: {exc}")
+            self._retry_later(stop_id)
+        except Exception as exc:
+            # e.g. a body of the wrong shape; the thread has to outlive it or every stop goes stale
+            print(f"[ERROR] refreshing stop {stop_id} failed unexpectedly: {type(exc).__name__}: {exc}")
+            self._retry_later(stop_id)
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            while True:
+                with self._cond:
+                    due, wait = self._due()
+                    while self._running and not due:
+                        self._cond.wait(wait)
+                        due, wait = self._due()
+                    if not self._running:
+                        return
+                    # Push the due stops out so the next pass doesn't pick them up mid-refresh
+                    for stop_id in due:
+                        self._watched[stop_id].next_due = float("inf")
+                list(pool.map(self._refresh_safely, due))
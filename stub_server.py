@@ -0,0 +1,246 @@
+"""Local stand-in for api.winnipegtransit.com, for offline benchmarks.
+
+    server, base_url = start_stub_server(latency=0.05)
+    fetch_schedules(stop_ids, api_key="stub", base_url=base_url)
+    server.shutdown()
+
+Schedules and stop lists are synthetic but shaped like the real /v4 XML and
+JSON. Stop ids listed in fail_stops answer 500 so per-stop failure handling
+can be exercised. With churn set, every tenth trip's estimates move every
+churn seconds, so watchers and feeds have changes to report.
+"""
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+SCHEDULED_STOP = """<scheduled-stop>
+<key>{trip}-{n}</key><cancelled>false</cancelled>
+<times>
+<arrival><scheduled>2026-10-18T08:{mm:02d}:00</scheduled><estimated>2026-10-18T08:{mm:02d}:{ss:02d}</estimated></arrival>
+<departure><scheduled>2026-10-18T08:{mm:02d}:00</scheduled><estimated>2026-10-18T08:{mm:02d}:{ss:02d}</estimated></departure>
+</times>
+<variant><key>{route}-0-D</key><name>Downtown</name></variant>
+<bus><key>{bus}</key><bike-rack>true</bike-rack><wifi>false</wifi></bus>
+<trip-key>{trip}</trip-key>
+</scheduled-stop>
+"""
+
+SCHEDULE_PATH = re.compile(r"^/v4/stops/([^/?.]+)/schedule(\.json)?")
+# Stop search (/v4/stops:portage) and location queries (/v4/stops?lat=...)
+STOPS_PATH = re.compile(r"^/v4/stops(:[^/?.]+)?(\.json)?(\?|$)")
+
+
+def _estimate_seconds(n, revision):
+    return (40 + (revision if n % 10 == 0 else 0)) % 60
+
+
+def make_schedule(routes, stops_per_route, stop_id="10758", revision=0):
+    parts = [
+        "<?xml version='1.0' encoding='UTF-8'?><stop-schedule><stop>"
+        f"<key>{stop_id}</key><name>Northbound Portage at Main</name><number>{stop_id}</number>"
+        "<direction>Northbound</direction><side>Nearside</side>"
+        "<street><key>2715</key><name>Portage Avenue</name><type>Avenue</type></street>"
+        "<cross-street><key>2265</key><name>Main Street</name><type>Street</type></cross-street>"
+        "<centre><geographic><latitude>49.89</latitude><longitude>-97.13</longitude></geographic></centre>"
+        "</stop><route-schedules>"
+    ]
+    for r in range(routes):
+        parts.append(
+            f"<route-schedule><route><key>{r}</key><number>{r}</number>"
+            f"<name>Route {r}</name><customer-type>regular</customer-type>"
+            "<coverage>regular</coverage></route><scheduled-stops>"
+        )
+        for n in range(stops_per_route):
+            trip = 1000000 + r * stops_per_route + n
+            parts.append(SCHEDULED_STOP.format(
+                trip=trip, n=n, mm=n % 60, ss=_estimate_seconds(n, revision), route=r, bus=500 + n,
+            ))
+        parts.append("</scheduled-stops></route-schedule>")
+    parts.append("</route-schedules></stop-schedule>")
+    return "".join(parts).encode("utf-8")
+
+
+def make_schedule_json(routes, stops_per_route, stop_id="10758", revision=0):
+    route_schedules = []
+    for r in range(routes):
+        scheduled = []
+        for n in range(stops_per_route):
+            trip = 1000000 + r * stops_per_route + n
+            mm = n % 60
+            times = {
+                "scheduled": f"2026-10-18T08:{mm:02d}:00",
+                "estimated": f"2026-10-18T08:{mm:02d}:{_estimate_seconds(n, revision):02d}",
+            }
+            scheduled.append({
+                "key": f"{trip}-{n}",
+                "cancelled": "false",
+                "times": {"arrival": times, "departure": dict(times)},
+                "variant": {"key": f"{r}-0-D", "name": "Downtown"},
+                "bus": {"key": 500 + n, "bike-rack": "true", "wifi": "false"},
+                "trip-key": trip,
+            })
+        route_schedules.append({
+            "route": {"key": r, "number": r, "name": f"Route {r}", "customer-type": "regular", "coverage": "regular"},
+            "scheduled-stops": scheduled,
+        })
+    return json.dumps({
+        "stop-schedule": {
+            "stop": {
+                "key": int(stop_id) if stop_id.isdigit() else stop_id,
+                "name": "Northbound Portage at Main",
+                "number": stop_id,
+                "direction": "Northbound",
+                "side": "Nearside",
+                "street": {"key": 2715, "name": "Portage Avenue", "type": "Avenue"},
+                "cross-street": {"key": 2265, "name": "Main Street", "type": "Street"},
+                "centre": {"geographic": {"latitude": "49.89", "longitude": "-97.13"}},
+            },
+            "route-schedules": route_schedules,
+        },
+        "query-time": "2026-10-18T08:00:00",
+    }).encode("utf-8")
+
+
+def _stop_fields(n):
+    # Spread over a grid inside the city so location queries have somewhere to land
+    return {
+        "key": 10000 + n,
+        "name": f"Northbound Portage at Street {n}",
+        "direction": "Northbound",
+        "street": "Portage Avenue",
+        "cross_street": f"Street {n}",
+        "latitude": f"{49.80 + (n % 100) * 0.002:.5f}",
+        "longitude": f"{-97.25 + (n // 100 % 100) * 0.003:.5f}",
+    }
+
+
+def make_stops(numbers):
+    parts = ["<?xml version='1.0' encoding='UTF-8'?><stops>"]
+    for n in numbers:
+        stop = _stop_fields(n)
+        parts.append(
+            f"<stop><key>{stop['key']}</key><name>{stop['name']}</name><number>{stop['key']}</number>"
+            f"<direction>{stop['direction']}</direction><side>Nearside</side>"
+            f"<street><key>2715</key><name>{stop['street']}</name><type>Avenue</type></street>"
+            f"<cross-street><key>{3000 + n}</key><name>{stop['cross_street']}</name><type>Street</type></cross-street>"
+            f"<centre><geographic><latitude>{stop['latitude']}</latitude>"
+            f"<longitude>{stop['longitude']}</longitude></geographic></centre></stop>"
+        )
+    parts.append("</stops>")
+    return "".join(parts).encode("utf-8")
+
+
+def make_stops_json(numbers):
+    stops = []
+    for n in numbers:
+        stop = _stop_fields(n)
+        stops.append({
+            "key": stop["key"],
+            "name": stop["name"],
+            "number": stop["key"],
+            "direction": stop["direction"],
+            "side": "Nearside",
+            "street": {"key": 2715, "name": stop["street"], "type": "Avenue"},
+            "cross-street": {"key": 3000 + n, "name": stop["cross_street"], "type": "Street"},
+            "centre": {"geographic": {"latitude": stop["latitude"], "longitude": stop["longitude"]}},
+        })
+    return json.dumps({"stops": stops, "query-time": "2026-10-18T08:00:00"}).encode("utf-8")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, keep-alive
+    # clients wait out a delayed ACK (~40 ms) on every response
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        match = SCHEDULE_PATH.match(self.path)
+        stops = STOPS_PATH.match(self.path) if match is None else None
+        if stops is not None:
+            # Searches find a handful of stops, location queries the stops within distance
+            numbers = range(min(10, server.stop_count)) if stops.group(1) else server.stops_near(self.path)
+            if stops.group(2):
+                self._reply(200, make_stops_json(numbers), "application/json")
+            else:
+                self._reply(200, make_stops(numbers))
+        elif match is None:
+            self._reply(404, b"<error>not found</error>")
+        elif match.group(1) in server.fail_stops:
+            self._reply(500, b"<error>stub failure</error>")
+        elif match.group(2):
+            self._reply(200, server.schedule_body(match.group(1), "json"), "application/json")
+        else:
+            self._reply(200, server.schedule_body(match.group(1), "xml"))
+
+    def _reply(self, status, body, content_type="application/xml"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, routes=5, stops_per_route=20, fail_stops=(), churn=0,
+                 stop_count=5000):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.stop_count = stop_count
+        self.routes = routes
+        self.stops_per_route = stops_per_route
+        self.fail_stops = set(fail_stops)
+        self.churn = churn
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._revision = 0
+        self._bodies = {}
+
+    def stops_near(self, path):
+        query = parse_qs(urlsplit(path).query)
+        try:
+            latitude, longitude = float(query["lat"][0]), float(query["lon"][0])
+            distance = float(query.get("distance", ["500"])[0])
+        except (KeyError, ValueError):
+            return []
+        cos_lat = math.cos(math.radians(latitude))
+        found = []
+        for n in range(self.stop_count):
+            stop = _stop_fields(n)
+            dy = (float(stop["latitude"]) - latitude) * 111195
+            dx = (float(stop["longitude"]) - longitude) * 111195 * cos_lat
+            if math.hypot(dx, dy) <= distance:
+                found.append(n)
+        return found
+
+    def schedule_body(self, stop_id, fmt):
+        revision = int(time.monotonic() / self.churn) if self.churn else 0
+        with self._lock:
+            self.requests += 1
+            if revision != self._revision:
+                self._revision = revision
+                self._bodies = {}
+            body = self._bodies.get((stop_id, fmt))
+        if body is None:
+            make = make_schedule_json if fmt == "json" else make_schedule
+            body = self._bodies[(stop_id, fmt)] = make(self.routes, self.stops_per_route, stop_id, revision)
+        return body
+
+
+def start_stub_server(port=0, **options):
+    """Serve the stub on a background thread; returns (server, base_url)."""
+    server = StubServer(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v4"
@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import start_stub_server  # noqa: E402
+from transit_ratelimit import QUOTAS  # noqa: E402
+
+# Neither the stub nor the fixture corpus has a quota to protect
+QUOTAS["stub"] = QUOTAS["fixtures"] = 1000
+
+
+@pytest.fixture
+def stub():
+    """A local stub API with churning estimates; yields (server, base_url)."""
+    server, base_url = start_stub_server(churn=1)
+    yield server, base_url
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def shared_session(monkeypatch):
+    """A fresh shared transit_http session (in-memory cache), so tests do not see each other's state."""
+    import transit_http
+    from transit_cache import ResponseCache
+
+    session = transit_http.create_session(cache=ResponseCache())
+    monkeypatch.setattr(transit_http, "_HTTP_SESSION", session)
+    yield session
+    session.close()
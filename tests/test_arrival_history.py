@@ -0,0 +1,49 @@
+import os
+
+import arrival_history
+from arrival_history import ArrivalHistory, _read_column
+from transit_http import fetch_schedules
+from transit_model import NA, ScheduledStop
+
+
+def _row(trip_key, estimated="2026-10-18T08:01:30"):
+    return ScheduledStop("11", "Portage Express", f"{trip_key}-1", trip_key,
+                         "2026-10-18T08:00:00", estimated, "2026-10-18T08:00:00", estimated)
+
+
+def test_record_skips_rows_without_estimates(tmp_path):
+    history = ArrivalHistory(str(tmp_path))
+    assert history.record("10758", [_row("1001", NA), _row("not-a-trip")]) == 0
+    assert history.record("10758", [_row("1001")]) == 2
+    assert len(history) == 2
+
+
+def test_keys_survive_reopen_after_a_call_that_wrote_nothing(tmp_path):
+    history = ArrivalHistory(str(tmp_path))
+    # Assigns stop A its code without writing a row
+    assert history.record("A", [_row("1001", NA)]) == 0
+    assert history.record("A", [_row("1002")]) == 2
+    assert os.path.exists(tmp_path / "keys.json")
+
+    reopened = ArrivalHistory(str(tmp_path))
+    assert reopened.record("B", [_row("1003")]) == 2
+    stops = _read_column(str(tmp_path / "active"), "stop", "I").tolist()
+    assert [reopened._stops[code] for code in stops] == ["A", "A", "B", "B"]
+
+
+def test_reopen_repairs_ragged_columns(tmp_path):
+    history = ArrivalHistory(str(tmp_path))
+    history.record("10758", [_row("1001")])
+    # A crash after the first column was appended
+    with open(tmp_path / "active" / "stop.bin", "ab") as f:
+        f.write(b"\0" * 4)
+    assert len(ArrivalHistory(str(tmp_path))) == 2
+
+
+def test_fetch_schedules_records_through_the_shared_session(stub, shared_session, tmp_path):
+    _, base_url = stub
+    history = arrival_history.enable(shared_session, str(tmp_path))
+    results = list(fetch_schedules(["10001", "10002"], api_key="stub", base_url=base_url))
+    assert all(result.error is None for result in results)
+    # 100 trips per stub stop, an arrival and a departure row each
+    assert len(history) == 400
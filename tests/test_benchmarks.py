@@ -0,0 +1,64 @@
+"""bench_suite's parse and end-to-end cases, plus the departure board merge, under pytest-benchmark.
+
+    pytest tests/test_benchmarks.py --benchmark-autosave
+    pytest tests/test_benchmarks.py --benchmark-compare --benchmark-compare-fail=mean:25%
+
+Skipped when pytest-benchmark is not installed.
+"""
+import contextlib
+import io
+
+import pytest
+
+import transit_http
+from departure_board import DepartureBoard
+from transit_http import create_session, decode_schedule_body, fetch_schedule, schedule_url
+from transit_model import ScheduledStop
+from transit_replay import ReplayAdapter, synthetic_corpus
+from transittracker import print_schedule
+
+pytest.importorskip("pytest_benchmark")
+
+# Small, large and very large stops from synthetic_corpus, in both wire formats
+CASES = [(stop_id, fmt) for stop_id in ("10001", "10003", "10005") for fmt in ("json", "xml")]
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    return synthetic_corpus(str(tmp_path_factory.mktemp("fixtures")))
+
+
+@pytest.fixture
+def replay(store, monkeypatch):
+    monkeypatch.setattr(transit_http, "TRANSPORT", ReplayAdapter(store))
+    monkeypatch.setattr(transit_http, "API_KEY", "fixtures")
+    session = create_session()
+    yield session
+    session.close()
+
+
+@pytest.mark.parametrize("stop_id, fmt", CASES)
+def test_parse(benchmark, store, stop_id, fmt):
+    _, _, body = store.get(schedule_url(stop_id, "fixtures", fmt=fmt))
+    assert benchmark(decode_schedule_body, body, fmt)[2]
+
+
+@pytest.mark.parametrize("stop_id, fmt", CASES)
+def test_fetch_parse_render(benchmark, replay, stop_id, fmt):
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            print_schedule(*fetch_schedule(stop_id, session=replay, fmt=fmt))
+
+    benchmark(run)
+
+
+def test_board_top(benchmark):
+    board = DepartureBoard(size=20)
+    for stop in range(150):
+        records = []
+        for trip in range(100):
+            text = f"2026-10-18T08:{(trip * 7 + stop) % 60:02d}:00"
+            records.append(ScheduledStop("11", "Portage", f"{trip}-1", str(trip), text, text, text, text))
+        board.update(str(stop), None, records)
+    # Uncached: the merge a refresh that touches the top pays for
+    assert len(benchmark(board._merge, 20)) == 20
@@ -0,0 +1,77 @@
+import random
+from datetime import datetime
+
+from departure_board import DepartureBoard, departure_time
+from transit_http import create_session
+from transit_model import NA, ScheduledStop
+
+
+def _record(trip_key, minute, estimated=True):
+    text = f"2026-10-18T08:{minute:02d}:00"
+    return ScheduledStop("11", "Portage", f"{trip_key}-1", trip_key, text, text, text, text if estimated else NA)
+
+
+def _full_sort(snapshots, n, after=None):
+    entries = sorted(
+        (departure_time(record), stop_id, record.trip_key)
+        for stop_id, records in snapshots.items() for record in records.values()
+        if departure_time(record) is not None
+    )
+    if after is not None:
+        entries = [entry for entry in entries if entry[0] >= after]
+    return entries[:n]
+
+
+def test_top_matches_a_full_sort_through_random_updates():
+    rng = random.Random(20)
+    board = DepartureBoard(size=10)
+    snapshots = {}
+    for _ in range(2000):
+        stop_id = str(rng.randrange(30))
+        current = {str(trip): _record(str(trip), rng.randrange(60), rng.random() > 0.1)
+                   for trip in rng.sample(range(40), rng.randrange(12))}
+        board.update(stop_id, None, list(current.values()))
+        snapshots[stop_id] = current
+        n = rng.choice((None, 1, 10, 40))
+        after = datetime(2026, 10, 18, 8, rng.randrange(60)) if rng.random() < 0.3 else None
+        found = board.top(n, after)
+        assert [(d.when, d.stop_id, d.record.trip_key) for d in found] == _full_sort(snapshots, n or 10, after)
+        assert all(snapshots[d.stop_id][d.record.trip_key] == d.record for d in found)
+
+
+def test_unchanged_refresh_moves_nothing():
+    board = DepartureBoard(size=5)
+    records = [_record(str(trip), trip) for trip in range(20)]
+    board.update("10758", None, records)
+    moved = board.moved
+    assert board.update("10758", None, records) == []
+    assert board.moved == moved
+    board.remove("10758")
+    assert board.top() == [] and len(board) == 0
+
+
+def test_refresh_merges_a_hundred_stub_stops(stub):
+    _, base_url = stub
+    stop_ids = [str(10000 + n) for n in range(120)]
+    board = DepartureBoard(stop_ids, size=25, api_key="stub", session=create_session(pool_maxsize=16),
+                           base_url=base_url)
+    changed, failed = board.refresh()
+    assert failed == [] and changed == len(board) == 120 * 100
+    snapshots = {stop_id: board._snapshots[stop_id] for stop_id in stop_ids}
+    assert [(d.when, d.stop_id, d.record.trip_key) for d in board.top()] == _full_sort(snapshots, 25)
+
+
+def test_refresh_is_held_to_the_configured_quota(stub):
+    import time
+
+    from transit_ratelimit import configure_quotas
+
+    _, base_url = stub
+    # 20 stops at 1200 a minute: the burst of 10 at once, then 10 more at 20 a second
+    configure_quotas("stub-quota=1200")
+    board = DepartureBoard([str(10000 + n) for n in range(20)], api_key="stub-quota",
+                           session=create_session(pool_maxsize=16), base_url=base_url)
+    assert board.refresh_bound() == 0.5
+    start = time.perf_counter()
+    changed, failed = board.refresh()
+    assert failed == [] and time.perf_counter() - start >= 0.45
@@ -0,0 +1,118 @@
+import random
+
+import pytest
+
+from stop_index import StopIndex
+from stub_server import make_stops_json
+from transit_model import decode_stops
+
+
+@pytest.fixture(scope="module")
+def index():
+    return StopIndex(decode_stops(make_stops_json(range(2000))))
+
+
+def _brute_force(index, latitude, longitude, k):
+    return sorted((index._distance(latitude, longitude, stop), stop.key) for stop in index.stops)[:k]
+
+
+@pytest.mark.parametrize("latitude, longitude", [
+    (49.85, -97.20),   # inside the indexed area
+    (49.80, -97.25),   # on a corner stop
+    (49.76, -97.45),   # 10 km west of it
+    (50.50, -96.00),   # far north-east
+])
+def test_nearest_matches_brute_force(index, latitude, longitude):
+    found = [(distance, stop.key) for distance, stop in index.nearest(latitude, longitude, k=5)]
+    assert found == _brute_force(index, latitude, longitude, 5)
+
+
+def test_nearest_random_points(index):
+    rng = random.Random(6)
+    for _ in range(200):
+        latitude, longitude = rng.uniform(49.6, 50.1), rng.uniform(-97.6, -96.8)
+        k = rng.choice((1, 5, 20))
+        found = [(distance, stop.key) for distance, stop in index.nearest(latitude, longitude, k)]
+        assert found == _brute_force(index, latitude, longitude, k)
+
+
+def test_within_and_search(index):
+    for distance, stop in index.within(49.85, -97.20, 300):
+        assert distance <= 300
+    stop = index.stops[42]
+    assert index.get(stop.key) == stop
+    assert stop in index.search(stop.cross_street)
+
+
+def test_nearest_on_an_empty_index():
+    assert StopIndex([]).nearest(49.85, -97.20) == []
+
+
+# 12 tiles down the stub's first 500 stops, each holding some no other tile returns
+BOUNDS = (49.80, -97.25, 49.99, -97.238)
+
+
+def _failing(monkeypatch, tile, times):
+    """Make location queries around tile fail the first times they are made."""
+    import requests
+
+    import transit_http
+
+    fetch_stops_near = transit_http.fetch_stops_near
+    calls = []
+
+    def fetch(latitude, longitude, *args, **kwargs):
+        if (latitude, longitude) == tile:
+            calls.append(tile)
+            if len(calls) <= times:
+                raise requests.ConnectionError("tile down")
+        return fetch_stops_near(latitude, longitude, *args, **kwargs)
+
+    monkeypatch.setattr(transit_http, "fetch_stops_near", fetch)
+    return calls
+
+
+@pytest.fixture
+def stub_stops():
+    from stub_server import start_stub_server
+
+    server, base_url = start_stub_server(stop_count=500)
+    yield base_url
+    server.shutdown()
+    server.server_close()
+
+
+def test_a_failed_tile_is_retried_alone(stub_stops, monkeypatch):
+    from stop_index import fetch_tiles, tile_centres
+
+    tiles = list(tile_centres(BOUNDS))
+    calls = _failing(monkeypatch, tiles[5], times=1)
+    stops, failed = fetch_tiles(tiles, api_key="stub", base_url=stub_stops)
+    assert failed == {} and len(stops) == 500 and len(calls) == 2
+
+
+def test_prefetch_keeps_the_other_tiles_and_a_refresh_fills_in_the_failed_one(stub_stops, tmp_path, monkeypatch):
+    from stop_index import StopDirectory
+
+    directory = StopDirectory(str(tmp_path / "stops.json"), api_key="stub", bounds=BOUNDS, tiles_per_step=4,
+                              base_url=stub_stops)
+    tile = directory._tiles[5]
+    # Down for prefetch's three attempts
+    calls = _failing(monkeypatch, tile, times=3)
+    assert 0 < len(directory.prefetch()) < 500 and list(directory.failed) == [tile]
+    # Asked again although it is not in the first step's batch
+    directory.refresh_step()
+    assert directory.failed == {} and len(directory.index) == 500 and len(calls) == 4
+
+
+def test_a_sweep_with_a_tile_down_drops_nothing(stub_stops, tmp_path, monkeypatch):
+    from stop_index import StopDirectory
+
+    directory = StopDirectory(str(tmp_path / "stops.json"), api_key="stub", bounds=BOUNDS, tiles_per_step=4,
+                              base_url=stub_stops)
+    assert len(directory.prefetch()) == 500
+    # Down for the whole sweep: three attempts in the step that holds it and three in the last
+    _failing(monkeypatch, directory._tiles[5], times=6)
+    for _ in range(3):
+        directory.refresh_step()
+    assert directory.sweeps == 1 and directory.failed and len(directory.index) == 500
@@ -0,0 +1,70 @@
+import time
+
+from stop_watcher import ADDED, CHANGED, REMOVED, StopWatcher, diff_schedules
+from transit_http import create_session
+from transit_model import ScheduledStop
+
+
+def _record(trip_key, estimated):
+    return ScheduledStop("11", "Portage", f"{trip_key}-1", trip_key, "2026-10-18T08:00:00", estimated,
+                         "2026-10-18T08:00:00", estimated)
+
+
+def _watcher(base_url):
+    return StopWatcher(api_key="stub", session=create_session(), base_url=base_url,
+                       min_interval=0.1, max_interval=0.3)
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_diff_schedules():
+    previous = {"1": _record("1", "08:01"), "2": _record("2", "08:02")}
+    current = {"2": _record("2", "08:03"), "3": _record("3", "08:04")}
+    changes = {change.record.trip_key: change.kind for change in diff_schedules(previous, current)}
+    assert changes == {"1": REMOVED, "2": CHANGED, "3": ADDED}
+
+
+def test_failing_subscriber_does_not_stop_the_others(stub):
+    _, base_url = stub
+    watcher = _watcher(base_url)
+    seen = []
+
+    def broken(stop_id, stop, changes):
+        raise KeyError(stop_id)
+
+    watcher.subscribe(broken)
+    watcher.subscribe(lambda stop_id, stop, changes: seen.append(stop_id))
+    watcher.watch("10001")
+    watcher.start()
+    try:
+        assert _wait_for(lambda: len(seen) >= 2)
+        assert watcher._thread.is_alive()
+    finally:
+        watcher.stop()
+
+
+def test_unexpected_refresh_error_reschedules_the_stop(stub, monkeypatch):
+    _, base_url = stub
+    watcher = _watcher(base_url)
+    calls = []
+    refresh = watcher.refresh
+
+    def flaky_refresh(stop_id):
+        calls.append(stop_id)
+        if len(calls) == 1:
+            raise AttributeError("'list' object has no attribute 'get'")
+        return refresh(stop_id)
+
+    monkeypatch.setattr(watcher, "refresh", flaky_refresh)
+    watcher.watch("10001")
+    watcher.start()
+    try:
+        assert _wait_for(lambda: watcher.fetches >= 1)
+        assert watcher._thread.is_alive()
+    finally:
+        watcher.stop()
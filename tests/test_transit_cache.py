@@ -0,0 +1,59 @@
+import re
+import time
+
+from transit_cache import ResponseCache, normalize_url
+from transit_replay import ReplayAdapter, synthetic_corpus
+from transit_session import create_session
+
+URL = "https://api.winnipegtransit.com/v4/stops/10002/schedule.json?api-key=fixtures"
+
+
+def test_normalize_url_drops_the_key_and_sorts_the_query():
+    assert (normalize_url("https://h/v4/stops?lon=2&api-key=secret&lat=1")
+            == normalize_url("https://h/v4/stops?lat=1&lon=2&api-key=other")
+            == "https://h/v4/stops?lat=1&lon=2")
+
+
+def test_stale_entries_are_revalidated_with_a_conditional_request(tmp_path):
+    adapter = ReplayAdapter(synthetic_corpus(str(tmp_path)))
+    cache = ResponseCache(ttls=((re.compile(""), 0.2),))
+    session = create_session(cache=cache, transport=adapter)
+
+    first = session.get(URL, timeout=5)
+    assert session.get(URL, timeout=5).content == first.content
+    assert cache.stats()["hits"] == 1 and adapter.counts["served"] == 1
+
+    time.sleep(0.25)
+    revalidated = session.get(URL, timeout=5)
+    assert revalidated.status_code == 200 and revalidated.content == first.content
+    assert adapter.counts["not_modified"] == 1 and cache.stats()["revalidated"] == 1
+    # Fresh again for another TTL
+    session.get(URL, timeout=5)
+    assert cache.stats()["hits"] == 2 and adapter.counts["served"] == 1
+
+
+def test_cache_evicts_least_recently_used_past_max_bytes(tmp_path):
+    adapter = ReplayAdapter(synthetic_corpus(str(tmp_path)))
+    cache = ResponseCache(max_bytes=len(adapter.store.get(URL.replace("10002", "10003"))[2]))
+    session = create_session(cache=cache, transport=adapter)
+    for stop_id in ("10002", "10003", "10002"):
+        session.get(URL.replace("10002", stop_id), timeout=5)
+    assert cache.stats()["evictions"] >= 1
+    assert cache.stats()["hits"] == 0
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_params_are_part_of_the_cache_key(tmp_path):
+    from stub_server import make_stops_json
+
+    store = synthetic_corpus(str(tmp_path))
+    base = "https://api.winnipegtransit.com/v4/stops.json"
+    for distance, count in (("100", 1), ("500", 3)):
+        store.put(f"{base}?distance={distance}&lat=49.8&lon=-97.2", 200, {"Content-Type": "application/json"},
+                  make_stops_json(range(count)))
+    session = create_session(cache=ResponseCache(), transport=ReplayAdapter(store))
+    near = session.get(base, params={"lat": 49.8, "lon": -97.2, "distance": 100, "api-key": "fixtures"}, timeout=5)
+    wide = session.get(base, params={"lat": 49.8, "lon": -97.2, "distance": 500, "api-key": "fixtures"}, timeout=5)
+    assert near.status_code == wide.status_code == 200
+    assert near.content != wide.content
+    assert session.cache.stats()["hits"] == 0
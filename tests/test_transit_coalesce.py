@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+
+from transit_coalesce import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+    barrier = threading.Barrier(8)
+    results = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return "body"
+
+    def caller():
+        barrier.wait()
+        results.append(flights.do("schedule", slow))
+
+    threads = [threading.Thread(target=caller) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["body"] * 8
+    assert len(calls) == 1
+    assert flights.stats() == {"executed": 1, "coalesced": 7}
+
+
+def test_waiters_get_the_leaders_exception_and_the_key_is_released():
+    flights = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("bad body")
+
+    def waiter():
+        started.wait()
+        try:
+            flights.do("k", failing)
+        except ValueError as exc:
+            errors.append(exc)
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    with pytest.raises(ValueError):
+        flights.do("k", failing)
+    thread.join()
+    assert len(errors) == 1
+    assert flights.do("k", lambda: "retried") == "retried"
+
+
+def test_different_keys_do_not_coalesce():
+    flights = SingleFlight()
+    assert [flights.do(key, lambda key=key: key) for key in "abc"] == ["a", "b", "c"]
+    assert flights.stats()["coalesced"] == 0
@@ -0,0 +1,113 @@
+import threading
+
+from transit_http import fetch_schedule, fetch_schedules
+
+STOPS = [str(10000 + n) for n in range(8)]
+
+
+def test_fetch_schedules_reports_each_stop(stub, shared_session):
+    server, base_url = stub
+    server.fail_stops = {"10003"}
+    results = {result.stop_id: result for result in fetch_schedules(STOPS, api_key="stub", base_url=base_url)}
+    assert set(results) == set(STOPS)
+    assert results["10003"].error is not None
+    assert all(result.scheduled for stop_id, result in results.items() if stop_id != "10003")
+
+
+def test_concurrent_fetch_schedules_share_in_flight_requests(stub, shared_session):
+    server, base_url = stub
+    server.latency = 0.3
+    barrier = threading.Barrier(3)
+
+    def board():
+        barrier.wait()
+        list(fetch_schedules(STOPS, api_key="stub", base_url=base_url))
+
+    def single():
+        barrier.wait()
+        fetch_schedule(STOPS[0], api_key="stub", base_url=base_url)
+
+    threads = [threading.Thread(target=board), threading.Thread(target=board), threading.Thread(target=single)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert server.requests == len(STOPS)
+    assert shared_session.flights.stats()["coalesced"] > 0
+
+
+def test_a_body_of_the_wrong_shape_fails_only_its_stop(tmp_path, shared_session, monkeypatch):
+    import transit_http
+    from transit_replay import ReplayAdapter, synthetic_corpus
+
+    store = synthetic_corpus(str(tmp_path))
+    store.put("https://api.winnipegtransit.com/v4/stops/10009/schedule.json", 200,
+              {"Content-Type": "application/json"}, b"[]")
+    monkeypatch.setattr(transit_http, "TRANSPORT", ReplayAdapter(store))
+    stop_ids = ["10001", "10009", "10002", "10003"]
+    results = {result.stop_id: result for result in fetch_schedules(stop_ids, api_key="fixtures", fmt="json")}
+    assert set(results) == set(stop_ids)
+    assert isinstance(results["10009"].error, ValueError)
+    assert all(results[stop_id].scheduled for stop_id in ("10001", "10002", "10003"))
+
+
+def test_fetch_schedules_async_records_a_shared_fetch_once(stub, shared_session, monkeypatch):
+    import asyncio
+    import contextlib
+
+    import requests
+
+    import transit_http
+
+    server, base_url = stub
+    server.latency = 0.2
+
+    # aiohttp or httpx may be missing here; the stub is reached through requests on a worker thread
+    def client(max_concurrency):
+        async def get(url, limiter):
+            response = await asyncio.to_thread(requests.get, url, timeout=10)
+            response.raise_for_status()
+            return response.content
+
+        return contextlib.AsyncExitStack(), get, (requests.RequestException,)
+
+    class Recorder:
+        def __init__(self):
+            self.calls = []
+
+        def record(self, stop_key, scheduled, fetched=None):
+            self.calls.append(stop_key)
+
+    monkeypatch.setattr(transit_http, "_async_client", client)
+    shared_session.recorder = Recorder()
+
+    async def collect():
+        return [result async for result in transit_http.fetch_schedules_async(
+            [STOPS[0]] * 3, api_key="stub", base_url=base_url)]
+
+    results = asyncio.run(collect())
+    assert all(result.error is None for result in results)
+    assert server.requests == 1
+    assert shared_session.recorder.calls == [STOPS[0]]
+
+
+def test_uncached_xml_schedules_are_parsed_off_the_socket(stub, monkeypatch):
+    import transit_http
+    import transit_metrics
+
+    _, base_url = stub
+
+    def read_whole(body, fmt=None):
+        raise AssertionError("the body was read whole")
+
+    monkeypatch.setattr(transit_http, "decode_schedule_body", read_whole)
+    session = transit_http.create_session()
+    # Metrics time the transfer by reading the body, except for a streamed one
+    transit_metrics.enable()
+    try:
+        stop, routes, scheduled = fetch_schedule(STOPS[0], api_key="stub", session=session, base_url=base_url,
+                                                 fmt="xml")
+    finally:
+        transit_metrics.disable()
+        session.close()
+    assert stop.key == STOPS[0] and len(scheduled) == 100
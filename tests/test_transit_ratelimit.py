@@ -0,0 +1,69 @@
+import threading
+import time
+
+from transit_ratelimit import BACKGROUND, INTERACTIVE, RateLimiter, parse_retry_after
+
+
+def _queue(limiter, priority, order, name):
+    thread = threading.Thread(target=lambda: (limiter.acquire(priority), order.append(name)))
+    thread.start()
+    return thread
+
+
+def test_interactive_waiters_go_before_queued_background_ones():
+    limiter = RateLimiter(rate=10, burst=1)
+    limiter.acquire()
+    order = []
+    threads = [_queue(limiter, BACKGROUND, order, f"background {n}") for n in range(3)]
+    time.sleep(0.02)
+    threads.append(_queue(limiter, INTERACTIVE, order, "interactive"))
+    for thread in threads:
+        thread.join()
+    assert order[0] == "interactive"
+    assert limiter.stats()["granted"] == 5
+
+
+def test_tokens_are_paced_at_the_rate():
+    limiter = RateLimiter(rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(11):
+        limiter.acquire()
+    assert time.monotonic() - start >= 10 / 50 * 0.9
+
+
+def test_throttling_halves_the_rate_and_success_recovers_it():
+    limiter = RateLimiter(rate=8, burst=1)
+    limiter.feedback(429)
+    assert limiter.rate == 4
+    for _ in range(40):
+        limiter.feedback(200)
+    assert limiter.rate == 8
+
+
+def test_retry_after_blocks_every_caller():
+    limiter = RateLimiter(rate=100, burst=5)
+    limiter.feedback(429, "0.2")
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.15
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None and parse_retry_after(None) is None
+
+
+def test_quota_spec_is_in_requests_per_minute(monkeypatch):
+    import pytest
+
+    import transit_ratelimit
+
+    monkeypatch.setattr(transit_ratelimit, "QUOTAS", {})
+    monkeypatch.setattr(transit_ratelimit, "DEFAULT_RATE", transit_ratelimit.DEFAULT_RATE)
+    transit_ratelimit.configure_quotas("600, mine=30")
+    assert transit_ratelimit.DEFAULT_RATE == 10
+    assert transit_ratelimit.QUOTAS == {"mine": 0.5}
+    for spec in ("fast", "mine=0", ""):
+        with pytest.raises(ValueError):
+            transit_ratelimit.configure_quotas(spec)
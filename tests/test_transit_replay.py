@@ -0,0 +1,58 @@
+import pytest
+import requests
+
+import transit_metrics
+from transit_replay import FixtureStore, Profile, ReplayAdapter, synthetic_corpus
+from transit_session import create_session
+
+URL = "https://api.winnipegtransit.com/v4/stops/10001/schedule.json?api-key=fixtures"
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    return synthetic_corpus(str(tmp_path_factory.mktemp("fixtures")))
+
+
+@pytest.fixture
+def metrics():
+    registry = transit_metrics.enable()
+    yield registry
+    transit_metrics.disable()
+
+
+def test_replay_serves_and_revalidates(store):
+    adapter = ReplayAdapter(FixtureStore(store.path))
+    session = create_session(transport=adapter)
+    response = session.get(URL, timeout=5)
+    assert response.status_code == 200
+    assert session.get(URL, headers={"If-None-Match": response.headers["ETag"]}, timeout=5).status_code == 304
+    assert session.get(URL.replace("10001", "99999"), timeout=5).status_code == 404
+    assert adapter.counts["served"] == 1 and adapter.counts["not_modified"] == 1
+
+
+def test_replayed_500s_are_retried_like_upstream(store, metrics):
+    adapter = ReplayAdapter(store, Profile(0, 0, 0.5, 0, 0, 0), seed=1)
+    adapter.max_retries = adapter.max_retries.new(backoff_factor=0)
+    session = create_session(transport=adapter)
+    statuses = [session.get(URL, timeout=5).status_code for _ in range(20)]
+    assert adapter.counts["errors"] > statuses.count(500)
+    assert statuses.count(200) >= 18
+    assert metrics.snapshot()["transit_http_retries_total"]["schedule"] == adapter.counts["errors"] - statuses.count(500)
+
+
+def test_replay_timeouts_are_retried_then_raised(store):
+    adapter = ReplayAdapter(store, Profile(0.2, 0, 0, 0, 0, 0))
+    adapter.max_retries = adapter.max_retries.new(backoff_factor=0)
+    session = create_session(transport=adapter)
+    with pytest.raises(requests.ReadTimeout):
+        session.get(URL, timeout=0.01)
+    assert adapter.counts["timeouts"] == 4
+
+
+def test_throttled_answers_are_retried_by_the_session_alone(store):
+    # Every request answers 429 with Retry-After: 0
+    adapter = ReplayAdapter(store, Profile(0, 0, 0, 1, 1, 0))
+    session = create_session(transport=adapter)
+    assert session.get(URL, timeout=5).status_code == 429
+    # One upstream attempt per session-level throttle retry, none made inside urllib3
+    assert adapter.counts["throttled"] == session.throttle_retries + 1
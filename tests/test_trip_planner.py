@@ -0,0 +1,108 @@
+import csv
+import heapq
+import io
+import os
+import random
+import zipfile
+from collections import defaultdict
+from datetime import datetime
+
+import pytest
+
+from bench_gtfs import synthetic_feed
+from gtfs_index import import_feed
+from trip_planner import TRANSFER_SECONDS, TripPlanner, import_network
+
+
+@pytest.fixture(scope="module")
+def feed(tmp_path_factory):
+    """A small synthetic feed, imported next to itself."""
+    tmp = tmp_path_factory.mktemp("gtfs")
+    feed = str(tmp / "feed.zip")
+    synthetic_feed(feed, stops=300, routes=30, trips_per_route=60, stops_per_trip=20, seed=4)
+    import_feed(feed, str(tmp))
+    import_network(feed, str(tmp))
+    return feed
+
+
+@pytest.fixture(scope="module")
+def planner(feed):
+    planner = TripPlanner(os.path.dirname(feed))
+    yield planner
+    planner.close()
+
+
+def _trips(feed):
+    """trip_id -> [(stop position, arrival, departure)] in stop_sequence order, read straight from the feed."""
+    with zipfile.ZipFile(feed) as archive:
+        rows = list(csv.DictReader(io.TextIOWrapper(archive.open("stop_times.txt"), encoding="utf-8")))
+
+    def seconds(text):
+        hours, minutes, secs = text.split(":")
+        return int(hours) * 3600 + int(minutes) * 60 + int(secs)
+
+    trips = defaultdict(list)
+    for row in rows:
+        trips[row["trip_id"]].append((int(row["stop_sequence"]), int(row["stop_id"]),
+                                      seconds(row["arrival_time"]), seconds(row["departure_time"])))
+    return {trip_id: [stop[1:] for stop in sorted(stops)] for trip_id, stops in trips.items()}
+
+
+def _brute_force(planner, trips, source, target, when):
+    """Earliest arrival by Dijkstra over (stop, has ridden, just walked), with the planner's transfer rules:
+    TRANSFER_SECONDS before any boarding after the first ride, and no two walks in a row."""
+    active = planner.timetable.active_trips(when.date())
+    running = [trips[planner.timetable.trips[i][0]] for i in range(len(planner.timetable.trips)) if active[i]]
+    boarding = defaultdict(list)
+    for stops in running:
+        for i, (stop, _, departs) in enumerate(stops):
+            boarding[stop].append((departs, stops, i))
+    start = int((when - datetime.combine(when.date(), datetime.min.time())).total_seconds())
+
+    best = {}
+    queue = [(start, source, False, False)]
+    while queue:
+        now, stop, ridden, walked = heapq.heappop(queue)
+        if (stop, ridden, walked) in best:
+            continue
+        best[stop, ridden, walked] = now
+        if stop == target:
+            return now
+        ready = now + (TRANSFER_SECONDS if ridden else 0)
+        for departs, stops, i in boarding[stop]:
+            if departs >= ready:
+                for other, arrives, _ in stops[i + 1:]:
+                    heapq.heappush(queue, (arrives, other, True, False))
+        if not walked:
+            for j in range(planner._walk_offsets[stop], planner._walk_offsets[stop + 1]):
+                heapq.heappush(queue, (now + planner._walk_seconds[j], planner._walk_stops[j], ridden, True))
+    return None
+
+
+def test_plan_matches_brute_force(planner, feed):
+    trips = _trips(feed)
+    keys = planner.timetable.stop_keys
+    offsets = planner._stop_pattern_offsets
+    served = [i for i in range(len(keys)) if offsets[i + 1] > offsets[i]]
+    rng = random.Random(16)
+    checked = reachable = 0
+    while checked < 600:
+        source, target = rng.sample(served, 2)
+        when = datetime(2026, 10, rng.randint(13, 18), rng.randint(5, 20), rng.randint(0, 59))
+        expected = _brute_force(planner, trips, source, target, when)
+        legs = planner.plan(keys[source], keys[target], when, max_rounds=50)
+        checked += 1
+        if expected is None:
+            assert legs == []
+            continue
+        reachable += 1
+        arrives = datetime.fromisoformat(legs[-1].arrives)
+        midnight = datetime.combine(when.date(), datetime.min.time())
+        assert (arrives - midnight).total_seconds() == expected
+        assert legs[0].from_stop == keys[source] and legs[-1].to_stop == keys[target]
+        assert all(a.to_stop == b.from_stop for a, b in zip(legs, legs[1:]))
+    assert reachable > 30
+
+
+def test_unknown_stops_have_no_journey(planner):
+    assert planner.plan("nope", planner.timetable.stop_keys[0], datetime(2026, 10, 14, 8)) == []
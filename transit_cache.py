@@ -0,0 +1,205 @@
+"""Response cache for the Winnipeg Transit API.
+
+Entries are keyed on the request URL with the api-key stripped, expire after
+a per-endpoint TTL and are revalidated with ETag / Last-Modified once stale,
+so an unchanged answer costs a 304 with no body. The in-memory tier is an
+LRU bounded by total body bytes; an optional sqlite file backs it so a
+restarted process comes up warm.
+"""
+import io
+import json
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+import transit_metrics
+
+# (path pattern, seconds); first match wins
+DEFAULT_TTLS = (
+    (re.compile(r"/stops/[^/]+/schedule"), 15),
+    (re.compile(r"/stops:"), 24 * 60 * 60),
+    (re.compile(r"/stops(/|\.|\?|$)"), 24 * 60 * 60),
+    (re.compile(r""), 60),
+)
+
+CacheEntry = namedtuple("CacheEntry", "status headers body expires_at etag last_modified")
+
+
+def normalize_url(url):
+    """Cache/coalescing key for url: api-key removed, query params sorted."""
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != "api-key")
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def _to_response(entry, url):
+    response = requests.Response()
+    response.status_code = entry.status
+    response.headers = CaseInsensitiveDict(entry.headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = url
+    response._content = entry.body
+    response.raw = io.BytesIO(entry.body)
+    return response
+
+
+class _DiskTier:
+    def __init__(self, path):
+        # One connection shared by every thread, serialized by _lock
+        import sqlite3
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, status INTEGER, headers TEXT, body BLOB, "
+            "expires_at REAL, etag TEXT, last_modified TEXT)"
+        )
+        self._db.commit()
+
+    def load(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, headers, body, expires_at, etag, last_modified FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        status, headers, body, expires_at, etag, last_modified = row
+        return CacheEntry(status, json.loads(headers), bytes(body), expires_at, etag, last_modified)
+
+    def store(self, key, entry):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, entry.status, json.dumps(entry.headers), entry.body,
+                 entry.expires_at, entry.etag, entry.last_modified),
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class ResponseCache:
+    def __init__(self, max_bytes=16 * 1024 * 1024, ttls=DEFAULT_TTLS, disk_path=None):
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk = _DiskTier(disk_path) if disk_path else None
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        self.disk_hits = 0
+
+    def ttl_for(self, url):
+        path = urlsplit(url).path
+        for pattern, seconds in self.ttls:
+            if pattern.search(path):
+                return seconds
+        return 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "evictions": self.evictions,
+            "disk_hits": self.disk_hits,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if self._disk is not None:
+            entry = self._disk.load(key)
+            if entry is not None:
+                self.disk_hits += 1
+                transit_metrics.count("transit_cache_lookups_total", 1, "disk")
+                self._remember(key, entry, persist=False)
+        return entry
+
+    def _remember(self, key, entry, persist=True):
+        size = len(entry.body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.body)
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+                self.evictions += 1
+        if persist and self._disk is not None:
+            self._disk.store(key, entry)
+
+    def fetch(self, url, send):
+        """Serve url from the cache, calling send(extra_headers) on a miss or to revalidate."""
+        key = normalize_url(url)
+        entry = self._lookup(key)
+        now = time.time()
+        if entry is not None and entry.expires_at > now:
+            self.hits += 1
+            transit_metrics.count("transit_cache_lookups_total", 1, "hit")
+            return _to_response(entry, url)
+
+        conditional = {}
+        if entry is not None:
+            if entry.etag:
+                conditional["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                conditional["If-Modified-Since"] = entry.last_modified
+
+        response = send(conditional)
+        ttl = self.ttl_for(url)
+        if response.status_code == 304 and entry is not None:
+            response.close()
+            self.revalidated += 1
+            transit_metrics.count("transit_cache_lookups_total", 1, "revalidated")
+            entry = entry._replace(expires_at=now + ttl)
+            self._remember(key, entry)
+            return _to_response(entry, url)
+
+        self.misses += 1
+        transit_metrics.count("transit_cache_lookups_total", 1, "miss")
+        if response.status_code != 200 or ttl <= 0:
+            return response
+        # Reading the body here means streamed callers get it back from memory
+        body = response.content
+        response.raw = io.BytesIO(body)
+        # The body is stored decoded, so drop headers that describe the wire form
+        headers = {
+            name: value for name, value in response.headers.items()
+            if name.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+        }
+        self._remember(key, CacheEntry(
+            response.status_code,
+            headers,
+            body,
+            now + ttl,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        ))
+        return response
+
+    def close(self):
+        if self._disk is not None:
+            self._disk.close()
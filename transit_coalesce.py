@@ -0,0 +1,84 @@
+import io
+import threading
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one execution.
+
+    The first caller for a key runs func; callers arriving while it is in
+    flight wait and receive the same result (or exception). Works for
+    threads via do() and for asyncio tasks via do_async().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def stats(self):
+        return {"executed": self.executed, "coalesced": self.coalesced}
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def do_async(self, key, func):
+        """Like do(), for a coroutine function; waiters are shielded from each other's cancellation."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        task = self._async_calls.get(flight_key)
+        if task is None:
+            task = self._async_calls[flight_key] = loop.create_task(func())
+            task.add_done_callback(lambda _: self._async_calls.pop(flight_key, None))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+
+def copy_response(response):
+    """Give each coalesced caller its own Response over the shared body."""
+    copy = requests.Response()
+    copy.__dict__.update(response.__dict__)
+    copy.headers = CaseInsensitiveDict(response.headers)
+    copy.raw = io.BytesIO(response.content)
+    return copy
@@ -0,0 +1,148 @@
+"""Local read-through proxy so many displays share one API key, cache and rate limit.
+
+    python -m transittracker daemon              # listens on 127.0.0.1:8642
+    python -m transittracker --via-daemon schedule 10758
+    python main.py --via-daemon
+
+The daemon answers the same /v4/stops paths as the real API (schedules,
+stop search, location queries), so clients only swap their base URL; see
+transit_http.use_daemon(). Each request is forwarded with the daemon's own
+API key through a single TransitSession: one pooled set of upstream
+connections, one ResponseCache, one RateLimiter. Identical requests from
+many clients at once are coalesced into one upstream call. GET /stats
+reports what the shared session has absorbed, GET /metrics the
+transit_metrics registry in Prometheus text.
+"""
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+
+import transit_metrics
+from transit_cache import ResponseCache
+from transit_http import API_BASE, DAEMON_PORT, create_session, resolve_api_key
+from transit_ratelimit import INTERACTIVE, get_limiter
+
+# Only the read-only stop endpoints are proxied; anything else is a 404
+PROXY_PATH = re.compile(r"^/v4/stops([:/.]|$)")
+
+# Upstream headers worth passing on to clients
+PASS_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control", "Retry-After")
+
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so each display keeps one connection open between refreshes
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, keep-alive
+    # clients wait out a delayed ACK (~40 ms) on every response
+    disable_nagle_algorithm = True
+    # Drop keep-alive connections idle for longer than this
+    timeout = 60
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        if parts.path == "/stats":
+            self._reply(200, json.dumps(server.stats()).encode("utf-8"), {"Content-Type": "application/json"})
+            return
+        if parts.path == "/metrics":
+            self._reply(200, transit_metrics.prometheus().encode("utf-8"),
+                        {"Content-Type": "text/plain; version=0.0.4"})
+            return
+        if not PROXY_PATH.match(parts.path):
+            self._reply(404, b"<error>not found</error>", {"Content-Type": "application/xml"})
+            return
+
+        # Whatever key the client sent is replaced by the daemon's own
+        query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != "api-key"]
+        query.append(("api-key", server.api_key))
+        url = f"{server.upstream}{parts.path[len('/v4'):]}?{urlencode(query)}"
+        try:
+            response = server.session.get(url, timeout=10, priority=INTERACTIVE)
+        except requests.RequestException as exc:
+            server.count("errors")
+            self._reply(502, f"<error>{type(exc).__name__}</error>".encode("utf-8"),
+                        {"Content-Type": "application/xml"})
+            return
+
+        with response:
+            headers = {name: response.headers[name] for name in PASS_HEADERS if name in response.headers}
+            etag = response.headers.get("ETag")
+            if response.status_code == 200 and etag and self.headers.get("If-None-Match") == etag:
+                server.count("not_modified")
+                self._reply(304, b"", headers)
+            else:
+                server.count("served")
+                self._reply(response.status_code, response.content, headers)
+
+    def _reply(self, status, body, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TransitDaemon(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for a burst of displays connecting at once
+    request_queue_size = 128
+
+    def __init__(self, address=("127.0.0.1", DAEMON_PORT), api_key=None, upstream=API_BASE,
+                 pool_maxsize=10, cache=None):
+        super().__init__(address, DaemonHandler)
+        self.api_key = resolve_api_key(api_key)
+        self.upstream = upstream.rstrip("/")
+        self.session = create_session(pool_maxsize=pool_maxsize, cache=cache or ResponseCache())
+        self._lock = threading.Lock()
+        self._counts = {"served": 0, "not_modified": 0, "errors": 0}
+
+    def count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts)
+        stats["cache"] = self.session.cache.stats()
+        stats["coalescing"] = self.session.flights.stats()
+        stats["rate_limit"] = get_limiter(self.api_key).stats()
+        return stats
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v4"
+
+    def server_close(self):
+        super().server_close()
+        self.session.close()
+        self.session.cache.close()
+
+
+def start_daemon(port=0, **options):
+    """Run a daemon on a background thread; returns (daemon, base_url)."""
+    daemon = TransitDaemon(("127.0.0.1", port), **options)
+    threading.Thread(target=daemon.serve_forever, daemon=True).start()
+    return daemon, daemon.url
+
+
+def serve(host="127.0.0.1", port=DAEMON_PORT, cache_path=None, pool_maxsize=10):
+    """Run the daemon in the foreground until interrupted."""
+    transit_metrics.enable()
+    daemon = TransitDaemon((host, port), pool_maxsize=pool_maxsize, cache=ResponseCache(disk_path=cache_path))
+    print(f"Serving {daemon.upstream} on {daemon.url} (Ctrl+C to stop)")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.server_close()
@@ -0,0 +1,317 @@
+import io
+import os
+import threading
+import time
+from collections import namedtuple
+
+import transit_metrics
+from transit_model import DECODE_ERRORS, decode_schedule, decode_stops
+from transit_ratelimit import INTERACTIVE, QUOTAS, get_limiter
+
+API_BASE = "https://api.winnipegtransit.com/v4"
+# "json" (smaller, faster to decode) or "xml"; both decode to the same records
+API_FORMAT = "json"
+# Used instead of txt/api.txt when set; use_daemon() sets a placeholder
+API_KEY = None
+
+# requests transport adapter mounted on new sessions in place of the network; see use_fixtures()
+TRANSPORT = None
+
+# Where transit_daemon listens by default
+DAEMON_PORT = 8642
+DAEMON_URL = f"http://127.0.0.1:{DAEMON_PORT}/v4"
+
+# ET.ParseError is a SyntaxError; naming the base keeps xml.etree out of startup
+PARSE_ERRORS = (SyntaxError,) + DECODE_ERRORS
+
+# One entry per stop handed back by fetch_schedules; error is set instead of
+# stop/routes/scheduled when that stop failed.
+ScheduleResult = namedtuple("ScheduleResult", "stop_id stop routes scheduled error")
+
+
+def create_session(pool_maxsize=10, cache=None):
+    """A new TransitSession on the configured transport (the network, or a fixture corpus)."""
+    # requests/urllib3 are only imported once a session is actually needed
+    import transit_session
+    return transit_session.create_session(pool_maxsize, cache, TRANSPORT)
+
+
+_HTTP_SESSION = None
+_HTTP_SESSION_LOCK = threading.Lock()
+
+
+def shared_session():
+    """The shared default session, built on first use rather than at import."""
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None:
+        with _HTTP_SESSION_LOCK:
+            if _HTTP_SESSION is None:
+                from transit_cache import ResponseCache
+                _HTTP_SESSION = create_session(cache=ResponseCache())
+    return _HTTP_SESSION
+
+
+def http_get(url, **kwargs):
+    timeout = kwargs.pop("timeout", 10)
+    return shared_session().get(url, timeout=timeout, **kwargs)
+
+
+def use_daemon(url=None):
+    """Send every request through a running transit_daemon instead of upstream.
+
+    url defaults to $TRANSITTRACKER_DAEMON, then the local DAEMON_URL. The
+    daemon adds its own API key, so txt/api.txt is not needed here.
+    """
+    global API_BASE, API_KEY
+    url = (url or os.environ.get("TRANSITTRACKER_DAEMON") or DAEMON_URL).rstrip("/")
+    API_BASE = url if url.endswith("/v4") else url + "/v4"
+    API_KEY = "daemon"
+    # The daemon paces upstream for every client; pacing loopback calls here too only slows them down
+    QUOTAS.setdefault(API_KEY, 1000)
+
+
+def use_fixtures(path=None, profile="clean", record=False):
+    """Answer every request from a transit_replay fixture corpus, or with record=True capture one.
+
+    profile names a transit_replay.PROFILES entry (latency, errors, 429
+    storms) or is a Profile. Call before the first request: sessions keep
+    the transport they were built with.
+    """
+    global API_KEY, TRANSPORT
+    from transit_replay import FIXTURES_PATH, FixtureStore, RecordingAdapter, ReplayAdapter
+
+    store = FixtureStore(path or FIXTURES_PATH)
+    if record:
+        TRANSPORT = RecordingAdapter(store)
+        return TRANSPORT
+    TRANSPORT = ReplayAdapter(store, profile)
+    # Replay needs no key, and the placeholder has no quota to protect
+    if API_KEY is None:
+        API_KEY = "fixtures"
+        QUOTAS.setdefault(API_KEY, 1000)
+    return TRANSPORT
+
+
+def resolve_api_key(api_key=None):
+    """api_key if given, else the one set by use_daemon()/use_fixtures(), else the configured key."""
+    if api_key is not None:
+        return api_key
+    if API_KEY is not None:
+        return API_KEY
+    import source_helper
+    return source_helper.get_api_key()
+
+
+def _base(base_url):
+    return base_url or API_BASE
+
+
+def _suffix(fmt):
+    return ".json" if (fmt or API_FORMAT) == "json" else ""
+
+
+def decode_schedule_body(body, fmt=None):
+    """A schedule body in either wire format as (StopInfo, [RouteInfo], [ScheduledStop])."""
+    fmt = fmt or API_FORMAT
+    with transit_metrics.timed("transit_parse_seconds", "schedule." + fmt):
+        if fmt == "json":
+            return decode_schedule(body)
+        from transit_parser import parse_schedule
+        return parse_schedule(io.BytesIO(body))
+
+
+def decode_schedule_stream(raw):
+    """An XML schedule parsed as it is read from a file-like body, such as a streamed response.raw."""
+    with transit_metrics.timed("transit_parse_seconds", "schedule.xml"):
+        from transit_parser import parse_schedule
+        return parse_schedule(raw)
+
+
+def decode_stops_body(body, fmt=None):
+    fmt = fmt or API_FORMAT
+    with transit_metrics.timed("transit_parse_seconds", "stops." + fmt):
+        if fmt == "json":
+            return decode_stops(body)
+        from transit_parser import iter_stops
+        return list(iter_stops(io.BytesIO(body)))
+
+
+def schedule_url(stop_id, api_key=None, base_url=None, fmt=None):
+    return f"{_base(base_url)}/stops/{stop_id}/schedule{_suffix(fmt)}?api-key={resolve_api_key(api_key)}"
+
+
+def fetch_schedule(stop_id, api_key=None, session=None, base_url=None, priority=INTERACTIVE, fmt=None):
+    """Fetch and parse one stop schedule into (StopInfo, [RouteInfo], [ScheduledStop])."""
+    from transit_cache import normalize_url
+
+    session = session or shared_session()
+    url = schedule_url(stop_id, api_key, base_url, fmt)
+    # Uncached XML is parsed off the socket as it arrives; a cached body has to be read whole to be kept
+    stream = (fmt or API_FORMAT) == "xml" and session.cache is None
+
+    def load():
+        with session.get(url, timeout=10, priority=priority, stream=stream) as response:
+            response.raise_for_status()
+            if stream:
+                schedule = _decode_streamed(response)
+            else:
+                schedule = decode_schedule_body(response.content, fmt)
+        if session.recorder is not None:
+            session.recorder.record(stop_id, schedule[2])
+        return schedule
+
+    # Callers asking for the same stop at once share one fetch and one parse
+    return session.flights.do(("schedule", normalize_url(url)), load)
+
+
+def _decode_streamed(response):
+    import requests
+    import urllib3
+
+    # Undo any Content-Encoding, which requests does for content but not for raw
+    response.raw.decode_content = True
+    try:
+        return decode_schedule_stream(response.raw)
+    except urllib3.exceptions.HTTPError as exc:
+        # A connection lost mid-body surfaces from urllib3; report it as requests would
+        raise requests.ConnectionError(exc, response=response) from exc
+
+
+def fetch_schedules(stop_ids, max_concurrency=8, api_key=None, session=None, base_url=None,
+                    priority=INTERACTIVE, fmt=None):
+    """Fetch many stop schedules concurrently, yielding ScheduleResults as they complete.
+
+    A failing stop yields a result with error set and does not affect the others.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    import requests
+
+    api_key = resolve_api_key(api_key)
+    owned = None
+    if session is None:
+        # A pool sized for max_concurrency, but the cache, in-flight requests and arrival recorder
+        # of the shared session, so concurrent calls still coalesce and every schedule is recorded
+        shared = shared_session()
+        session = owned = create_session(pool_maxsize=max_concurrency, cache=shared.cache)
+        session.flights = shared.flights
+        session.recorder = shared.recorder
+    try:
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            futures = {
+                pool.submit(fetch_schedule, stop_id, api_key, session, base_url, priority, fmt): stop_id
+                for stop_id in stop_ids
+            }
+            for future in as_completed(futures):
+                stop_id = futures[future]
+                try:
+                    stop, routes, scheduled = future.result()
+                except (requests.RequestException,) + PARSE_ERRORS as exc:
+                    yield ScheduleResult(stop_id, None, [], [], exc)
+                else:
+                    yield ScheduleResult(stop_id, stop, routes, scheduled, None)
+    finally:
+        if owned is not None:
+            owned.close()
+
+
+def stop_search_url(search, api_key=None, base_url=None, fmt=None):
+    return f"{_base(base_url)}/stops:{search}{_suffix(fmt)}?api-key={resolve_api_key(api_key)}"
+
+
+def fetch_stop_search(search, api_key=None, session=None, base_url=None, priority=INTERACTIVE, fmt=None):
+    """Stops matching a free-text search, as a list of Stop records."""
+    session = session or shared_session()
+    with session.get(stop_search_url(search, api_key, base_url, fmt), timeout=10, priority=priority) as response:
+        response.raise_for_status()
+        return decode_stops_body(response.content, fmt)
+
+
+def stops_near_url(latitude, longitude, distance, api_key=None, base_url=None, fmt=None):
+    return (
+        f"{_base(base_url)}/stops{_suffix(fmt)}?lat={latitude}&lon={longitude}"
+        f"&distance={distance}&api-key={resolve_api_key(api_key)}"
+    )
+
+
+def fetch_stops_near(latitude, longitude, distance, api_key=None, session=None, base_url=None,
+                     priority=INTERACTIVE, fmt=None):
+    """All stops within distance metres of a point, as a list of Stop records."""
+    session = session or shared_session()
+    url = stops_near_url(latitude, longitude, distance, api_key, base_url, fmt)
+    with session.get(url, timeout=10, priority=priority) as response:
+        response.raise_for_status()
+        return decode_stops_body(response.content, fmt)
+
+
+def _async_client(max_concurrency):
+    import asyncio
+
+    # Prefer aiohttp, fall back to httpx; neither is required for the threaded path
+    try:
+        import aiohttp
+    except ImportError:
+        aiohttp = None
+    if aiohttp is not None:
+        connector = aiohttp.TCPConnector(limit=max_concurrency, limit_per_host=max_concurrency)
+        client = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=10))
+
+        async def get(url, limiter):
+            async with client.get(url) as response:
+                limiter.feedback(response.status, response.headers.get("Retry-After"))
+                response.raise_for_status()
+                return await response.read()
+
+        return client, get, (aiohttp.ClientError, asyncio.TimeoutError)
+
+    import httpx
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+    client = httpx.AsyncClient(limits=limits, timeout=10)
+
+    async def get(url, limiter):
+        response = await client.get(url)
+        limiter.feedback(response.status_code, response.headers.get("Retry-After"))
+        response.raise_for_status()
+        return response.content
+
+    return client, get, (httpx.HTTPError,)
+
+
+async def fetch_schedules_async(stop_ids, max_concurrency=8, api_key=None, base_url=None,
+                                priority=INTERACTIVE, fmt=None):
+    """asyncio counterpart of fetch_schedules, backed by aiohttp or httpx."""
+    import asyncio
+
+    from transit_cache import normalize_url
+
+    session = shared_session()
+    api_key = resolve_api_key(api_key)
+    limiter = get_limiter(api_key)
+    client, get, errors = _async_client(max_concurrency)
+
+    async def load(stop_id, url):
+        # The limiter blocks, so wait for a token on the default executor
+        await asyncio.get_running_loop().run_in_executor(None, limiter.acquire, priority)
+        started = time.perf_counter()
+        body = await get(url, limiter)
+        metrics = transit_metrics.REGISTRY
+        if metrics is not None:
+            metrics.record_fetch(url, 200, len(body), time.perf_counter() - started)
+        schedule = decode_schedule_body(body, fmt)
+        # Recorded once by the fetch itself, not by every caller it was shared with
+        if session.recorder is not None:
+            session.recorder.record(stop_id, schedule[2])
+        return schedule
+
+    async def fetch(stop_id):
+        url = schedule_url(stop_id, api_key, base_url, fmt)
+        try:
+            schedule = await session.flights.do_async(("schedule", normalize_url(url)),
+                                                      lambda: load(stop_id, url))
+            return ScheduleResult(stop_id, *schedule, None)
+        except errors + PARSE_ERRORS as exc:
+            return ScheduleResult(stop_id, None, [], [], exc)
+
+    async with client:
+        for next_result in asyncio.as_completed([fetch(stop_id) for stop_id in stop_ids]):
+            yield await next_result
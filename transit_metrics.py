@@ -0,0 +1,277 @@
+"""Opt-in metrics for the fetch, retry, parse and render stages.
+
+    TRANSITTRACKER_METRICS=txt/metrics.json python -m transittracker schedule 10758
+    TRANSITTRACKER_PROFILE=txt/run.prof python main.py
+    curl http://127.0.0.1:8642/metrics        # daemon and live feed, Prometheus text
+
+Nothing is recorded until enable() is called; until then every hook is a
+global lookup and a return, so instrumentation that is off costs nothing
+measurable next to a request (see bench_metrics.py). Once enabled, the
+shared Registry keeps:
+
+    transit_http_request_seconds{endpoint}     histogram, per upstream attempt, body included
+    transit_http_response_bytes_total{endpoint}
+    transit_http_responses_total{status}
+    transit_http_retries_total{endpoint}       urllib3 retries (5xx, dropped connections)
+    transit_http_throttled_total{status}       429/503 answers retried by TransitSession
+    transit_http_errors_total{error}           requests that failed outright
+    transit_cache_lookups_total{result}        hit, miss, revalidated, disk
+    transit_parse_seconds{body}                e.g. body="schedule.json"
+    transit_render_seconds{view}               cli or gui
+
+The daemon and live feed turn metrics on and serve them at GET /metrics;
+other entry points write a JSON snapshot every DUMP_INTERVAL seconds (and
+at exit) to the path in $TRANSITTRACKER_METRICS. $TRANSITTRACKER_PROFILE
+runs the process under cProfile and writes pstats to that path at exit.
+"""
+import bisect
+import os
+import threading
+import time
+
+# Upper bounds in seconds, Prometheus-style; one more bucket catches the rest
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DUMP_INTERVAL = 60
+
+# name: (type, label name, help)
+METRICS = {
+    "transit_http_request_seconds": ("histogram", "endpoint", "Upstream request latency per attempt"),
+    "transit_http_response_bytes_total": ("counter", "endpoint", "Response body bytes received upstream"),
+    "transit_http_responses_total": ("counter", "status", "Upstream responses by status code"),
+    "transit_http_retries_total": ("counter", "endpoint", "Retries made by urllib3 for 5xx or connection errors"),
+    "transit_http_throttled_total": ("counter", "status", "Throttled answers retried after the rate limiter"),
+    "transit_http_errors_total": ("counter", "error", "Requests that raised instead of answering"),
+    "transit_cache_lookups_total": ("counter", "result", "ResponseCache lookups by outcome"),
+    "transit_parse_seconds": ("histogram", "body", "Time to decode a response body"),
+    "transit_render_seconds": ("histogram", "view", "Time to render a schedule"),
+}
+
+
+def endpoint_of(url):
+    """Coarse endpoint label for an API url: schedule, search or stops."""
+    if "/schedule" in url:
+        return "schedule"
+    return "search" if "/stops:" in url else "stops"
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (name, label value) -> number or Histogram
+        self._values = {}
+        self.started = time.time()
+
+    def count(self, name, amount=1, label=""):
+        key = (name, label)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def observe(self, name, seconds, label=""):
+        key = (name, label)
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = Histogram()
+            histogram.observe(seconds)
+
+    def record_fetch(self, url, status, size, seconds, retries=0):
+        endpoint = endpoint_of(url)
+        self.observe("transit_http_request_seconds", seconds, endpoint)
+        self.count("transit_http_responses_total", 1, str(status))
+        if size:
+            self.count("transit_http_response_bytes_total", size, endpoint)
+        if retries:
+            self.count("transit_http_retries_total", retries, endpoint)
+
+    def record_response(self, url, response, seconds, read=True):
+        """Record a requests.Response; reads its body so the latency covers the transfer.
+
+        A streamed body belongs to its reader, so with read=False it is left
+        alone and its size taken from Content-Length.
+        """
+        if read:
+            seconds += _time_read(response)
+            size = len(response.content)
+        else:
+            size = int(response.headers.get("Content-Length") or 0)
+        # urllib3 hangs the Retry that produced this response, with its history, on the raw response
+        retries = getattr(response.raw, "retries", None)
+        self.record_fetch(url, response.status_code, size, seconds, len(retries.history) if retries is not None else 0)
+
+    def snapshot(self):
+        """{name: {label: value}}, histograms as {"buckets": [(le, cumulative)], "sum", "count"}."""
+        with self._lock:
+            values = [(key, value if isinstance(value, (int, float)) else
+                       (list(value.counts), value.sum, value.count)) for key, value in self._values.items()]
+        snapshot = {"started": self.started, "at": time.time()}
+        for (name, label), value in sorted(values):
+            if isinstance(value, tuple):
+                counts, total, count = value
+                cumulative, running = [], 0
+                for bound, n in zip(BUCKETS + ("+Inf",), counts):
+                    running += n
+                    cumulative.append((bound, running))
+                value = {"buckets": cumulative, "sum": total, "count": count}
+            snapshot.setdefault(name, {})[label] = value
+        return snapshot
+
+    def prometheus(self):
+        """The registry in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, (kind, label_name, text) in METRICS.items():
+            series = snapshot.get(name)
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for label, value in series.items():
+                labels = f'{label_name}="{label}"'
+                if kind == "counter":
+                    lines.append(f"{name}{{{labels}}} {value}")
+                    continue
+                for bound, cumulative in value["buckets"]:
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {value['sum']:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _time_read(response):
+    started = time.perf_counter()
+    response.content
+    return time.perf_counter() - started
+
+
+REGISTRY = None
+_ENABLE_LOCK = threading.Lock()
+
+
+def enable():
+    """Start recording; returns the shared Registry."""
+    global REGISTRY
+    with _ENABLE_LOCK:
+        if REGISTRY is None:
+            REGISTRY = Registry()
+    return REGISTRY
+
+
+def disable():
+    global REGISTRY
+    REGISTRY = None
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "label", "started")
+
+    def __init__(self, registry, name, label):
+        self.registry = registry
+        self.name = name
+        self.label = label
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.started, self.label)
+
+
+class _Off:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_OFF = _Off()
+
+
+def timed(name, label=""):
+    """Context manager observing its duration into histogram name, or doing nothing while off."""
+    registry = REGISTRY
+    return _OFF if registry is None else _Timer(registry, name, label)
+
+
+def count(name, amount=1, label=""):
+    registry = REGISTRY
+    if registry is not None:
+        registry.count(name, amount, label)
+
+
+def prometheus():
+    """Prometheus text for the shared registry; empty while metrics are off."""
+    registry = REGISTRY
+    return registry.prometheus() if registry is not None else ""
+
+
+def dump(path):
+    import json
+
+    registry = REGISTRY
+    if registry is None:
+        return
+    with open(path + ".tmp", "w") as f:
+        json.dump(registry.snapshot(), f, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+def start_dump(path, interval=DUMP_INTERVAL):
+    """Enable metrics and write a JSON snapshot to path every interval seconds and at exit."""
+    import atexit
+
+    enable()
+    stopped = threading.Event()
+
+    def loop():
+        while not stopped.wait(interval):
+            dump(path)
+
+    def final():
+        stopped.set()
+        dump(path)
+
+    threading.Thread(target=loop, name="metrics-dump", daemon=True).start()
+    atexit.register(final)
+
+
+def start_profile(path):
+    """Profile the calling thread with cProfile from now until exit, writing pstats to path."""
+    import atexit
+    import cProfile
+    import sys
+
+    profiler = cProfile.Profile()
+
+    def final():
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"[INFO] Profile written to {path} (python -m pstats {path})", file=sys.stderr)
+
+    atexit.register(final)
+    profiler.enable()
+
+
+def configure_from_env():
+    """Apply $TRANSITTRACKER_METRICS and $TRANSITTRACKER_PROFILE; entry points call this at startup."""
+    if os.environ.get("TRANSITTRACKER_METRICS"):
+        start_dump(os.environ["TRANSITTRACKER_METRICS"])
+    if os.environ.get("TRANSITTRACKER_PROFILE"):
+        start_profile(os.environ["TRANSITTRACKER_PROFILE"])
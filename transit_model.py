@@ -0,0 +1,128 @@
+"""Shared records for API data, and the JSON decoder that fills them.
+
+Both wire formats end up as the same namedtuples: transit_parser streams
+the XML form, decode_schedule / decode_stops handle the .json form. JSON is
+decoded with orjson or msgspec when one is installed, falling back to the
+stdlib json module.
+"""
+from collections import namedtuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+NA = "N/A"
+
+# The stop a schedule belongs to
+StopInfo = namedtuple("StopInfo", "key name direction street cross_street")
+RouteInfo = namedtuple("RouteInfo", "key name")
+# One stop from a stop search or location query; latitude/longitude are floats or None
+Stop = namedtuple("Stop", "key name direction street cross_street latitude longitude")
+ScheduledStop = namedtuple(
+    "ScheduledStop",
+    "route_key route_name key trip_key "
+    "arrival_scheduled arrival_estimated departure_scheduled departure_estimated",
+)
+
+# What a malformed body raises, whichever decoder is in use
+DECODE_ERRORS = (ValueError,) if msgspec is None else (ValueError, msgspec.DecodeError)
+
+if orjson is not None:
+    loads = orjson.loads
+    DECODER = "orjson"
+elif msgspec is not None:
+    loads = msgspec.json.decode
+    DECODER = "msgspec"
+else:
+    import json
+    loads = json.loads
+    DECODER = "json"
+
+
+def _text(obj, *path):
+    for name in path:
+        if not isinstance(obj, dict):
+            return NA
+        obj = obj.get(name)
+    if obj is None or obj == "":
+        return NA
+    return obj if isinstance(obj, str) else str(obj)
+
+
+def _shaped(value, kind, where):
+    """value if it is a kind (dict or list), kind() if it is missing or empty; ValueError otherwise.
+
+    Well-formed JSON of the wrong shape must fail like malformed JSON, as a DECODE_ERRORS.
+    """
+    if value is None or value == "":
+        return kind()
+    if not isinstance(value, kind):
+        raise ValueError(f"{where}: expected {'an object' if kind is dict else 'an array'}, "
+                         f"got {type(value).__name__}")
+    return value
+
+
+def _coordinate(obj):
+    centre = _shaped(obj.get("centre"), dict, "centre")
+    geographic = _shaped(obj.get("geographic") or centre.get("geographic"), dict, "geographic")
+    latitude = geographic.get("latitude")
+    longitude = geographic.get("longitude")
+    return (
+        float(latitude) if latitude not in (None, "") else None,
+        float(longitude) if longitude not in (None, "") else None,
+    )
+
+
+def _stop_info(obj):
+    return StopInfo(
+        _text(obj, "key"),
+        _text(obj, "name"),
+        _text(obj, "direction"),
+        _text(obj, "street", "name"),
+        _text(obj, "cross-street", "name"),
+    )
+
+
+def decode_schedule(body):
+    """A /v4/stops/{stop}/schedule.json body as (StopInfo or None, [RouteInfo], [ScheduledStop])."""
+    data = _shaped(_shaped(loads(body), dict, "body").get("stop-schedule"), dict, "stop-schedule")
+    stop = _shaped(data.get("stop"), dict, "stop")
+    routes = []
+    scheduled = []
+    for route_schedule in _shaped(data.get("route-schedules"), list, "route-schedules"):
+        route_schedule = _shaped(route_schedule, dict, "route-schedule")
+        route = _shaped(route_schedule.get("route"), dict, "route")
+        route_key = _text(route, "key")
+        route_name = _text(route, "name")
+        routes.append(RouteInfo(route_key, route_name))
+        for item in _shaped(route_schedule.get("scheduled-stops"), list, "scheduled-stops"):
+            item = _shaped(item, dict, "scheduled-stop")
+            times = _shaped(item.get("times"), dict, "times")
+            arrival = _shaped(times.get("arrival"), dict, "arrival")
+            departure = _shaped(times.get("departure"), dict, "departure")
+            scheduled.append(ScheduledStop(
+                route_key,
+                route_name,
+                _text(item, "key"),
+                _text(item, "trip-key"),
+                _text(arrival, "scheduled"),
+                _text(arrival, "estimated"),
+                _text(departure, "scheduled"),
+                _text(departure, "estimated"),
+            ))
+    return (_stop_info(stop) if stop else None), routes, scheduled
+
+
+def decode_stops(body):
+    """A /v4/stops.json or /v4/stops:{search}.json body as a list of Stop records."""
+    stops = []
+    for obj in _shaped(_shaped(loads(body), dict, "body").get("stops"), list, "stops"):
+        obj = _shaped(obj, dict, "stop")
+        info = _stop_info(obj)
+        stops.append(Stop(*info, *_coordinate(obj)))
+    return stops
@@ -0,0 +1,92 @@
+import xml.etree.ElementTree as ET
+
+from transit_model import NA, RouteInfo, ScheduledStop, Stop, StopInfo
+
+
+def _text(elem, path):
+    return elem.findtext(path) or NA
+
+
+def _stop_info(elem):
+    return StopInfo(
+        _text(elem, "key"),
+        _text(elem, "name"),
+        _text(elem, "direction"),
+        _text(elem, "street/name"),
+        _text(elem, "cross-street/name"),
+    )
+
+
+def _scheduled_stop(elem, route):
+    return ScheduledStop(
+        route.key,
+        route.name,
+        _text(elem, "key"),
+        _text(elem, "trip-key"),
+        _text(elem, "times/arrival/scheduled"),
+        _text(elem, "times/arrival/estimated"),
+        _text(elem, "times/departure/scheduled"),
+        _text(elem, "times/departure/estimated"),
+    )
+
+
+def iter_schedule(source):
+    """Stream a /v4/stops/{stop}/schedule XML body into records.
+
+    source is a binary file object (e.g. a streamed response.raw) or a path.
+    Each element is cleared as soon as its record is built, so memory stays
+    flat no matter how many scheduled stops the body holds.
+    """
+    route = RouteInfo(NA, NA)
+    for _, elem in ET.iterparse(source):
+        tag = elem.tag
+        if tag == "scheduled-stop":
+            yield _scheduled_stop(elem, route)
+            elem.clear()
+        elif tag == "scheduled-stops" or tag == "route-schedule":
+            # Drop the cleared shells left behind by the scheduled stops
+            elem.clear()
+        elif tag == "route":
+            route = RouteInfo(_text(elem, "key"), _text(elem, "name"))
+            yield route
+            elem.clear()
+        elif tag == "stop":
+            yield _stop_info(elem)
+            elem.clear()
+
+
+def _coordinate(elem, path):
+    text = elem.findtext(path)
+    return float(text) if text else None
+
+
+def iter_stops(source):
+    """Stream a /v4/stops response (search or location query) into Stop records."""
+    for _, elem in ET.iterparse(source):
+        if elem.tag != "stop":
+            continue
+        yield Stop(
+            _text(elem, "key"),
+            _text(elem, "name"),
+            _text(elem, "direction"),
+            _text(elem, "street/name"),
+            _text(elem, "cross-street/name"),
+            _coordinate(elem, ".//geographic/latitude"),
+            _coordinate(elem, ".//geographic/longitude"),
+        )
+        elem.clear()
+
+
+def parse_schedule(source):
+    """Collect iter_schedule output into (StopInfo or None, [RouteInfo], [ScheduledStop])."""
+    stop = None
+    routes = []
+    scheduled = []
+    for record in iter_schedule(source):
+        if type(record) is ScheduledStop:
+            scheduled.append(record)
+        elif type(record) is RouteInfo:
+            routes.append(record)
+        else:
+            stop = record
+    return stop, routes, scheduled
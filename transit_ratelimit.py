@@ -0,0 +1,154 @@
+"""Client-side rate limiting for outbound API calls.
+
+Every upstream request takes a token from the RateLimiter for its API key.
+Waiters are served by priority, so an interactive lookup queued behind a
+batch of background refreshes goes out next. The limiter's rate adapts:
+429/503 answers halve it and honour Retry-After, and each successful
+answer creeps it back up towards the configured quota (AIMD).
+"""
+import heapq
+import itertools
+import threading
+import time
+
+INTERACTIVE = 0
+BACKGROUND = 10
+
+THROTTLED_STATUSES = (429, 503)
+
+# Requests per second allowed for each API key; keys not listed get DEFAULT_RATE (the API's 100 a
+# minute). configure_quotas() sets either from $TRANSITTRACKER_QUOTA.
+QUOTAS = {}
+DEFAULT_RATE = 100 / 60
+DEFAULT_BURST = 10
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, min_rate=None):
+        self.max_rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 16
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+        self.granted = 0
+        self.throttled = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def stats(self):
+        with self._cond:
+            return {
+                "rate": self.rate,
+                "queue_depth": len(self._waiting),
+                "max_queue_depth": self.max_queue_depth,
+                "granted": self.granted,
+                "throttled": self.throttled,
+                "mean_wait": self.total_wait / self.granted if self.granted else 0.0,
+                "max_wait": self.max_wait,
+            }
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_take(self, now):
+        # 0 when a token was taken, otherwise seconds until one can be
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def acquire(self, priority=INTERACTIVE):
+        """Block until this caller may send a request; lower priority values go first."""
+        start = time.monotonic()
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiting))
+            while True:
+                if self._waiting[0] == ticket:
+                    delay = self._try_take(time.monotonic())
+                    if delay == 0:
+                        heapq.heappop(self._waiting)
+                        self._cond.notify_all()
+                        break
+                    self._cond.wait(delay)
+                else:
+                    self._cond.wait()
+            waited = time.monotonic() - start
+            self.granted += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def feedback(self, status_code, retry_after=None):
+        """Adapt the rate to an upstream answer."""
+        with self._cond:
+            if status_code in THROTTLED_STATUSES:
+                self.throttled += 1
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._tokens = min(self._tokens, 0)
+                delay = parse_retry_after(retry_after)
+                if delay:
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            elif status_code < 500:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+            self._cond.notify_all()
+
+
+_LIMITERS = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_limiter(api_key):
+    """The process-wide limiter for api_key, created from QUOTAS on first use."""
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(api_key)
+        if limiter is None:
+            limiter = _LIMITERS[api_key] = RateLimiter(QUOTAS.get(api_key, DEFAULT_RATE))
+        return limiter
+
+
+def configure_quotas(spec):
+    """Apply a quota spec in requests per minute, as the API states them; call before the first request.
+
+    "600" sets DEFAULT_RATE, "KEY=600" the quota of one API key, and several
+    are separated by commas. Raises ValueError on anything else.
+    """
+    global DEFAULT_RATE
+
+    for item in spec.split(","):
+        key, _, value = item.strip().rpartition("=")
+        try:
+            per_minute = float(value)
+        except ValueError:
+            raise ValueError(f"bad quota {item.strip()!r}: expected N or KEY=N requests per minute") from None
+        if not per_minute > 0:
+            raise ValueError(f"bad quota {item.strip()!r}: must be more than 0 a minute")
+        if key:
+            QUOTAS[key] = per_minute / 60
+        else:
+            DEFAULT_RATE = per_minute / 60
@@ -0,0 +1,236 @@
+"""Record/replay transport, so fetches run offline against captured responses.
+
+    python -m transittracker --record fixtures schedule 10758      # needs txt/api.txt
+    python -m transittracker --replay fixtures schedule 10758      # no key, no network
+    transit_http.use_fixtures("fixtures", profile="storm")
+
+A fixture corpus is a directory of response bodies plus index.json, which
+maps each request URL (api-key stripped, query sorted, as the cache keys
+it) to its status, headers and body file. RecordingAdapter passes requests
+to the network and writes what comes back; ReplayAdapter answers from the
+corpus, honouring If-None-Match so cache revalidation behaves as upstream
+does. Unknown URLs get a 404.
+
+A Profile layers network behaviour over replay: latency with jitter, a
+share of 500s, and 429 storms (every request for storm_length seconds out
+of each storm_period answers 429 with Retry-After). Timeouts are honoured,
+so a slow profile with a short timeout raises requests.ReadTimeout. Both
+adapters retry under transit_session.retry_policy(), the urllib3 Retry
+production sessions use, so replayed 500s and timeouts are retried (and
+show up in transit_http_retries_total) as upstream ones would be.
+
+synthetic_corpus() writes a corpus from stub_server's generators for when
+no captured one is at hand.
+"""
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3 import HTTPResponse
+from urllib3.exceptions import MaxRetryError, ReadTimeoutError
+
+from transit_cache import normalize_url
+from transit_session import retry_policy
+
+FIXTURES_PATH = "fixtures"
+INDEX_FILE = "index.json"
+
+# Upstream headers kept with a recorded response
+KEEP_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control")
+
+Profile = namedtuple("Profile", "latency jitter error_rate storm_period storm_length retry_after")
+PROFILES = {
+    "clean": Profile(0.0, 0.0, 0.0, 0, 0, 0),
+    "lan": Profile(0.02, 0.01, 0.0, 0, 0, 0),
+    "slow": Profile(0.4, 0.3, 0.0, 0, 0, 0),
+    "flaky": Profile(0.05, 0.03, 0.1, 0, 0, 0),
+    "storm": Profile(0.05, 0.03, 0.0, 10, 3, 1),
+}
+
+
+class FixtureStore:
+    def __init__(self, path=FIXTURES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._bodies = {}
+        index_path = os.path.join(path, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                self._index = json.load(f)
+        else:
+            self._index = {}
+
+    def __len__(self):
+        return len(self._index)
+
+    def urls(self):
+        return list(self._index)
+
+    def get(self, url):
+        """(status, headers, body) recorded for url, or None."""
+        key = normalize_url(url)
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        body = self._bodies.get(key)
+        if body is None:
+            with open(os.path.join(self.path, entry["file"]), "rb") as f:
+                body = self._bodies[key] = f.read()
+        return entry["status"], entry["headers"], body
+
+    def put(self, url, status, headers, body):
+        key = normalize_url(url)
+        content_type = headers.get("Content-Type", "")
+        suffix = ".json" if "json" in content_type else ".xml" if "xml" in content_type else ".bin"
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] + suffix
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, name), "wb") as f:
+                f.write(body)
+            self._index[key] = {"status": status, "headers": headers, "file": name}
+            self._bodies[key] = body
+            with open(os.path.join(self.path, INDEX_FILE + ".tmp"), "w") as f:
+                json.dump(self._index, f, indent=1, sort_keys=True)
+            os.replace(os.path.join(self.path, INDEX_FILE + ".tmp"), os.path.join(self.path, INDEX_FILE))
+
+
+def _response(request, status, headers, body):
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = request.url
+    response.request = request
+    response._content = body
+    # What urllib3 hands requests, so Retry can read its status and headers
+    response.raw = HTTPResponse(body=io.BytesIO(body), headers=headers, status=status, preload_content=False)
+    return response
+
+
+def _read_timeout(timeout):
+    return timeout[1] if isinstance(timeout, tuple) else timeout
+
+
+class ReplayAdapter(BaseAdapter):
+    """Answers requests from a FixtureStore, shaped by a Profile."""
+
+    def __init__(self, store, profile="clean", seed=None, max_retries=None):
+        super().__init__()
+        self.store = store
+        self.max_retries = max_retries or retry_policy()
+        self.profile = PROFILES[profile] if isinstance(profile, str) else profile
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.counts = {"served": 0, "not_modified": 0, "missing": 0, "throttled": 0, "errors": 0, "timeouts": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        # The retry loop urllib3 runs under HTTPAdapter, over simulated attempts
+        retries = self.max_retries
+        while True:
+            try:
+                response = self._attempt(request, timeout)
+            except requests.ReadTimeout as exc:
+                try:
+                    retries = retries.increment(request.method, request.url,
+                                                error=ReadTimeoutError(None, request.url, str(exc)))
+                except (MaxRetryError, ReadTimeoutError):
+                    raise exc from None
+                retries.sleep()
+                continue
+            if not retries.is_retry(request.method, response.status_code, "Retry-After" in response.headers):
+                break
+            try:
+                retries = retries.increment(request.method, request.url, response=response.raw)
+            except MaxRetryError:
+                # raise_on_status=False: the last answer goes back to the caller
+                break
+            retries.sleep(response.raw)
+        response.raw.retries = retries
+        return response
+
+    def _attempt(self, request, timeout):
+        profile = self.profile
+        with self._lock:
+            delay = max(0.0, profile.latency + self._random.uniform(-profile.jitter, profile.jitter))
+            failed = profile.error_rate and self._random.random() < profile.error_rate
+        limit = _read_timeout(timeout)
+        if limit is not None and delay > limit:
+            time.sleep(limit)
+            self._count("timeouts")
+            raise requests.ReadTimeout(f"replay latency {delay:.2f}s exceeded timeout {limit}s", request=request)
+        if delay:
+            time.sleep(delay)
+
+        if profile.storm_period and (time.monotonic() - self._started) % profile.storm_period < profile.storm_length:
+            self._count("throttled")
+            return _response(request, 429, {"Retry-After": str(profile.retry_after)}, b"<error>throttled</error>")
+        if failed:
+            self._count("errors")
+            return _response(request, 500, {"Content-Type": "application/xml"}, b"<error>replay failure</error>")
+
+        recorded = self.store.get(request.url)
+        if recorded is None:
+            self._count("missing")
+            return _response(request, 404, {"Content-Type": "application/xml"}, b"<error>no fixture</error>")
+        status, headers, body = recorded
+        etag = headers.get("ETag")
+        if etag and request.headers.get("If-None-Match") == etag:
+            self._count("not_modified")
+            return _response(request, 304, headers, b"")
+        self._count("served")
+        return _response(request, status, headers, body)
+
+    def close(self):
+        pass
+
+
+class RecordingAdapter(HTTPAdapter):
+    """HTTPAdapter that writes every complete upstream answer into a FixtureStore."""
+
+    def __init__(self, store, **kwargs):
+        kwargs.setdefault("max_retries", retry_policy())
+        super().__init__(**kwargs)
+        self.store = store
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        # 304s have no body and throttled/5xx answers are not worth replaying
+        if response.status_code < 300 or response.status_code == 404:
+            headers = {name: response.headers[name] for name in KEEP_HEADERS if name in response.headers}
+            self.store.put(request.url, response.status_code, headers, response.content)
+        return response
+
+
+def synthetic_corpus(path, base_url="https://api.winnipegtransit.com/v4"):
+    """Write a corpus of stub_server-shaped responses: schedules for small to very large stops, both formats."""
+    from stub_server import make_schedule, make_schedule_json, make_stops, make_stops_json
+
+    store = FixtureStore(path)
+    # stop id: (routes, stops per route)
+    sizes = {"10001": (1, 4), "10002": (3, 10), "10003": (5, 20), "10004": (10, 40), "10005": (20, 80)}
+    for stop_id, (routes, per_route) in sizes.items():
+        for suffix, make, content_type in ((".json", make_schedule_json, "application/json"),
+                                           ("", make_schedule, "application/xml")):
+            body = make(routes, per_route, stop_id)
+            etag = '"' + hashlib.sha1(body).hexdigest()[:12] + '"'
+            store.put(f"{base_url}/stops/{stop_id}/schedule{suffix}", 200,
+                      {"Content-Type": content_type, "ETag": etag}, body)
+    for query, count in (("portage", 10), ("main", 40)):
+        store.put(f"{base_url}/stops:{query}.json", 200, {"Content-Type": "application/json"},
+                  make_stops_json(range(count)))
+        store.put(f"{base_url}/stops:{query}", 200, {"Content-Type": "application/xml"}, make_stops(range(count)))
+    return store
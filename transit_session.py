@@ -0,0 +1,110 @@
+"""The requests-based HTTP session behind transit_http.
+
+Kept apart from transit_http so that importing the fetch helpers does not
+pull in requests/urllib3; transit_http builds its shared session from here
+on the first request.
+"""
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import transit_metrics
+from transit_cache import normalize_url
+from transit_coalesce import SingleFlight, copy_response
+from transit_ratelimit import INTERACTIVE, THROTTLED_STATUSES, get_limiter
+
+
+class TransitSession(requests.Session):
+    """requests.Session whose GETs go through an optional ResponseCache.
+
+    Identical GETs in flight at the same time are coalesced into one upstream
+    request; flights.stats() reports how many callers were served that way.
+    Every request that does reach upstream first waits its turn on the
+    RateLimiter for its API key; pass priority=BACKGROUND for refreshes
+    that should yield to interactive lookups. With no cache, stream=True
+    leaves the body on the socket for the caller to read from raw; such a
+    response is the caller's alone and is not shared with anyone.
+    """
+
+    throttle_retries = 3
+
+    def __init__(self, cache=None):
+        super().__init__()
+        self.cache = cache
+        self.flights = SingleFlight()
+        # Set by arrival_history.enable() to record every parsed schedule
+        self.recorder = None
+
+    def get(self, url, priority=INTERACTIVE, **kwargs):
+        headers = kwargs.pop("headers", None) or {}
+        params = kwargs.pop("params", None)
+        if params:
+            # Fold params into the url, which keys the cache, the flight and the limiter
+            url = requests.Request("GET", url, params=params).prepare().url
+        limiter = get_limiter(parse_qs(urlsplit(url).query).get("api-key", [None])[0])
+        stream = kwargs.get("stream", False)
+
+        def send(conditional):
+            # 429/503 are retried here rather than by urllib3 so that every
+            # attempt is paced by the limiter
+            for attempt in range(self.throttle_retries + 1):
+                limiter.acquire(priority)
+                started = time.perf_counter()
+                try:
+                    response = super(TransitSession, self).get(url, headers={**headers, **conditional}, **kwargs)
+                except requests.RequestException as exc:
+                    transit_metrics.count("transit_http_errors_total", 1, type(exc).__name__)
+                    raise
+                metrics = transit_metrics.REGISTRY
+                if metrics is not None:
+                    metrics.record_response(url, response, time.perf_counter() - started, read=not stream)
+                limiter.feedback(response.status_code, response.headers.get("Retry-After"))
+                if response.status_code not in THROTTLED_STATUSES or attempt == self.throttle_retries:
+                    return response
+                transit_metrics.count("transit_http_throttled_total", 1, str(response.status_code))
+                response.close()
+
+        if stream and self.cache is None:
+            return send({})
+
+        def load():
+            response = send({}) if self.cache is None else self.cache.fetch(url, send)
+            # Read the body once so every waiting caller can share it
+            response.content
+            return response
+
+        key = (normalize_url(url), tuple(sorted(headers.items())))
+        return copy_response(self.flights.do(key, load))
+
+
+def retry_policy():
+    """The urllib3 Retry for 5xx answers and dropped connections; transit_replay applies it too."""
+    return Retry(
+        total=3,
+        connect=3,
+        read=3,
+        backoff_factor=0.5,
+        status_forcelist=(500, 502, 504),
+        allowed_methods=("GET", "POST"),
+        raise_on_status=False,
+        # 429/503 with Retry-After are TransitSession's to retry, each attempt paced by the limiter;
+        # urllib3 would otherwise retry them itself, unpaced, before the session ever saw them
+        respect_retry_after_header=False,
+    )
+
+
+def create_session(pool_maxsize=10, cache=None, transport=None):
+    session = TransitSession(cache)
+    if transport is not None:
+        # A transit_replay adapter stands in for the network; it retries under retry_policy() itself
+        session.mount("http://", transport)
+        session.mount("https://", transport)
+        return session
+    # pool_block caps open connections per host at pool_maxsize
+    adapter = HTTPAdapter(max_retries=retry_policy(), pool_maxsize=pool_maxsize, pool_block=True)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -0,0 +1,53 @@
+"""Start-up options shared by every entry point (main.py, main-with-gui.py, transittracker).
+
+    python main.py --via-daemon
+    python main-with-gui.py --replay fixtures --profile slow
+    TRANSITTRACKER_HISTORY=txt/history python main.py
+    TRANSITTRACKER_QUOTA=600 python -m transittracker board --near 49.8954,-97.1385
+
+Kept apart from transit_http so an entry point started without any of them
+imports nothing beyond argparse.
+"""
+import argparse
+import os
+import sys
+
+
+def configure(argv=None):
+    """Apply the shared options in argv (default sys.argv[1:]); returns argv without them.
+
+    --via-daemon goes through a running transit_daemon, --record DIR or
+    --replay DIR [--profile NAME] through a transit_replay fixture corpus.
+    $TRANSITTRACKER_QUOTA sets the API quota in requests per minute ("600",
+    or "KEY=600,..." per key; 100 otherwise), $TRANSITTRACKER_HISTORY records
+    arrivals for delay analytics, and $TRANSITTRACKER_METRICS /
+    $TRANSITTRACKER_PROFILE turn on metrics snapshots and profiling.
+    """
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument("--via-daemon", action="store_true")
+    parser.add_argument("--record")
+    parser.add_argument("--replay")
+    parser.add_argument("--profile", default="clean")
+    options, rest = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+
+    if os.environ.get("TRANSITTRACKER_QUOTA"):
+        import transit_ratelimit
+        try:
+            transit_ratelimit.configure_quotas(os.environ["TRANSITTRACKER_QUOTA"])
+        except ValueError as exc:
+            parser.error(f"$TRANSITTRACKER_QUOTA: {exc}")
+    if options.via_daemon:
+        import transit_http
+        transit_http.use_daemon()
+    if options.record or options.replay:
+        import transit_http
+        transit_http.use_fixtures(options.record or options.replay, options.profile, record=bool(options.record))
+
+    if os.environ.get("TRANSITTRACKER_HISTORY"):
+        import arrival_history
+        arrival_history.enable(path=os.environ["TRANSITTRACKER_HISTORY"])
+
+    if os.environ.get("TRANSITTRACKER_METRICS") or os.environ.get("TRANSITTRACKER_PROFILE"):
+        import transit_metrics
+        transit_metrics.configure_from_env()
+    return rest
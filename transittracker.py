@@ -0,0 +1,323 @@
+"""Non-interactive command line, for scripts and kiosks.
+
+    python -m transittracker schedule 10758
+    python -m transittracker search "portage main"
+    python -m transittracker daemon
+    python -m transittracker feed
+    python -m transittracker gtfs-import google_transit.zip
+    python -m transittracker prefetch-stops
+    python -m transittracker departures 10758 --live
+    python -m transittracker plan 10758 10625 --at 2026-10-19T08:00
+    python -m transittracker board --near 49.8954,-97.1385 --radius 400 -n 15
+    python -m transittracker --via-daemon schedule 10758
+    python -m transittracker --replay fixtures --profile storm schedule 10758
+
+Nothing beyond argparse is imported until a command runs, and the API key
+and HTTP session are only set up once a request is actually made.
+"""
+import argparse
+import sys
+
+
+def print_schedule(stop, routes, scheduled):
+    import transit_metrics
+
+    with transit_metrics.timed("transit_render_seconds", "cli"):
+        _print_schedule(stop, routes, scheduled)
+
+
+def _print_schedule(stop, routes, scheduled):
+    from transit_model import NA
+
+    print(f"Stop: {stop.name}")
+    print(f"Direction: {stop.direction}")
+    print(f"Street: {stop.street}")
+    print(f"Cross Street: {stop.cross_street}")
+    print("-" * 50)
+
+    if not routes:
+        print("No route schedules found")
+        return
+
+    by_route = {}
+    for record in scheduled:
+        by_route.setdefault(record.route_key, []).append(record)
+
+    for route in routes:
+        print(f"Route: {route.key} - {route.name}")
+        records = by_route.get(route.key)
+        if not records:
+            print("  No scheduled stops found")
+        for record in records or ():
+            if record.arrival_scheduled == NA and record.departure_scheduled == NA:
+                print(f"  Stop: {record.key} (Trip: {record.trip_key}) - no times")
+                continue
+            print(f"  Stop: {record.key} (Trip: {record.trip_key})")
+            print(f"    Arrival: {record.arrival_scheduled} (est: {record.arrival_estimated})")
+            print(f"    Departure: {record.departure_scheduled} (est: {record.departure_estimated})")
+        print()
+
+
+def schedule(args):
+    from transit_http import fetch_schedule
+
+    stop, routes, scheduled = fetch_schedule(args.stop, fmt=args.format)
+    if stop is None:
+        print("No stop found")
+        return 1
+    print_schedule(stop, routes, scheduled)
+    return 0
+
+
+def search(args):
+    import stop_index
+
+    # Answer from the offline stop index when one has been built
+    index = stop_index.load_default()
+    if index is not None:
+        stops = index.search(args.query)
+    else:
+        from transit_http import fetch_stop_search
+        stops = fetch_stop_search(args.query, fmt=args.format)
+
+    if not stops:
+        print("No stops found")
+        return 1
+    for stop in stops:
+        print(f"{stop.key}  {stop.name} ({stop.street})  {stop.latitude}, {stop.longitude}")
+    return 0
+
+
+def departures(args):
+    import gtfs_index
+    from transit_model import NA
+
+    index = gtfs_index.load_default()
+    if index is None:
+        print("No GTFS feed imported yet (python -m transittracker gtfs-import google_transit.zip)")
+        return 1
+    found = index.departures(args.stop, limit=args.count)
+    if args.live and found:
+        # The timetable comes from the local index; only the estimates cost an API call
+        from transit_http import fetch_schedule
+        _, _, scheduled = fetch_schedule(args.stop, fmt=args.format)
+        found = gtfs_index.overlay_realtime(found, scheduled)
+
+    if not found:
+        print("No departures found")
+        return 1
+    for record in found:
+        estimate = "" if record.departure_estimated == NA else f" (est: {record.departure_estimated})"
+        print(f"{record.departure_scheduled}  Route {record.route_key} - {record.route_name} "
+              f"(Trip: {record.trip_key}){estimate}")
+    return 0
+
+
+def gtfs_import(args):
+    import gtfs_index
+
+    import trip_planner
+
+    counts = gtfs_index.import_feed(args.feed)
+    print(f"Indexed {counts['indexed']} of {counts['stop_times']} stop times "
+          f"at {counts['stops']} stops into {gtfs_index.GTFS_INDEX_PATH}")
+    network = trip_planner.import_network(args.feed)
+    print(f"Trip planner: {network['patterns']} route patterns, {network['walks']} walking transfers")
+    return 0
+
+
+def plan(args):
+    from datetime import datetime
+
+    import trip_planner
+
+    try:
+        planner = trip_planner.TripPlanner()
+    except FileNotFoundError:
+        print("No GTFS feed imported yet (python -m transittracker gtfs-import google_transit.zip)")
+        return 1
+    when = datetime.fromisoformat(args.at) if args.at else None
+    legs = planner.plan(args.origin, args.destination, when)
+    if not legs:
+        print("No journey found")
+        return 1
+    for leg in legs:
+        if leg.mode == "walk":
+            print(f"{leg.departs}  Walk from {leg.from_stop} to {leg.to_stop}, arrive {leg.arrives}")
+        else:
+            print(f"{leg.departs}  Route {leg.route} (Trip: {leg.trip}) from {leg.from_stop} "
+                  f"to {leg.to_stop}, arrive {leg.arrives}")
+    return 0
+
+
+def print_board(departures):
+    from transit_model import NA
+
+    if not departures:
+        print("No departures found")
+        return
+    for departure in departures:
+        record, stop = departure.record, departure.stop
+        estimate = " (est)" if record.departure_estimated != NA else ""
+        print(f"{departure.when:%H:%M}{estimate:<6}  Route {record.route_key} - {record.route_name}  "
+              f"at {departure.stop_id} {stop.name if stop else ''} (Trip: {record.trip_key})")
+
+
+def board(args):
+    import threading
+    import time
+    from datetime import datetime
+
+    import departure_board
+
+    stop_ids = list(args.stops)
+    if args.near:
+        latitude, longitude = (float(part) for part in args.near.split(","))
+        stop_ids += departure_board.stops_near(latitude, longitude, args.radius)
+    if not stop_ids:
+        print("No stops to show (give stop numbers or --near LAT,LON)")
+        return 1
+
+    departures = departure_board.DepartureBoard(stop_ids, size=args.count, max_concurrency=args.concurrency)
+    bound = departures.refresh_bound()
+    if bound >= 5:
+        print(f"[INFO] {len(stop_ids)} stops: the API quota holds a refresh to at least {bound:.0f} s "
+              "(raise $TRANSITTRACKER_QUOTA if your key allows more)", file=sys.stderr)
+    if not args.watch:
+        _, failed = departures.refresh()
+        for result in failed:
+            print(f"[WARN] stop {result.stop_id}: {result.error}", file=sys.stderr)
+        print_board(departures.top(after=datetime.now()))
+        return 0
+
+    from stop_watcher import StopWatcher
+
+    changed = threading.Event()
+    watcher = StopWatcher(max_concurrency=args.concurrency)
+    departures.follow(watcher)
+    watcher.subscribe(lambda *_: changed.set())
+    watcher.start()
+    try:
+        while True:
+            changed.wait()
+            # Let a burst of stops land before repainting
+            time.sleep(0.5)
+            changed.clear()
+            print(f"-- {datetime.now():%H:%M:%S}, {len(stop_ids)} stops " + "-" * 30)
+            print_board(departures.top(after=datetime.now()))
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        watcher.stop()
+
+
+def prefetch_stops(args):
+    import stop_index
+
+    directory = stop_index.StopDirectory(max_concurrency=args.concurrency)
+    index = directory.prefetch()
+    print(f"Saved {len(index)} stops to {directory.path}")
+    if directory.failed:
+        print(f"[WARN] {len(directory.failed)} tiles failed, their stops are missing until the next prefetch: "
+              f"{next(iter(directory.failed.values()))}", file=sys.stderr)
+    return 0
+
+
+def daemon(args):
+    from transit_daemon import serve
+    from transit_http import DAEMON_PORT
+
+    serve(args.host, args.port or DAEMON_PORT, args.cache_file)
+    return 0
+
+
+def feed(args):
+    from live_feed import FEED_PORT, LiveFeed
+    from stop_watcher import StopWatcher
+
+    LiveFeed(StopWatcher()).run(args.host, args.port or FEED_PORT)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="transittracker", description="Winnipeg Transit stop lookups")
+    parser.add_argument("--format", choices=("json", "xml"), help="API wire format (default: json)")
+    parser.add_argument("--via-daemon", action="store_true",
+                        help="go through a running transittracker daemon ($TRANSITTRACKER_DAEMON or the local port)")
+    parser.add_argument("--record", metavar="DIR", help="save every API response into a fixture corpus")
+    parser.add_argument("--replay", metavar="DIR", help="answer from a fixture corpus instead of the network")
+    parser.add_argument("--profile", default="clean", choices=("clean", "lan", "slow", "flaky", "storm"),
+                        help="simulated network for --replay (default: clean)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    schedule_parser = commands.add_parser("schedule", help="print the schedule for a stop")
+    schedule_parser.add_argument("stop", help="stop number, e.g. 10758")
+    schedule_parser.set_defaults(run=schedule)
+
+    search_parser = commands.add_parser("search", help="find stops by name, street or number")
+    search_parser.add_argument("query")
+    search_parser.set_defaults(run=search)
+
+    departures_parser = commands.add_parser("departures", help="next departures from the imported GTFS timetable")
+    departures_parser.add_argument("stop", help="stop number, e.g. 10758")
+    departures_parser.add_argument("-n", "--count", type=int, default=10)
+    departures_parser.add_argument("--live", action="store_true", help="overlay real-time estimates from the API")
+    departures_parser.set_defaults(run=departures)
+
+    gtfs_parser = commands.add_parser("gtfs-import", help="index a GTFS feed for offline departures and trips")
+    gtfs_parser.add_argument("feed", help="GTFS zip or unpacked directory")
+    gtfs_parser.set_defaults(run=gtfs_import)
+
+    plan_parser = commands.add_parser("plan", help="earliest-arrival journey between two stops")
+    plan_parser.add_argument("origin", help="stop number to leave from")
+    plan_parser.add_argument("destination", help="stop number to get to")
+    plan_parser.add_argument("--at", help="leave at this ISO time, e.g. 2026-10-19T08:00 (default: now)")
+    plan_parser.set_defaults(run=plan)
+
+    board_parser = commands.add_parser(
+        "board", help="next departures across several stops, soonest first",
+        description="Each refresh is one API request per stop, held to the API quota: 100 a minute "
+                    "after a burst of 10 unless $TRANSITTRACKER_QUOTA says otherwise (requests per "
+                    "minute). At the default a 150-stop board takes about 84 s to fill.")
+    board_parser.add_argument("stops", nargs="*", help="stop numbers, e.g. 10758 10759")
+    board_parser.add_argument("--near", metavar="LAT,LON", help="add every stop around this point")
+    board_parser.add_argument("--radius", type=float, default=400, help="metres around --near (default: 400)")
+    board_parser.add_argument("-n", "--count", type=int, default=20)
+    board_parser.add_argument("--concurrency", type=int, default=16, help="stop fetches in flight (default: 16)")
+    board_parser.add_argument("--watch", action="store_true", help="keep polling and reprint as departures change")
+    board_parser.set_defaults(run=board)
+
+    prefetch_parser = commands.add_parser("prefetch-stops", help="fetch every stop into the offline stop index")
+    prefetch_parser.add_argument("--concurrency", type=int, default=8, help="location queries in flight (default: 8)")
+    prefetch_parser.set_defaults(run=prefetch_stops)
+
+    daemon_parser = commands.add_parser("daemon", help="serve a shared cache/rate limit for local clients")
+    daemon_parser.add_argument("--host", default="127.0.0.1")
+    daemon_parser.add_argument("--port", type=int, help="default: 8642")
+    daemon_parser.add_argument("--cache-file", help="sqlite file that keeps the cache across restarts")
+    daemon_parser.set_defaults(run=daemon)
+
+    feed_parser = commands.add_parser("feed", help="stream departure changes to dashboards over SSE")
+    feed_parser.add_argument("--host", default="127.0.0.1")
+    feed_parser.add_argument("--port", type=int, help="default: 8643")
+    feed_parser.set_defaults(run=feed)
+
+    args = parser.parse_args(argv)
+
+    # --via-daemon, --record/--replay and the TRANSITTRACKER_* opt-ins
+    import transit_startup
+    transit_startup.configure(argv)
+
+    try:
+        return args.run(args)
+    except FileNotFoundError as exc:
+        # source_helper has already explained the missing key file
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        return 2
+    except Exception as exc:
+        print(f"[ERROR] {type(exc).__name__}: {exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,349 @@
+"""Earliest-arrival journey planning over the imported GTFS timetable (RAPTOR).
+
+    python -m transittracker gtfs-import google_transit.zip   # also builds this
+    TripPlanner().plan("10758", "10625", when=datetime(2026, 10, 19, 8, 0))
+
+import_network() groups the feed's trips into route patterns (trips that
+visit the same stops in the same order, split further so no trip overtakes
+another) and stores them as flat uint32 arrays in txt/gtfs/network.bin:
+stop sequences, per-stop-position arrival and departure columns, the
+patterns serving each stop, and walking transfers between stops within
+MAX_WALK metres of each other, found with stop_index's grid over the
+stops' coordinates. The file is memory-mapped on load.
+
+plan() runs RAPTOR: round k relaxes every pattern through a stop improved
+in round k - 1, boarding the earliest running trip with a bisect on that
+stop's departure column, then walks from every stop a vehicle improved.
+Only patterns touching improved stops are scanned, which keeps a query to
+a few milliseconds in pure Python. Journeys use the query day's service.
+"""
+import bisect
+import csv
+import json
+import mmap
+import os
+import struct
+from array import array
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from gtfs_index import GTFS_INDEX_PATH, TABLES_FILE, GtfsIndex, _open_table, _Seconds, _table
+from stop_index import StopIndex
+from transit_model import NA, Stop
+
+NETWORK_FILE = "network.bin"
+MAGIC = b"TTRAPTR1"
+# Magic and the length of each array in SECTIONS order; the arrays follow
+SECTIONS = (
+    "pattern_stop_offsets", "pattern_stops",
+    "pattern_trip_offsets", "pattern_trips",
+    "pattern_time_offsets", "arrivals", "departures",
+    "stop_pattern_offsets", "stop_patterns", "stop_positions",
+    "walk_offsets", "walk_stops", "walk_seconds",
+)
+HEADER = struct.Struct(f"<8s{len(SECTIONS)}I")
+
+MAX_WALK = 400
+WALK_SPEED = 1.2
+TRANSFER_SECONDS = 60
+MAX_ROUNDS = 5
+UNREACHED = 0xFFFFFFFF
+
+# One piece of an itinerary; mode is "ride" or "walk", route/trip are NA for walks
+Leg = namedtuple("Leg", "mode from_stop to_stop departs arrives route trip")
+
+
+def _read_trips(feed, stop_rows, trip_rows):
+    """Per trip: (stops, arrivals, departures) arrays in stop_sequence order."""
+    stops_of = [array("I") for _ in trip_rows]
+    arrivals_of = [array("I") for _ in trip_rows]
+    departures_of = [array("I") for _ in trip_rows]
+    sequences_of = [array("I") for _ in trip_rows]
+    seconds = _Seconds()
+    stream = _open_table(feed, "stop_times.txt")
+    with stream:
+        reader = csv.reader(stream)
+        header = next(reader)
+        trip_col, arrival_col, departure_col, stop_col, sequence_col = (
+            header.index(name) for name in ("trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence")
+        )
+        stop_of, trip_of = stop_rows.get, trip_rows.get
+        for row in reader:
+            stop = stop_of(row[stop_col])
+            trip = trip_of(row[trip_col])
+            departs = row[departure_col]
+            if stop is None or trip is None or not departs:
+                continue
+            stops_of[trip].append(stop)
+            arrivals_of[trip].append(seconds[row[arrival_col] or departs])
+            departures_of[trip].append(seconds[departs])
+            sequences_of[trip].append(int(row[sequence_col]))
+
+    for trip, sequences in enumerate(sequences_of):
+        if any(a > b for a, b in zip(sequences, sequences[1:])):
+            order = sorted(range(len(sequences)), key=sequences.__getitem__)
+            for columns in (stops_of, arrivals_of, departures_of):
+                columns[trip] = array("I", (columns[trip][i] for i in order))
+    return stops_of, arrivals_of, departures_of
+
+
+def _patterns(stops_of, departures_of):
+    """Lists of trip numbers sharing a stop sequence, each sorted so no trip overtakes the one before."""
+    by_sequence = {}
+    for trip, stops in enumerate(stops_of):
+        if len(stops) > 1:
+            by_sequence.setdefault(stops.tobytes(), []).append(trip)
+    patterns = []
+    for trips in by_sequence.values():
+        trips.sort(key=lambda trip: departures_of[trip][0])
+        split = []
+        for trip in trips:
+            departures = departures_of[trip]
+            for pattern in split:
+                previous = departures_of[pattern[-1]]
+                if all(a <= b for a, b in zip(previous, departures)):
+                    pattern.append(trip)
+                    break
+            else:
+                split.append([trip])
+        patterns.extend(split)
+    return patterns
+
+
+def _walks(stop_rows, coordinates):
+    stops = [Stop(str(i), NA, NA, NA, NA, lat, lon) for i, (lat, lon) in enumerate(coordinates)]
+    index = StopIndex(stop for stop in stops if stop.latitude is not None)
+    offsets, to, seconds = array("I", [0]), array("I"), array("I")
+    for stop in stops:
+        if stop.latitude is not None:
+            for distance, other in index.within(stop.latitude, stop.longitude, MAX_WALK):
+                if other.key != stop.key:
+                    to.append(int(other.key))
+                    seconds.append(int(distance / WALK_SPEED))
+        offsets.append(len(to))
+    return offsets, to, seconds
+
+
+def import_network(source, path=GTFS_INDEX_PATH):
+    """Build network.bin under path; gtfs_index.import_feed(source, path) must have run first."""
+    import zipfile
+
+    with open(os.path.join(path, TABLES_FILE)) as f:
+        tables = json.load(f)
+    stop_rows = {stop_id: i for i, stop_id in enumerate(tables["stop_ids"])}
+    trip_rows = {trip[0]: i for i, trip in enumerate(tables["trips"])}
+
+    feed = zipfile.ZipFile(source) if zipfile.is_zipfile(source) else source
+    try:
+        coordinates = [None] * len(stop_rows)
+        for row in _table(feed, "stops.txt"):
+            i = stop_rows.get(row["stop_id"])
+            if i is not None:
+                lat, lon = row.get("stop_lat"), row.get("stop_lon")
+                coordinates[i] = (float(lat), float(lon)) if lat and lon else (None, None)
+        stops_of, arrivals_of, departures_of = _read_trips(feed, stop_rows, trip_rows)
+    finally:
+        if isinstance(feed, zipfile.ZipFile):
+            feed.close()
+
+    arrays = {name: array("I") for name in SECTIONS}
+    for name in ("pattern_stop_offsets", "pattern_trip_offsets", "pattern_time_offsets"):
+        arrays[name].append(0)
+    serving = [[] for _ in stop_rows]
+    for p, trips in enumerate(_patterns(stops_of, departures_of)):
+        stops = stops_of[trips[0]]
+        for position, stop in enumerate(stops):
+            serving[stop].append((p, position))
+        arrays["pattern_stops"].extend(stops)
+        arrays["pattern_trips"].extend(trips)
+        # Position-major, so each stop's departures are one sorted run to bisect
+        for position in range(len(stops)):
+            arrays["arrivals"].extend(arrivals_of[trip][position] for trip in trips)
+            arrays["departures"].extend(departures_of[trip][position] for trip in trips)
+        arrays["pattern_stop_offsets"].append(len(arrays["pattern_stops"]))
+        arrays["pattern_trip_offsets"].append(len(arrays["pattern_trips"]))
+        arrays["pattern_time_offsets"].append(len(arrays["departures"]))
+
+    arrays["stop_pattern_offsets"].append(0)
+    for patterns in serving:
+        for p, position in patterns:
+            arrays["stop_patterns"].append(p)
+            arrays["stop_positions"].append(position)
+        arrays["stop_pattern_offsets"].append(len(arrays["stop_patterns"]))
+    arrays["walk_offsets"], arrays["walk_stops"], arrays["walk_seconds"] = _walks(stop_rows, coordinates)
+
+    network_path = os.path.join(path, NETWORK_FILE)
+    with open(network_path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, *(len(arrays[name]) for name in SECTIONS)))
+        for name in SECTIONS:
+            arrays[name].tofile(f)
+    os.replace(network_path + ".tmp", network_path)
+    return {
+        "patterns": len(arrays["pattern_trip_offsets"]) - 1,
+        "trips": len(arrays["pattern_trips"]),
+        "walks": len(arrays["walk_stops"]),
+    }
+
+
+class TripPlanner:
+    def __init__(self, path=GTFS_INDEX_PATH, timetable=None):
+        self.timetable = timetable or GtfsIndex(path)
+        self._file = open(os.path.join(path, NETWORK_FILE), "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, *lengths = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} has no trip planner network")
+        view = memoryview(self._map)
+        start = HEADER.size
+        self._views = []
+        for name, length in zip(SECTIONS, lengths):
+            section = view[start:start + 4 * length].cast("I")
+            self._views.append(section)
+            setattr(self, f"_{name}", section)
+            start += 4 * length
+        view.release()
+
+    def close(self):
+        for section in self._views:
+            section.release()
+        self._map.close()
+        self._file.close()
+        self.timetable.close()
+
+    def _earliest_trip(self, p, position, ready, active):
+        """Index within pattern p of the first running trip leaving position at or after ready, or None."""
+        trip_lo = self._pattern_trip_offsets[p]
+        count = self._pattern_trip_offsets[p + 1] - trip_lo
+        lo = self._pattern_time_offsets[p] + position * count
+        k = bisect.bisect_left(self._departures, ready, lo, lo + count) - lo
+        trips = self._pattern_trips
+        while k < count and not active[trips[trip_lo + k]]:
+            k += 1
+        return k if k < count else None
+
+    def plan(self, origin, destination, when=None, max_rounds=MAX_ROUNDS):
+        """Earliest-arrival itinerary from origin to destination stop as a list of Legs ([] if unreachable)."""
+        source = self.timetable.stop_position(origin)
+        target = self.timetable.stop_position(destination)
+        if source is None or target is None:
+            return []
+        when = when or datetime.now()
+        midnight = datetime.combine(when.date(), time())
+        active = self.timetable.active_trips(when.date())
+        start = int((when - midnight).total_seconds())
+
+        stop_count = len(self._stop_pattern_offsets) - 1
+        best = [UNREACHED] * stop_count
+        labels = [UNREACHED] * stop_count
+        # rounds[k][stop] is how round k reached stop: ("ride", pattern, trip, board position, alight position)
+        # or ("walk", from stop, seconds)
+        rounds = [{}]
+        best[source] = labels[source] = start
+        marked = {source}
+        self._walk_from([source], labels, best, rounds[0], marked)
+
+        # Locals for the hot loops
+        pattern_stops, stop_offsets = self._pattern_stops, self._pattern_stop_offsets
+        trip_offsets, time_offsets = self._pattern_trip_offsets, self._pattern_time_offsets
+        arrivals, departures = self._arrivals, self._departures
+        stop_pattern_offsets, stop_patterns, stop_positions = (
+            self._stop_pattern_offsets, self._stop_patterns, self._stop_positions)
+        for k in range(1, max_rounds + 1):
+            previous = labels
+            labels = list(previous)
+            reached = {}
+            rounds.append(reached)
+
+            queue = {}
+            for stop in marked:
+                for j in range(stop_pattern_offsets[stop], stop_pattern_offsets[stop + 1]):
+                    p, position = stop_patterns[j], stop_positions[j]
+                    if position < queue.get(p, position + 1):
+                        queue[p] = position
+            marked = set()
+
+            for p, first in queue.items():
+                stops_lo = stop_offsets[p]
+                length = stop_offsets[p + 1] - stops_lo
+                count = trip_offsets[p + 1] - trip_offsets[p]
+                times_lo = time_offsets[p]
+                trip = board = None
+                for position in range(first, length):
+                    stop = pattern_stops[stops_lo + position]
+                    if trip is not None:
+                        arrives = arrivals[times_lo + position * count + trip]
+                        if arrives < best[stop] and arrives < best[target]:
+                            labels[stop] = best[stop] = arrives
+                            reached[stop] = ("ride", p, trip, board, position)
+                            marked.add(stop)
+                    if previous[stop] == UNREACHED:
+                        continue
+                    ready = previous[stop] + (TRANSFER_SECONDS if k > 1 else 0)
+                    if trip is None or ready < departures[times_lo + position * count + trip]:
+                        earlier = self._earliest_trip(p, position, ready, active)
+                        if earlier is not None and (trip is None or earlier < trip):
+                            trip, board = earlier, position
+
+            self._walk_from(list(marked), labels, best, reached, marked)
+            if not marked:
+                break
+
+        if best[target] == UNREACHED:
+            return []
+        return self._itinerary(rounds, source, target, start, midnight)
+
+    def _walk_from(self, stops, labels, best, reached, marked):
+        for stop in stops:
+            for j in range(self._walk_offsets[stop], self._walk_offsets[stop + 1]):
+                other = self._walk_stops[j]
+                arrives = labels[stop] + self._walk_seconds[j]
+                if arrives < best[other]:
+                    labels[other] = best[other] = arrives
+                    reached[other] = ("walk", stop, self._walk_seconds[j])
+                    marked.add(other)
+
+    def _itinerary(self, rounds, source, target, start, midnight):
+        # Follow the parents back from target; a stop's label in round k is the
+        # one set in the latest round up to k that improved it
+        def reached_by(stop, k):
+            while stop not in rounds[k]:
+                k -= 1
+            return k, rounds[k][stop]
+
+        steps = []
+        stop, k = target, len(rounds) - 1
+        while stop != source:
+            k, how = reached_by(stop, k)
+            steps.append((stop, how))
+            if how[0] == "walk":
+                stop = how[1]
+            else:
+                _, p, _, board, _ = how
+                stop = self._pattern_stops[self._pattern_stop_offsets[p] + board]
+                k -= 1
+        steps.reverse()
+
+        def clock(seconds):
+            return (midnight + timedelta(seconds=seconds)).isoformat(timespec="seconds")
+
+        keys = self.timetable.stop_keys
+        legs = []
+        now = start
+        for stop, how in steps:
+            if how[0] == "walk":
+                _, walked_from, seconds = how
+                legs.append(Leg("walk", keys[walked_from], keys[stop], clock(now), clock(now + seconds), NA, NA))
+                now += seconds
+                continue
+            _, p, trip, board, alight = how
+            trip_lo = self._pattern_trip_offsets[p]
+            count = self._pattern_trip_offsets[p + 1] - trip_lo
+            times_lo = self._pattern_time_offsets[p]
+            trip_id, route, _, _ = self.timetable.trips[self._pattern_trips[trip_lo + trip]]
+            now = self._arrivals[times_lo + alight * count + trip]
+            legs.append(Leg(
+                "ride", keys[self._pattern_stops[self._pattern_stop_offsets[p] + board]], keys[stop],
+                clock(self._departures[times_lo + board * count + trip]), clock(now),
+                self.timetable.routes[route][0], trip_id,
+            ))
+        return legs